@@ -46,13 +46,16 @@ from flask import Flask
 from flask_cors import CORS
 from flask_caching import Cache
 
+import shared_cache
+
 def create_app():
     app = Flask(__name__)
     CORS(app)
 
-    # Configure caching
+    # Configure caching: one cache for all workers on the host (APP_CACHE=simple: per process)
     cache_config = {
-        'CACHE_TYPE': 'simple',
+        'CACHE_TYPE': 'shared_cache.SharedCache' if shared_cache.ENABLED else 'SimpleCache',
+        'CACHE_DIR': shared_cache.default_directory(),
         'CACHE_DEFAULT_TIMEOUT': 300
     }
     app.config.from_mapping(cache_config)
@@ -83,6 +86,11 @@ def create_app():
             'message': 'Server is running'
         }, 200
 
+    @app.route('/metrics')
+    def metrics():
+        from metrics import render
+        return render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
     return app
 
 
@@ -0,0 +1,247 @@
+"""
+ASGI entry point serving the same API as app.create_app(). Run it with
+uvicorn workers under gunicorn, so gunicorn.conf.py (preload, post_fork) applies:
+
+    gunicorn --worker-class uvicorn_worker.UvicornWorker --bind 0.0.0.0:8080 asgi:app
+
+Blocking work (model scoring, CSV reads) runs in a bounded thread pool
+(ASGI_SCORING_THREADS, default: CPU count), so a slow client or a long
+prediction never blocks the event loop.
+"""
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachelib import SimpleCache
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import metrics
+import response_formats
+import shared_cache
+from profiler import profiler
+from routes import (admin_denied, bulk_lines, bulk_options, control_profiler, explain_requested,
+                    get_dashboard_stats, get_scatter_points, health_code, health_status, load_feature_importance,
+                    model_versions, optimize_prices, predict_columns, predict_prices, query_visualization,
+                    reload_model_version)
+
+# Same store and timeout as the Flask app's cache
+cache = shared_cache.shared or SimpleCache(default_timeout=300)
+
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_SCORING_THREADS', os.cpu_count() or 1)),
+                              thread_name_prefix='asgi-scoring')
+
+
+class FlaskJSONResponse(JSONResponse):
+    """Serializes like Flask's jsonify (sorted keys, ASCII), so both apps return identical bodies"""
+    def render(self, content):
+        return json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+class BlockingBody(io.RawIOBase):
+    """
+    The request body as a blocking binary file, for parsers running in the
+    scoring threads: each read waits for the next chunk from the event loop.
+    """
+    def __init__(self, request, loop):
+        self._chunks = request.stream()
+        self._loop = loop
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = asyncio.run_coroutine_threadsafe(anext(self._chunks), self._loop).result()
+            except StopAsyncIteration:
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    A response streamed while the request body is still being read.
+    StreamingResponse listens for a disconnect on receive() meanwhile, which
+    would take the body chunks the reader is waiting for.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def _json_body(request):
+    # Like Flask's get_json(silent=True): anything but a JSON object counts as empty
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _admin_denied(request):
+    denied = admin_denied(request.headers.get('x-admin-token'))
+    return FlaskJSONResponse(denied[0], status_code=denied[1]) if denied else None
+
+
+async def index(request):
+    return PlainTextResponse("Dynamic Pricing API is running!", media_type='text/html')
+
+
+async def health(request):
+    return FlaskJSONResponse({
+        'status': 'healthy',
+        'service': 'Dynamic Pricing API',
+        'message': 'Server is running'
+    })
+
+
+async def api_health(request):
+    status = health_status()
+    return FlaskJSONResponse(status, status_code=health_code(status))
+
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def kpi(request):
+    return FlaskJSONResponse(await run_blocking(get_dashboard_stats))
+
+
+async def predict(request):
+    start = time.perf_counter()
+    explain = explain_requested(request.query_params)
+    try:
+        fmt = response_formats.negotiate(request.headers.get('accept'), request.query_params.get('format'), explain)
+    except response_formats.UnsupportedFormat as e:
+        metrics.ERRORS.inc('predict', 'unsupported_format')
+        return FlaskJSONResponse({'error': str(e)}, status_code=406)
+    try:
+        data = await request.json()
+        parsed = time.perf_counter()
+        if fmt == 'json':
+            results = await run_blocking(predict_prices, data, explain)
+            serialize_start = time.perf_counter()
+            response = FlaskJSONResponse(results)
+        else:
+            columns = await run_blocking(predict_columns, data)
+            serialize_start = time.perf_counter()
+            body, media_type, headers = response_formats.encode(columns, fmt)
+            response = Response(body, media_type=media_type, headers=headers)
+        response.headers['Vary'] = 'Accept'
+        done = time.perf_counter()
+        metrics.PARSE_SECONDS.observe(parsed - start)
+        metrics.SERIALIZE_SECONDS.observe(done - serialize_start)
+        metrics.PREDICT_SECONDS.observe(done - start)
+        return response
+    except Exception as e:
+        metrics.ERRORS.inc('predict', metrics.error_type(e))
+        return FlaskJSONResponse({'error': str(e)}, status_code=400)
+
+
+async def optimize(request):
+    start = time.perf_counter()
+    try:
+        result = await run_blocking(optimize_prices, await request.json())
+    except Exception as e:
+        metrics.ERRORS.inc('optimize', metrics.error_type(e))
+        return FlaskJSONResponse({'error': str(e)}, status_code=400)
+    response = FlaskJSONResponse(result)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, 'optimize')
+    return response
+
+
+async def feature_importance(request):
+    return FlaskJSONResponse(await run_blocking(load_feature_importance))
+
+
+async def scatter(request):
+    return FlaskJSONResponse(await run_blocking(get_scatter_points, cache))
+
+
+async def bulk_predict(request):
+    try:
+        fmt, chunk_size, media_type = bulk_options(request.headers.get('content-type', '').split(';')[0],
+                                                   request.query_params)
+    except ValueError as e:
+        return FlaskJSONResponse({'error': str(e)}, status_code=400)
+    lines = bulk_lines(io.BufferedReader(BlockingBody(request, asyncio.get_running_loop())), fmt, chunk_size)
+
+    async def stream():
+        # Parsing and scoring run in the scoring threads, one response chunk at a time
+        while (chunk := await run_blocking(next, lines, None)) is not None:
+            yield chunk
+
+    return UploadStreamingResponse(stream(), media_type=media_type)
+
+
+async def admin_models(request):
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    return FlaskJSONResponse(model_versions())
+
+
+async def admin_reload(request):
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    body, status = await run_blocking(reload_model_version, await _json_body(request))
+    return FlaskJSONResponse(body, status_code=status)
+
+
+async def admin_profiler(request):
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    if request.method == 'GET':
+        if request.query_params.get('format') == 'collapsed':
+            return PlainTextResponse(profiler.collapsed())
+        return FlaskJSONResponse(profiler.status())
+    body, status = await run_blocking(control_profiler, await _json_body(request))
+    return FlaskJSONResponse(body, status_code=status)
+
+
+async def visualization_query(request):
+    try:
+        result = await run_blocking(query_visualization, request.query_params, cache)
+    except ValueError as e:
+        return FlaskJSONResponse({'error': str(e)}, status_code=400)
+    if result is None:
+        return FlaskJSONResponse({'error': 'Dataset not available'}, status_code=404)
+    return FlaskJSONResponse(result)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/health', health),
+        Route('/metrics', metrics_endpoint),
+        Route('/api/health', api_health),
+        Route('/api/kpi', kpi),
+        Route('/api/predict', predict, methods=['POST']),
+        Route('/api/optimize', optimize, methods=['POST']),
+        Route('/api/bulk-predict', bulk_predict, methods=['POST']),
+        Route('/api/feature-importance', feature_importance),
+        Route('/api/visualizations/scatter', scatter),
+        Route('/api/visualizations/query', visualization_query),
+        Route('/api/admin/models', admin_models),
+        Route('/api/admin/reload', admin_reload, methods=['POST']),
+        Route('/api/admin/profiler', admin_profiler, methods=['GET', 'POST']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
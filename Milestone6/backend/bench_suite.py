@@ -0,0 +1,271 @@
+"""
+Reproducible benchmark suite for the pricing service.
+
+    python bench_suite.py                                   # run, write bench_results.json
+    python bench_suite.py --rows 1000 100000 --output out.json
+    python bench_suite.py --baseline bench_baseline.json    # exit 1 on a regression
+    python bench_suite.py --save-baseline bench_baseline.json
+
+Runs offline on a CPU-only box. The rides are synthetic
+(create_dummy_data.make_dummy_rides with a fixed seed) and scaled to
+--rows. The prediction cache, request coalescer and model watcher are off,
+so every run measures the same code path. Each case reports throughput,
+p50/p95/p99 latency and the process's peak RSS while it ran.
+"""
+import os
+
+# Before the service modules are imported: nothing between the caller and the model
+for _name, _value in {'PREDICTION_CACHE_SIZE': '0', 'PREDICT_COALESCE_WAIT_MS': '0',
+                      'MODEL_WATCH_INTERVAL': '0', 'OMP_NUM_THREADS': '1'}.items():
+    os.environ.setdefault(_name, _value)
+
+import argparse
+import contextlib
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROWS = (1000, 10000)
+SEED = 42
+
+# Compared against the baseline (higher is worse), with the smallest change that counts:
+# timer and scheduler noise alone moves sub-0.1 ms cases by tens of percent
+GATED_METRICS = {'p50_ms': 0.05, 'peak_rss_mb': 5.0}
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux); False if not possible"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name, fn, rows_per_call, min_seconds=1.0, min_iterations=5, max_iterations=5000, warmup=2,
+            setup=None):
+    """
+    Time fn() until it ran min_iterations times and min_seconds passed.
+    setup(), if given, runs untimed before every call.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    _reset_peak_rss()
+    timings = []
+    deadline = time.perf_counter() + min_seconds
+    while len(timings) < max_iterations and (len(timings) < min_iterations or time.perf_counter() < deadline):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings)
+    result = {
+        'case': name,
+        'rows_per_call': rows_per_call,
+        'iterations': len(timings),
+        'calls_per_sec': round(1 / timings.mean(), 2),
+        'rows_per_sec': round(rows_per_call / timings.mean(), 1),
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 4),
+        'p95_ms': round(float(np.percentile(timings, 95)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(timings, 99)) * 1000, 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+    print(f"{name:<36} {result['rows_per_sec']:>12,.0f} rows/s  p50 {result['p50_ms']:9.3f} ms  "
+          f"p95 {result['p95_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  peak RSS {result['peak_rss_mb']:7.1f} MB",
+          flush=True)
+    return result
+
+
+@contextlib.contextmanager
+def serving_dataset(path):
+    """Point the dashboard (routes.kpi_store) at another rides CSV for the duration"""
+    import routes
+    from kpi_store import KpiStore
+
+    saved = routes.kpi_store
+    routes.kpi_store = KpiStore(path, routes.pricing_model)
+    try:
+        yield routes.kpi_store
+    finally:
+        routes.kpi_store = saved
+
+
+def environment():
+    import lightgbm
+    import pandas
+    import sklearn
+
+    from models import pricing_model
+    from model_registry import file_hash
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'lightgbm': lightgbm.__version__,
+        'scikit-learn': sklearn.__version__,
+        'omp_num_threads': os.environ.get('OMP_NUM_THREADS'),
+        'model_version': pricing_model.version,
+        'model_sha256': file_hash(pricing_model.model_path) if pricing_model.model_path else None,
+        'git_commit': commit,
+    }
+
+
+def run_suite(rows_list=DEFAULT_ROWS, seed=SEED, min_seconds=1.0):
+    import data_snapshot
+    from app import create_app
+    from create_dummy_data import make_dummy_rides
+    from models import pricing_model
+    from routes import get_dashboard_stats
+
+    pricing_model.ensure_loaded()
+    client = create_app().test_client()
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='bench_suite_')
+    snapshot_dir = data_snapshot.SNAPSHOT_DIR
+    data_snapshot.SNAPSHOT_DIR = os.path.join(work_dir, 'snapshots')
+    try:
+        single = make_dummy_rides(1000, seed).to_dict(orient='records')
+        ride_index = iter(range(10 ** 9))
+        results.append(measure('predict[rows=1]', lambda: pricing_model.predict(single[next(ride_index) % 1000]),
+                               1, min_seconds))
+        results.append(measure('route_predict[rows=1]',
+                               lambda: client.post('/api/predict', json=single[next(ride_index) % 1000]),
+                               1, min_seconds))
+        results.append(measure('route_predict[rows=100]', lambda: client.post('/api/predict', json=single[:100]),
+                               100, min_seconds))
+
+        for rows in rows_list:
+            df = make_dummy_rides(rows, seed)
+            records = df.to_dict(orient='records')
+            results.append(measure(f'predict[rows={rows}]', lambda: pricing_model.predict(records),
+                                   rows, min_seconds))
+
+            X, rule_inputs = pricing_model.feature_spec.transform(records)
+            base_prices = pricing_model.backend.predict(X)
+            rule_rows = [{name: values[i] for name, values in rule_inputs.items()} for i in range(rows)]
+            results.append(measure(
+                f'rules_per_row[rows={rows}]',
+                lambda: [pricing_model.apply_dynamic_pricing_rules(p, row) for p, row in zip(base_prices, rule_rows)],
+                rows, min_seconds))
+            results.append(measure(f'rules_batch[rows={rows}]',
+                                   lambda: pricing_model.apply_dynamic_pricing_rules_batch(base_prices, rule_inputs),
+                                   rows, min_seconds))
+
+            # Dashboard over a CSV of `rows` rides: first load (snapshot build + scoring), then
+            # unchanged-file calls, then calls that each see 100 appended rides
+            csv_path = os.path.join(work_dir, f'rides_{rows}.csv')
+            df.to_csv(csv_path, index=False)
+            with serving_dataset(csv_path) as store:
+                def cold_setup():
+                    shutil.rmtree(data_snapshot.SNAPSHOT_DIR, ignore_errors=True)
+                    data_snapshot._loaded.clear()
+                    store._reset()
+                results.append(measure(f'dashboard_stats_cold[rows={rows}]', get_dashboard_stats, rows,
+                                       min_seconds, min_iterations=3, max_iterations=20, setup=cold_setup))
+                results.append(measure(f'dashboard_stats_warm[rows={rows}]', get_dashboard_stats, rows, min_seconds))
+                appended = df.head(100).to_csv(index=False, header=False)
+
+                def append_rides():
+                    with open(csv_path, 'a') as f:
+                        f.write(appended)
+                results.append(measure(f'dashboard_stats_append[rows={rows}]', get_dashboard_stats, 100,
+                                       min_seconds, max_iterations=200, setup=append_rides))
+                df.to_csv(csv_path, index=False)
+                results.append(measure(f'route_kpi[rows={rows}]', lambda: client.get('/api/kpi'), rows, min_seconds))
+    finally:
+        data_snapshot.SNAPSHOT_DIR = snapshot_dir
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'environment': environment(),
+        'config': {'rows': list(rows_list), 'seed': seed, 'min_seconds': min_seconds},
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Cases whose gated metrics exceed the baseline by more than threshold (a
+    fraction) and by more than the metric's noise floor
+    """
+    if baseline['environment'].get('platform') != report['environment'].get('platform') or \
+            baseline['environment'].get('cpu_count') != report['environment'].get('cpu_count'):
+        print("⚠️  The baseline was recorded on a different machine; timings may not be comparable")
+    baseline_cases = {result['case']: result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        reference = baseline_cases.get(result['case'])
+        if reference is None:
+            continue
+        for metric, noise_floor in GATED_METRICS.items():
+            if (reference[metric] and result[metric] > reference[metric] * (1 + threshold)
+                    and result[metric] - reference[metric] > noise_floor):
+                change = result[metric] / reference[metric] - 1
+                regressions.append({'case': result['case'], 'metric': metric, 'baseline': reference[metric],
+                                    'current': result[metric], 'change': round(change, 4)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pricing service against a stored baseline")
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS))
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="Minimum timed duration per case")
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'bench_results.json'))
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help="Allowed slowdown / memory growth over the baseline (0.3 = 30%%)")
+    parser.add_argument('--save-baseline', help="Also write the results here as the new baseline")
+    args = parser.parse_args()
+
+    report = run_suite(args.rows, args.seed, args.min_seconds)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+        report['threshold'] = args.threshold
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {path}")
+
+    for regression in report.get('regressions', []):
+        print(f"❌ {regression['case']}: {regression['metric']} {regression['baseline']} -> "
+              f"{regression['current']} ({regression['change']:+.1%})")
+    if report.get('regressions'):
+        return 1
+    if args.baseline:
+        print(f"✅ No regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
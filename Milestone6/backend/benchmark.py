@@ -0,0 +1,511 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# The latency benchmarks below measure the model itself, not the prediction cache
+os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+
+from models import pricing_model, OnnxBackend
+from parity_reference import dirty_rides, reference_features
+from prediction_cache import PredictionCache
+from utils import load_data, load_ride_records as load_rides
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "dynamic_pricing.csv")
+
+
+def _rule_frame(records):
+    """Engineered rule inputs and base model prices for the given records"""
+    X, rule_inputs = pricing_model.feature_spec.transform(records)
+    base_prediction = pricing_model.backend.predict(X)
+    return pd.DataFrame(rule_inputs), base_prediction
+
+
+def bench_rules(rows=10000):
+    """Time the per-row and batched pricing rules on a tiled copy of the bundled data"""
+    records = load_rides(rows)
+    df, base_prediction = _rule_frame(records)
+
+    start = time.perf_counter()
+    for i, price in enumerate(base_prediction):
+        pricing_model.apply_dynamic_pricing_rules(price, df.iloc[i])
+    per_row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, df)
+    batched_time = time.perf_counter() - start
+
+    print(f"Rules on {rows} rows: per-row {per_row_time * 1000:.1f} ms, "
+          f"batched {batched_time * 1000:.2f} ms ({per_row_time / batched_time:.0f}x)")
+
+
+def _predict_pandas(records):
+    df = reference_features(records, pricing_model.feature_spec)
+    base_prediction = pricing_model.model.predict(df[pricing_model.feature_cols])
+    return pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, df).tolist()
+
+
+def _latency_percentiles(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def bench_predict(batch_sizes=(1, 100, 10000)):
+    """p50/p99 latency of PricingModel.predict with the pandas and compiled feature paths"""
+    for batch_size in batch_sizes:
+        records = load_rides(batch_size)
+        repeats = 500 if batch_size <= 100 else 30
+        pandas_p50, pandas_p99 = _latency_percentiles(lambda: _predict_pandas(records), repeats)
+        compiled_p50, compiled_p99 = _latency_percentiles(lambda: pricing_model.predict(records), repeats)
+        print(f"predict batch={batch_size:>5}: pandas p50 {pandas_p50:8.3f} ms p99 {pandas_p99:8.3f} ms | "
+              f"compiled p50 {compiled_p50:8.3f} ms p99 {compiled_p99:8.3f} ms")
+
+
+def _load_onnx_model():
+    from models import PricingModel
+
+    onnx_model = PricingModel(backend='onnx')
+    if not isinstance(onnx_model.backend, OnnxBackend):
+        print("Skipping ONNX benchmarks: run `python train_and_save_model.py --export-onnx` first")
+        return None
+    return onnx_model
+
+
+def bench_backends(onnx_model, batch_sizes=(1, 100, 10000)):
+    """Throughput of the native and ONNX Runtime backends on the same feature matrix"""
+    for batch_size in batch_sizes:
+        X, _ = pricing_model.feature_spec.transform(load_rides(batch_size))
+        repeats = 500 if batch_size <= 100 else 30
+        results = []
+        for model in (pricing_model, onnx_model):
+            p50, p99 = _latency_percentiles(lambda: model.backend.predict(X), repeats)
+            results.append(f"{model.backend.name} p50 {p50:8.3f} ms p99 {p99:8.3f} ms "
+                           f"({batch_size / p50 * 1000:,.0f} rows/s)")
+        print(f"backend batch={batch_size:>5}: " + " | ".join(results))
+
+
+STARTUP_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+startup = time.perf_counter() - start
+if os.environ.get('MODEL_LOAD_MODE') == 'preload':
+    # Simulate a gunicorn worker: fork after loading in the "master"
+    read_fd, write_fd = os.pipe()
+    if os.fork() != 0:
+        os.close(write_fd)
+        print(os.read(read_fd, 4096).decode())
+        os.wait()
+        sys.exit(0)
+    os.close(read_fd)
+    startup = 0.0
+client = app.test_client()
+start = time.perf_counter()
+client.post('/api/predict', json=json.loads(sys.argv[1]))
+first_predict = time.perf_counter() - start
+with open('/proc/self/smaps_rollup') as f:
+    private_kb = sum(int(line.split()[1]) for line in f if line.startswith('Private_'))
+result = json.dumps({'startup_ms': startup * 1000, 'first_predict_ms': first_predict * 1000, 'private_mb': private_kb / 1024})
+if os.environ.get('MODEL_LOAD_MODE') == 'preload':
+    os.write(write_fd, result.encode())
+else:
+    print(result)
+"""
+
+
+def bench_startup(modes=('eager', 'lazy', 'preload')):
+    """App start-up time, first-predict latency and private (unshared) memory per worker"""
+    import json
+    import subprocess
+    import sys
+
+    record = json.dumps(load_rides(1))
+    for mode in modes:
+        env = dict(os.environ, MODEL_LOAD_MODE=mode, PYTHONWARNINGS='ignore')
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, record], cwd=BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"startup mode={mode:<7}: worker start {result['startup_ms']:8.1f} ms, "
+              f"first predict {result['first_predict_ms']:8.1f} ms, "
+              f"worker private memory {result['private_mb']:6.1f} MB")
+
+
+SNAPSHOT_SCRIPT = """
+import json, sys, time
+import numpy as np
+import pandas as pd
+from data_snapshot import load_rides
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS')) / 1024
+
+path, source = sys.argv[1], sys.argv[2]
+before = rss_mb()
+start = time.perf_counter()
+df = pd.read_csv(path) if source == 'csv' else load_rides(path)
+load = time.perf_counter() - start
+# Touch every column, as the dashboard and training do
+for column in df.columns:
+    np.asarray(df[column].cat.codes if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column]).sum()
+print(json.dumps({'load_ms': load * 1000, 'rss_mb': rss_mb() - before}))
+"""
+
+
+def bench_snapshot(scales=(1, 10, 100)):
+    """
+    Load time and resident memory of the ride CSVs vs their columnar snapshots,
+    with the data tiled to `scales` times its size. Each load runs in a fresh process.
+    """
+    import json
+    import subprocess
+    import sys
+    import tempfile
+
+    import data_snapshot
+
+    sources = {'one-hot': DATA_PATH, 'raw': os.path.join(BASE_DIR, '..', '..', 'Data', 'raw', 'dynamic_pricing.csv')}
+    snapshot_dir = data_snapshot.SNAPSHOT_DIR
+    with tempfile.TemporaryDirectory() as root:
+        data_snapshot.SNAPSHOT_DIR = os.path.join(root, 'snapshots')
+        env = dict(os.environ, DATA_SNAPSHOT_DIR=data_snapshot.SNAPSHOT_DIR, PYTHONWARNINGS='ignore')
+        for layout, source in sources.items():
+            if not os.path.exists(source):
+                continue
+            df = pd.read_csv(source)
+            for scale in scales:
+                path = os.path.join(root, f"{layout}-{scale}.csv")
+                pd.concat([df] * scale, ignore_index=True).to_csv(path, index=False)
+                start = time.perf_counter()
+                data_snapshot.build_snapshot(path)
+                build_ms = (time.perf_counter() - start) * 1000
+                results = {}
+                for mode in ('csv', 'snapshot'):
+                    output = subprocess.run([sys.executable, '-c', SNAPSHOT_SCRIPT, path, mode], cwd=BASE_DIR,
+                                            env=env, capture_output=True, text=True, check=True).stdout
+                    results[mode] = json.loads(output.strip().splitlines()[-1])
+                print(f"Snapshot {layout:<7} {len(df) * scale:>7,} rows: "
+                      f"CSV {results['csv']['load_ms']:7.1f} ms {results['csv']['rss_mb']:6.1f} MB | "
+                      f"snapshot {results['snapshot']['load_ms']:7.1f} ms {results['snapshot']['rss_mb']:6.1f} MB "
+                      f"(one-off build {build_ms:.0f} ms)")
+    data_snapshot.SNAPSHOT_DIR = snapshot_dir
+
+
+def bench_visualization(scales=(1, 10, 100), points=500):
+    """Uncached query time and response size of each downsampling method as the dataset grows"""
+    import json
+
+    from visualization import METHODS, query
+
+    df = load_data(DATA_PATH)
+    for scale in scales:
+        tiled = pd.concat([df] * scale, ignore_index=True)
+        results = []
+        for method in METHODS:
+            start = time.perf_counter()
+            result = query(tiled, 'Expected_Ride_Duration', 'Historical_Cost_of_Ride', points, method)
+            elapsed = (time.perf_counter() - start) * 1000
+            results.append(f"{method} {elapsed:6.1f} ms {len(json.dumps(result)) / 1024:5.1f} KB")
+        print(f"Visualization {len(tiled):>7,} rows, {points} points: " + " | ".join(results))
+
+
+def bench_search(workers=(1, 2, 4), candidates=9):
+    """
+    Wall time of the hyperparameter search by worker count, on the raw rides.
+    Scaling is only visible with at least as many cores as workers.
+    """
+    import tempfile
+
+    import model_search
+    from feature_spec import FeatureSpec
+
+    source = os.path.join(BASE_DIR, '..', '..', 'Data', 'raw', 'dynamic_pricing.csv')
+    if not os.path.exists(source):
+        print("Search benchmark skipped: no raw rides")
+        return
+    df = load_data(source)
+    spec = FeatureSpec.fit(df)
+    cache_root = model_search.FEATURE_CACHE_DIR
+    with tempfile.TemporaryDirectory() as root:
+        model_search.FEATURE_CACHE_DIR = root
+        start = time.perf_counter()
+        X = spec.transform_frame(df)
+        features_ms = (time.perf_counter() - start) * 1000
+        cache_dir = model_search.cache_features(X, df['Historical_Cost_of_Ride'], 'bench')
+        baseline = None
+        for count in workers:
+            _, leaderboard, summary = model_search.search(cache_dir, np.arange(len(X)), n_candidates=candidates,
+                                                          workers=count)
+            baseline = baseline or summary['wall_seconds']
+            print(f"Search {candidates} candidates, {count} workers on {os.cpu_count()} CPUs: "
+                  f"{summary['wall_seconds']:6.2f} s (speedup {baseline / summary['wall_seconds']:.2f}x, "
+                  f"efficiency {summary['parallel_efficiency']:.2f}), best CV RMSE {leaderboard[0]['cv_rmse']:.2f}")
+    model_search.FEATURE_CACHE_DIR = cache_root
+    print(f"Feature matrix built once in {features_ms:.1f} ms and memory-mapped by every worker")
+
+
+INGESTION_SCRIPT = """
+import contextlib, io, json, resource, sys, time, warnings
+from data_ingestion import data_ingestion_pipeline
+from parity_reference import reference_ingestion
+
+warnings.simplefilter('ignore')
+path, output, mode, workers = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    if mode == 'notebook':
+        reference_ingestion(path, output)
+    else:
+        data_ingestion_pipeline(path, output, block_bytes=4 * 2 ** 20, workers=workers)
+seconds = time.perf_counter() - start
+# VmHWM, not ru_maxrss: a forked process inherits its parent's ru_maxrss
+with open('/proc/self/status') as f:
+    peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+workers_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+print(json.dumps({'seconds': seconds, 'peak_mb': peak / 1024, 'workers_peak_mb': workers_peak / 1024}))
+"""
+
+
+def bench_ingestion(scales=(10, 100, 1000), workers=(1, 4)):
+    """
+    Rows/s and peak resident memory of the notebook's ingestion vs the
+    chunked pipeline, on the dirtied raw rides tiled `scales` times. Each run
+    is a fresh process (Linux: peaks read from /proc).
+    """
+    import json
+    import subprocess
+    import sys
+    import tempfile
+
+    source = os.path.join(BASE_DIR, '..', '..', 'Data', 'raw', 'dynamic_pricing.csv')
+    if not os.path.exists(source):
+        print("Ingestion benchmark skipped: no raw rides")
+        return
+    df = pd.read_csv(source)
+    with tempfile.TemporaryDirectory() as root:
+        for scale in scales:
+            path = os.path.join(root, 'rides.csv')
+            dirty = dirty_rides(df, scale)
+            dirty.to_csv(path, index=False)
+            results = []
+            for mode, count in [('notebook', 1)] + [('chunked', count) for count in workers]:
+                output = subprocess.run([sys.executable, '-c', INGESTION_SCRIPT, path, os.path.join(root, 'out.csv'),
+                                         mode, str(count)], cwd=BASE_DIR, capture_output=True, text=True,
+                                        check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                label = mode if mode == 'notebook' else f"chunked x{count}"
+                peak = f"{result['peak_mb']:5.0f} MB" + (f" +{result['workers_peak_mb']:.0f} MB/worker" if result['workers_peak_mb'] else "")
+                results.append(f"{label} {len(dirty) / result['seconds']:>8,.0f} rows/s peak {peak}")
+            print(f"Ingestion {len(dirty):>9,} rows ({os.path.getsize(path) / 2 ** 20:5.0f} MB): " + " | ".join(results))
+
+
+def bench_whatif(steps=(10, 100, 1000)):
+    """One what-if sweep vs scoring the same scenarios one predict call at a time"""
+    from whatif import sweep
+
+    base = load_rides(1)[0]
+    for n in steps:
+        vary = {'Number_of_Drivers': {'min': 5, 'max': 90, 'steps': n}}
+        start = time.perf_counter()
+        sweep(pricing_model, base, vary)
+        sweep_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for drivers in np.linspace(5, 90, n):
+            pricing_model.predict(dict(base, Number_of_Drivers=drivers))
+        loop_ms = (time.perf_counter() - start) * 1000
+        print(f"What-if {n:>5} scenarios: sweep {sweep_ms:7.2f} ms | one predict per scenario {loop_ms:8.2f} ms "
+              f"({loop_ms / sweep_ms:.0f}x)")
+
+
+def bench_explain(batch_sizes=(1, 100, 1000)):
+    """Scoring time of /api/predict batches with and without ?explain=true"""
+    from routes import predict_prices
+
+    for n in batch_sizes:
+        records = load_rides(n)
+        plain = _latency_percentiles(lambda: predict_prices(records), 10)
+        explained = _latency_percentiles(lambda: predict_prices(records, explain=True), 10)
+        print(f"Explain {n:>5} rows: plain p50 {plain[0]:8.2f} ms | explain p50 {explained[0]:8.2f} ms "
+              f"({explained[0] / n:.2f} ms/row)")
+
+
+def bench_response_formats(rows=10000, repeats=5):
+    """Response build + encoding of a scored /api/predict batch, per format (inference excluded)"""
+    import routes
+    import response_formats
+    from app import create_app
+
+    records = load_rides(rows)
+    predictions = pricing_model.predict(records)
+    app = create_app()
+    score_requests = routes.score_requests
+    # Skip scoring: every format gets the same precomputed prices
+    routes.score_requests = lambda data: (data, predictions)
+    try:
+        with app.app_context():
+            encoders = {'json': lambda: app.json.response(routes.predict_prices(records)).get_data()}
+            for fmt in ('columnar', 'arrow', 'float32'):
+                try:
+                    response_formats.negotiate(fmt=fmt)
+                except response_formats.UnsupportedFormat as e:
+                    print(f"Response format {fmt} skipped: {e}")
+                    continue
+                encoders[fmt] = lambda fmt=fmt: response_formats.encode(routes.predict_columns(records), fmt)[0]
+            for fmt, encode in encoders.items():
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    body = encode()
+                    timings.append(time.perf_counter() - start)
+                print(f"Response {fmt:<8} {rows:>6} rows: {min(timings) * 1000:7.2f} ms, {len(body) / 1024:7.1f} KB")
+    finally:
+        routes.score_requests = score_requests
+
+
+def bench_metrics(requests=3000, rounds=3):
+    """
+    Cost of the predict-path instrumentation: single-ride /api/predict with
+    metrics off and on (interleaved rounds), and the cost of the
+    observations themselves as a share of the request time.
+    """
+    import metrics
+    from app import create_app
+
+    client = create_app().test_client()
+    rides = load_rides(requests)
+    enabled = metrics.enabled
+    totals = {False: 0.0, True: 0.0}
+    try:
+        for _ in range(rounds):
+            for state in (False, True):
+                metrics.enabled = state
+                start = time.perf_counter()
+                for ride in rides:
+                    client.post('/api/predict', json=ride)
+                totals[state] += time.perf_counter() - start
+    finally:
+        metrics.enabled = enabled
+
+    # What an uncached single-ride request records: 7 stage times, the request time and
+    # two row counts, with 12 timer reads
+    histogram = metrics.Histogram('benchmark_seconds', 'Benchmark only', ('stage',))
+    metrics.REGISTRY.remove(histogram)
+    stage = histogram.labels('stage')
+    repeats = 20000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _ in range(12):
+            time.perf_counter()
+        for _ in range(8):
+            stage.observe(0.001)
+        histogram.observe(1, 'rows')
+        histogram.observe(1, 'rows')
+    per_request_cost = (time.perf_counter() - start) / repeats
+    per_request = {state: total / (rounds * requests) for state, total in totals.items()}
+    print(f"Metrics: request {per_request[False] * 1e6:.0f} us off, {per_request[True] * 1e6:.0f} us on "
+          f"({(per_request[True] / per_request[False] - 1):+.1%}); instrumentation {per_request_cost * 1e6:.1f} us "
+          f"= {per_request_cost / per_request[False]:.2%} of the request")
+
+
+def bench_cache(batch_size=100, repeats=200, quantize=None):
+    """
+    Cached vs uncached predict on a stream of batches drawn from the bundled rides,
+    checking that exact-key cached prices equal the uncached ones.
+    """
+    rides = load_rides()
+    rng = np.random.default_rng(42)
+    batches = [[rides[i] for i in rng.integers(0, len(rides), batch_size)] for _ in range(repeats)]
+
+    uncached_p50, _ = _latency_percentiles(lambda: pricing_model.predict(batches[0]), 50)
+    pricing_model.cache = PredictionCache(quantize=quantize)
+    try:
+        for batch in batches:
+            cached = pricing_model.predict(batch)
+            if not quantize and cached != pricing_model._predict_with(pricing_model._loaded, batch).tolist():
+                raise AssertionError("Cached prices differ from the model's prices")
+        cached_p50, _ = _latency_percentiles(lambda: pricing_model.predict(batches[-1]), 50)
+        stats = pricing_model.cache.stats()
+    finally:
+        pricing_model.cache = None
+    print(f"Prediction cache batch={batch_size} quantize={quantize or {}}: hit rate {stats['hit_rate']:.1%} "
+          f"over {repeats} batches, uncached p50 {uncached_p50:.3f} ms, warm p50 {cached_p50:.3f} ms")
+
+
+def bench_coalescer(threads=16, requests_per_thread=200, max_wait_ms=0.5):
+    """Single-row predict throughput from many threads, with and without coalescing"""
+    import threading
+
+    from request_coalescer import PredictionCoalescer
+
+    rides = load_rides()
+    expected = pricing_model.predict(rides)
+    bad_ride = dict(rides[0], Location_Category='Lunar')
+    coalescer = PredictionCoalescer(pricing_model.predict, max_wait_ms=max_wait_ms)
+
+    def run(predict):
+        errors = []
+
+        def client(offset):
+            for i in range(requests_per_thread):
+                idx = (offset * requests_per_thread + i) % len(rides)
+                if predict([rides[idx]]) != [expected[idx]]:
+                    errors.append(rides[idx])
+            # One bad request per thread must fail on its own
+            try:
+                predict([bad_ride])
+                errors.append(bad_ride)
+            except ValueError:
+                pass
+
+        workers = [threading.Thread(target=client, args=(t,)) for t in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise AssertionError(f"{len(errors)} coalesced predictions differ from direct ones")
+        return threads * requests_per_thread / elapsed
+
+    direct = run(pricing_model.predict)
+    coalesced = run(coalescer.predict)
+    stats = coalescer.stats()
+    print(f"Coalescer {threads} threads: direct {direct:,.0f} req/s, coalesced {coalesced:,.0f} req/s, "
+          f"batches {stats['batch_size_histogram']}, queue wait p50 {stats['queue_wait_ms']['p50']} ms "
+          f"p99 {stats['queue_wait_ms']['p99']} ms, {stats['fallbacks']} fallbacks")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the pricing service (parity checks: pytest tests)")
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    bench_rules(args.rows)
+    bench_predict()
+    bench_response_formats()
+    bench_explain()
+    bench_whatif()
+
+    onnx_model = _load_onnx_model()
+    if onnx_model is not None:
+        bench_backends(onnx_model)
+
+    bench_cache()
+    bench_cache(quantize={'Average_Ratings': 0.1, 'Expected_Ride_Duration': 5})
+    bench_coalescer()
+    bench_metrics()
+    bench_startup()
+    bench_snapshot()
+    bench_visualization()
+    bench_search()
+    bench_ingestion()
@@ -0,0 +1,191 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from feature_spec import RAW_CATEGORICAL_COLS, RAW_NUMERIC_COLS
+from models import pricing_model
+from utils import decode_one_hot
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+
+def detect_format(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Can't tell the format of {path}; use .csv, .jsonl or .parquet")
+    return fmt
+
+
+def read_chunks(source, fmt, chunk_size=50000):
+    """
+    Yield DataFrames of at most chunk_size rows from a path or file object.
+    Rides in the one-hot layout of dynamic_pricing.csv are decoded back to
+    the raw categorical columns.
+    """
+    if fmt == 'csv':
+        chunks = pd.read_csv(source, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        chunks = pd.read_json(source, lines=True, chunksize=chunk_size)
+    elif fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size))
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    for chunk in chunks:
+        yield decode_one_hot(chunk)
+
+
+def invalid_rows(chunk, spec):
+    """
+    Mask of the rows the model would reject, found without scoring: missing
+    columns, non-numeric values and labels the encoders don't know
+    """
+    if any(col not in chunk for col in RAW_NUMERIC_COLS + RAW_CATEGORICAL_COLS):
+        return np.ones(len(chunk), dtype=bool)
+    invalid = np.zeros(len(chunk), dtype=bool)
+    for col in RAW_NUMERIC_COLS:
+        values = chunk[col]
+        invalid |= (pd.to_numeric(values, errors='coerce').isna() & values.notna()).to_numpy()
+    # Unknown loyalty levels and vehicle types are scored as missing values; these two raise
+    for col in ('Location_Category', 'Time_of_Booking'):
+        invalid |= ~chunk[col].isin(spec.categories(col)).to_numpy()
+    return invalid
+
+
+def _score_rows(chunk):
+    """Prices of the chunk in one call; if that fails, each half is retried, so only failing rows get NaN"""
+    try:
+        return np.asarray(pricing_model.predict(chunk), dtype=np.float64)
+    except Exception:
+        if len(chunk) == 1:
+            return np.array([np.nan])
+        middle = len(chunk) // 2
+        return np.concatenate([_score_rows(chunk.iloc[:middle]), _score_rows(chunk.iloc[middle:])])
+
+
+def score_chunk(chunk):
+    """
+    The chunk with a predicted_price column. Rows the model can't score
+    (e.g. an unknown Location_Category) get NaN; the others are still
+    scored in one batch.
+    """
+    chunk = chunk.reset_index(drop=True)
+    pricing_model.ensure_loaded()
+    invalid = invalid_rows(chunk, pricing_model.feature_spec)
+    prices = np.full(len(chunk), np.nan)
+    if not invalid.all():
+        prices[~invalid] = _score_rows(chunk[~invalid])
+    return chunk.assign(predicted_price=np.round(prices, 2))
+
+
+def _init_worker():
+    pricing_model.after_fork()
+
+
+def score_chunks(chunks, workers=1):
+    """
+    Score chunks in order. With workers > 1 they are spread over a process
+    pool; at most 2 chunks per worker are in flight, so memory stays bounded.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_chunk(chunk)
+        return
+
+    # On Linux the workers are forked and share the loaded model pages with this process
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV, JSON Lines or Parquet file (or file object)"""
+    def __init__(self, target, fmt):
+        self.target = target
+        self.fmt = fmt
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, chunk):
+        if self.fmt == 'csv':
+            chunk.to_csv(self.target, index=False, header=not self._wrote_header)
+            self._wrote_header = True
+        elif self.fmt == 'jsonl':
+            text = chunk.to_json(orient='records', lines=True)
+            self.target.write(text if text.endswith('\n') else text + '\n')
+        elif self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.target, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            raise ValueError(f"Unknown format: {self.fmt}")
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def reprice_file(input_path, output_path, chunk_size=50000, workers=1):
+    """Stream input_path through the pricing model into output_path; returns a throughput report"""
+    in_fmt, out_fmt = detect_format(input_path), detect_format(output_path)
+    pricing_model.ensure_loaded()
+    start = time.perf_counter()
+    rows = failed = 0
+
+    if out_fmt == 'parquet':
+        f = None
+        writer = ChunkWriter(output_path, out_fmt)
+    else:
+        f = open(output_path, 'w', newline='')
+        writer = ChunkWriter(f, out_fmt)
+    try:
+        for scored in score_chunks(read_chunks(input_path, in_fmt, chunk_size), workers):
+            writer.write(scored)
+            rows += len(scored)
+            failed += int(scored['predicted_price'].isna().sum())
+            elapsed = time.perf_counter() - start
+            print(f"  {rows:,} rows, {rows / elapsed:,.0f} rows/s", flush=True)
+    finally:
+        writer.close()
+        if f is not None:
+            f.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'failed_rows': failed,
+        'seconds': round(elapsed, 2),
+        'rows_per_sec': round(rows / elapsed) if elapsed else None,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reprice a large ride file (CSV, JSON Lines or Parquet) in chunks")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=1, help="Processes to score chunks in parallel")
+    args = parser.parse_args()
+
+    report = reprice_file(args.input, args.output, args.chunk_size, args.workers)
+    print(f"Repriced {report['rows']:,} rows ({report['failed_rows']:,} failed) in {report['seconds']} s: "
+          f"{report['rows_per_sec']:,} rows/s")
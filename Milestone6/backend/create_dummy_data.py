@@ -1,23 +1,27 @@
 import pandas as pd
 import numpy as np
 
-# Create dummy data if original file is missing or corrupted
-def create_dummy_data():
+def make_dummy_rides(rows=1000, seed=None):
+    """Random rides in the raw (unencoded) layout; the same seed gives the same rides"""
+    rng = np.random.RandomState(seed)
     data = {
-        'Number_of_Riders': np.random.randint(20, 100, 1000),
-        'Number_of_Drivers': np.random.randint(5, 89, 1000),
-        'Location_Category': np.random.choice(['Urban', 'Suburban', 'Rural'], 1000),
-        'Customer_Loyalty_Status': np.random.choice(['Regular', 'Silver', 'Gold'], 1000),
-        'Number_of_Past_Rides': np.random.randint(0, 100, 1000),
-        'Average_Ratings': np.random.uniform(3.5, 5.0, 1000),
-        'Time_of_Booking': np.random.choice(['Morning', 'Evening', 'Night', 'Afternoon'], 1000),
-        'Vehicle_Type': np.random.choice(['Economy', 'Premium'], 1000),
-        'Expected_Ride_Duration': np.random.randint(10, 180, 1000),
-        'Historical_Cost_of_Ride': np.random.uniform(26, 836, 1000)
+        'Number_of_Riders': rng.randint(20, 100, rows),
+        'Number_of_Drivers': rng.randint(5, 89, rows),
+        'Location_Category': rng.choice(['Urban', 'Suburban', 'Rural'], rows),
+        'Customer_Loyalty_Status': rng.choice(['Regular', 'Silver', 'Gold'], rows),
+        'Number_of_Past_Rides': rng.randint(0, 100, rows),
+        'Average_Ratings': rng.uniform(3.5, 5.0, rows),
+        'Time_of_Booking': rng.choice(['Morning', 'Evening', 'Night', 'Afternoon'], rows),
+        'Vehicle_Type': rng.choice(['Economy', 'Premium'], rows),
+        'Expected_Ride_Duration': rng.randint(10, 180, rows),
+        'Historical_Cost_of_Ride': rng.uniform(26, 836, rows)
     }
-    
-    df = pd.DataFrame(data)
-    
+    return pd.DataFrame(data)
+
+# Create dummy data if original file is missing or corrupted
+def create_dummy_data(rows=1000, seed=None):
+    df = make_dummy_rides(rows, seed)
+
     # Save to standard location
     import os
     os.makedirs('../../Data/raw', exist_ok=True)
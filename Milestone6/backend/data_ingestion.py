@@ -0,0 +1,329 @@
+"""
+Out-of-core version of data_ingestion_pipeline from the Milestone 2 notebook.
+
+Same steps and output as the notebook: detect categorical and numerical
+columns, impute (median / mode), one-hot encode (drop_first), drop
+duplicate rows and write the CSV. The input is never loaded whole; it is
+split into byte ranges on line boundaries and read in two passes:
+
+1. Every block is parsed and summarized in parallel (column types, null
+   counts, category counts, a histogram per numeric column). A short extra
+   pass over only the columns that need it makes the medians exact.
+2. Every block is imputed and encoded in parallel with those statistics,
+   then de-duplicated and written in input order.
+
+Memory is bounded by block_bytes per worker plus 8 bytes per distinct
+output row (the 64-bit row hashes used for de-duplication). Quoted fields
+must not contain newlines.
+
+    python data_ingestion.py ../../Data/raw/dynamic_pricing.csv --output dynamic_pricing.csv
+"""
+import io
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BLOCK_BYTES = 32 * 1024 * 1024
+
+# Numeric histograms: the top bits of an order-preserving uint64 key of the float64 value
+HISTOGRAM_SHIFT = 44
+
+
+def _blocks(path, block_bytes):
+    """(header bytes, [(start, end), ...]): byte ranges of the body, each ending after a newline"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        blocks = []
+        start = len(header)
+        while start < size:
+            f.seek(min(start + block_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            blocks.append((start, end))
+            start = end
+    return header, blocks
+
+
+def _read_block(path, header, start, end, dtype=None, usecols=None):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), dtype=dtype, usecols=usecols)
+
+
+def _sort_key(values):
+    """uint64 keys that sort like the float64 values"""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    return np.where(bits >> np.uint64(63), ~bits, bits | np.uint64(1 << 63))
+
+
+def _kind(series):
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return 'int'
+    if pd.api.types.is_float_dtype(series.dtype):
+        return 'empty' if series.isna().all() else 'float'
+    return 'str'
+
+
+def _summarize(task):
+    """Pass 1 for one block: per column its kind, rows, nulls and value counts or histogram"""
+    path, header, (start, end) = task
+    df = _read_block(path, header, start, end)
+    summary = {}
+    for col in df.columns:
+        series = df[col]
+        kind = _kind(series)
+        values = series.dropna()
+        entry = {'kind': kind, 'nulls': int(series.isna().sum())}
+        if kind in ('int', 'float'):
+            bins, counts = np.unique(_sort_key(values.to_numpy(dtype=np.float64)) >> np.uint64(HISTOGRAM_SHIFT),
+                                     return_counts=True)
+            entry['histogram'] = dict(zip(bins.tolist(), counts.tolist()))
+        elif kind in ('str', 'bool'):
+            entry['counts'] = Counter(values.tolist())
+        summary[col] = entry
+    return len(df), summary
+
+
+def _merge_kinds(kinds, nulls):
+    kinds = set(kinds) - {'empty'}
+    if not kinds:
+        return 'float'
+    if 'str' in kinds:
+        return 'str'
+    if 'bool' in kinds:
+        if kinds != {'bool'} or nulls:
+            raise ValueError("Boolean columns with missing or non-boolean values are not supported")
+        return 'bool'
+    return 'float' if 'float' in kinds or nulls else 'int'
+
+
+DTYPES = {'int': 'int64', 'float': 'float64', 'bool': 'bool', 'str': 'str'}
+
+
+def _collect(task):
+    """
+    Extra pass for one block, with the final dtypes: the values of each
+    median column that fall into its target histogram bins, and category
+    counts of string columns this block had parsed as another type.
+    """
+    path, header, (start, end), dtypes, median_bins, recount = task
+    df = _read_block(path, header, start, end, dtype=dtypes, usecols=list(median_bins) + recount)
+    found = {}
+    for col, bins in median_bins.items():
+        values = df[col].dropna().to_numpy(dtype=np.float64)
+        in_bins = np.isin(_sort_key(values) >> np.uint64(HISTOGRAM_SHIFT), np.array(bins, dtype=np.uint64))
+        found[col] = values[in_bins]
+    counts = {col: Counter(df[col].dropna().tolist()) for col in recount}
+    return found, counts
+
+
+def _median_bins(histogram, n):
+    """The bins holding the middle value(s) of n sorted values, with the count before the first"""
+    ranks = sorted({(n - 1) // 2, n // 2})
+    bins, before, seen = [], None, 0
+    for b in sorted(histogram):
+        if any(seen <= rank < seen + histogram[b] for rank in ranks):
+            if before is None:
+                before = seen
+            bins.append(b)
+        seen += histogram[b]
+    return bins, before, ranks
+
+
+class IngestionPlan:
+    """What pass 1 learned: dtypes, column roles, fill values and category vocabularies"""
+    def __init__(self, columns, dtypes, categorical_cols, numerical_cols, fill_values, vocabularies):
+        self.columns = columns
+        self.dtypes = dtypes
+        self.categorical_cols = categorical_cols
+        self.numerical_cols = numerical_cols
+        self.fill_values = fill_values
+        self.vocabularies = vocabularies
+
+
+def _transform(task):
+    """Pass 2 for one block: (header, CSV body, 64-bit row hashes) of its distinct imputed, encoded rows"""
+    path, header, (start, end), plan = task
+    df = _read_block(path, header, start, end, dtype=plan.dtypes)
+    for col, value in plan.fill_values.items():
+        df[col] = df[col].fillna(value)
+    for col in plan.categorical_cols:
+        # The full vocabulary, so every block gets the same dummy columns
+        df[col] = pd.Categorical(df[col], categories=plan.vocabularies[col])
+    df = pd.get_dummies(df, columns=plan.categorical_cols, drop_first=True)
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    # Duplicates within the block are dropped before formatting, the costliest step
+    first = ~pd.Series(hashes).duplicated().to_numpy()
+    if not first.all():
+        df, hashes = df[first], hashes[first]
+    return df.iloc[:0].to_csv(index=False), df.to_csv(index=False, header=False), hashes
+
+
+class _SeenRows:
+    """Hashes of the rows written so far, as sorted runs merged like an LSM tree"""
+    def __init__(self):
+        self.runs = []
+
+    def contains(self, hashes):
+        seen = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            seen |= run[positions] == hashes
+        return seen
+
+    def add(self, hashes):
+        run = np.sort(hashes)
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]))
+        self.runs.append(run)
+
+
+def _ordered_map(executor, fn, tasks, window):
+    """executor.map with at most `window` results pending, so memory stays bounded"""
+    if executor is None:
+        yield from map(fn, tasks)
+        return
+    pending = []
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def fit_plan(path, header, blocks, executor=None, window=2):
+    """Pass 1 (plus the extra pass when needed): the IngestionPlan of the file"""
+    rows = 0
+    merged = {}
+    for block_rows, summary in _ordered_map(executor, _summarize, [(path, header, b) for b in blocks], window):
+        rows += block_rows
+        for col, entry in summary.items():
+            target = merged.setdefault(col, {'kinds': [], 'nulls': 0, 'histogram': Counter(), 'counts': Counter()})
+            target['kinds'].append(entry['kind'])
+            target['nulls'] += entry['nulls']
+            target['histogram'].update(entry.get('histogram', {}))
+            target['counts'].update(entry.get('counts', {}))
+    if not rows:
+        raise ValueError(f"{path} has no rows")
+
+    columns = list(merged)
+    kinds = {col: _merge_kinds(merged[col]['kinds'], merged[col]['nulls']) for col in columns}
+    dtypes = {col: DTYPES[kinds[col]] for col in columns}
+    # As select_dtypes in the notebook: booleans are neither
+    categorical_cols = [col for col in columns if kinds[col] == 'str']
+    numerical_cols = [col for col in columns if kinds[col] in ('int', 'float')]
+
+    # Blocks that parsed a string column as numbers counted nothing for it
+    recount = [col for col in categorical_cols if set(merged[col]['kinds']) - {'str', 'empty'}]
+    median_cols = [col for col in numerical_cols if merged[col]['nulls']]
+    fill_values, vocabularies = {}, {}
+    if recount or median_cols:
+        median_bins = {}
+        medians = {}
+        for col in median_cols:
+            histogram = merged[col]['histogram']
+            n = sum(histogram.values())
+            if n:
+                medians[col] = _median_bins(histogram, n)
+                median_bins[col] = medians[col][0]
+        counts = {col: Counter() for col in recount}
+        found = {col: [] for col in median_bins}
+        tasks = [(path, header, b, dtypes, median_bins, recount) for b in blocks]
+        for block_found, block_counts in _ordered_map(executor, _collect, tasks, window):
+            for col, values in block_found.items():
+                found[col].append(values)
+            for col, block_count in block_counts.items():
+                counts[col].update(block_count)
+        for col in recount:
+            merged[col]['counts'] = counts[col]
+        for col, (bins, before, ranks) in medians.items():
+            values = np.sort(np.concatenate(found[col]))
+            fill_values[col] = float(np.mean([values[rank - before] for rank in ranks]))
+
+    for col in categorical_cols:
+        counts = merged[col]['counts']
+        vocabularies[col] = sorted(counts)
+        if merged[col]['nulls'] and counts:
+            # Series.mode(): the most frequent values, sorted; the notebook takes the first
+            top = max(counts.values())
+            fill_values[col] = min(value for value, count in counts.items() if count == top)
+    return rows, IngestionPlan(columns, dtypes, categorical_cols, numerical_cols, fill_values, vocabularies)
+
+
+def data_ingestion_pipeline(file_path, output_path=None, block_bytes=BLOCK_BYTES, workers=None):
+    """
+    Clean the CSV at file_path into output_path (default: cleaned_<name> in
+    the working directory, as the notebook does). Returns a summary dict.
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    output_path = output_path or "cleaned_" + os.path.basename(file_path)
+    print(f"🚀 Loading data from: {file_path}")
+    header, blocks = _blocks(file_path, block_bytes)
+    window = 2 * workers
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(blocks) > 1 else None
+    try:
+        rows, plan = fit_plan(file_path, header, blocks, executor, window)
+        print(f"\n✅ Step 1: {rows} rows, {len(plan.columns)} columns in {len(blocks)} blocks")
+        print("\nCategorical Columns:", plan.categorical_cols)
+        print("Numerical Columns:", plan.numerical_cols)
+        print("\n🧩 Handling Missing Values...", f"(filled: {list(plan.fill_values)})" if plan.fill_values else "")
+        print("\n🔡 Encoding categorical features...")
+
+        seen = _SeenRows()
+        written = 0
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', newline='') as out:
+            tasks = [(file_path, header, b, plan) for b in blocks]
+            for i, (csv_header, body, hashes) in enumerate(_ordered_map(executor, _transform, tasks, window)):
+                if i == 0:
+                    out.write(csv_header)
+                keep = ~seen.contains(hashes)
+                seen.add(hashes[keep])
+                written += int(keep.sum())
+                if keep.all():
+                    out.write(body)
+                else:
+                    lines = body.split(os.linesep)
+                    out.write(''.join(line + os.linesep for line, k in zip(lines, keep) if k))
+        os.replace(tmp_path, output_path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    seconds = time.perf_counter() - start_time
+    print(f"\n🧹 Removed {rows - written} duplicate rows")
+    print(f"\n💾 Cleaned data saved to: {output_path} ({rows / seconds:,.0f} rows/s)")
+    return {
+        'output': output_path,
+        'rows': rows,
+        'written': written,
+        'duplicates': rows - written,
+        'categorical_cols': plan.categorical_cols,
+        'numerical_cols': plan.numerical_cols,
+        'fill_values': plan.fill_values,
+        'seconds': round(seconds, 3),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clean and one-hot encode a CSV out of core (Milestone 2 pipeline)")
+    parser.add_argument('path')
+    parser.add_argument('--output', help="Output CSV (default: cleaned_<name>)")
+    parser.add_argument('--block-mb', type=float, default=BLOCK_BYTES / 2 ** 20, help="Bytes per block, in MiB")
+    parser.add_argument('--workers', type=int, help="Processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    data_ingestion_pipeline(args.path, args.output, int(args.block_mb * 2 ** 20), args.workers)
@@ -0,0 +1,246 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds are not serialized
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.environ.get('DATA_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'data_snapshots'))
+
+# Seconds a replaced build stays on disk, for workers that read its meta.json
+# just before the rebuild and are about to map it
+BUILD_GRACE_SECONDS = 600
+
+# Per-process view of the snapshots already mapped, by source path
+_loaded = {}
+
+
+def _fingerprint(st):
+    # No inode: a snapshot built into an image layer stays valid in the container
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _snapshot_dir(path):
+    path = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(SNAPSHOT_DIR, f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:10]}")
+
+
+def _smallest_int(values):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if values.min() >= info.min and values.max() <= info.max:
+            return dtype
+    return np.int64
+
+
+def _encode_column(series):
+    """(array, column metadata) in the narrowest lossless type"""
+    if series.dtype == bool:
+        return series.to_numpy(), {'kind': 'bool'}
+    if pd.api.types.is_integer_dtype(series.dtype):
+        values = series.to_numpy()
+        return values.astype(_smallest_int(values) if len(values) else np.int8), {'kind': 'int'}
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64), {'kind': 'float'}
+    categorical = pd.Categorical(series)
+    codes = categorical.codes
+    return codes.astype(_smallest_int(codes) if len(codes) else np.int8), {
+        'kind': 'category', 'categories': [str(c) for c in categorical.categories]}
+
+
+def _read_source(path, st):
+    """The CSV as of `st`: complete lines only, so a ride being appended is left out"""
+    with open(path, 'rb') as f:
+        data = f.read(st.st_size)
+    data = data[:data.rfind(b'\n') + 1] if b'\n' in data else data
+    return pd.read_csv(io.BytesIO(data)), data
+
+
+def build_snapshot(path):
+    """Convert the CSV at `path` into a snapshot; returns the snapshot metadata"""
+    directory = _snapshot_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    st = os.stat(path)
+    df, data = _read_source(path, st)
+
+    # Each build in its own directory, so replacing it never touches files a reader is about to map
+    build_id = uuid.uuid4().hex[:12]
+    build_dir = f"build-{build_id}"
+    os.makedirs(os.path.join(directory, build_dir))
+    columns = []
+    for name in df.columns:
+        values, column = _encode_column(df[name])
+        column.update(name=name, file=f"{build_dir}/{len(columns):03d}.npy", dtype=str(values.dtype))
+        np.save(os.path.join(directory, column['file']), values)
+        columns.append(column)
+
+    meta = {
+        'source': os.path.abspath(path),
+        'source_fingerprint': _fingerprint(st),
+        # How much of the file is in the snapshot, and its last bytes, so readers that
+        # tail the CSV (kpi_store) can tell it was only appended to since
+        'source_bytes': len(data),
+        'source_tail': data[-64:].hex(),
+        'rows': len(df),
+        'build_id': build_id,
+        'columns': columns,
+    }
+    tmp_path = os.path.join(directory, f"meta.json.{build_id}")
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+
+    _retire_builds(directory, build_dir)
+    return meta
+
+
+def _retire_builds(directory, current):
+    """
+    Mark the builds replaced by `current` as retired, and delete those retired
+    more than BUILD_GRACE_SECONDS ago. Processes that already map a deleted
+    build keep its data until they let go.
+    """
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith('.npy'):
+            # Column files of the earlier flat layout
+            if now - os.path.getmtime(path) > BUILD_GRACE_SECONDS:
+                os.remove(path)
+            continue
+        if not name.startswith('build-') or name == current:
+            continue
+        marker = os.path.join(path, '.retired')
+        try:
+            retired = os.path.getmtime(marker)
+        except FileNotFoundError:
+            open(marker, 'w').close()
+            continue
+        if now - retired > BUILD_GRACE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(_snapshot_dir(path), 'meta.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _map_snapshot(path, meta):
+    directory = _snapshot_dir(path)
+    data = {}
+    for column in meta['columns']:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+        if column['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, categories=column['categories'])
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def ensure_snapshot(path):
+    """Metadata of an up-to-date snapshot of `path`, (re)building it if the CSV changed"""
+    fingerprint = _fingerprint(os.stat(path))
+    meta = read_meta(path)
+    if meta is not None and meta['source_fingerprint'] == fingerprint:
+        return meta
+
+    directory = _snapshot_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another worker may have built it while we waited
+        meta = read_meta(path)
+        if meta is not None and meta['source_fingerprint'] == _fingerprint(os.stat(path)):
+            return meta
+        print(f"Building data snapshot of {path}...")
+        return build_snapshot(path)
+
+
+def load_snapshot(path):
+    """
+    The CSV at `path` as a DataFrame backed by its memory-mapped snapshot,
+    with the same columns (categoricals as pandas categories, ints narrowed).
+    Returns (df, meta), or (None, None) if the file does not exist. The
+    snapshot is rebuilt only when the CSV changes.
+    """
+    try:
+        fingerprint = _fingerprint(os.stat(path))
+    except FileNotFoundError:
+        return None, None
+    key = os.path.abspath(path)
+    cached = _loaded.get(key)
+    if cached is not None and cached[1]['source_fingerprint'] == fingerprint:
+        return cached
+    meta = ensure_snapshot(path)
+    try:
+        df = _map_snapshot(path, meta)
+    except FileNotFoundError:
+        # A build retired and deleted since we read its meta.json: map the current one
+        meta = ensure_snapshot(path)
+        df = _map_snapshot(path, meta)
+    cached = _loaded[key] = (df, meta)
+    return cached
+
+
+def load_rides(path):
+    """The rides at `path` from the snapshot, or None if the file does not exist"""
+    return load_snapshot(path)[0]
+
+
+def read_appended(path, offset, tail):
+    """
+    The rides appended to the CSV after byte `offset`, whose preceding bytes
+    were `tail` (hex, as in source_tail). Returns (df, row_ends), row_ends
+    being the byte offset just past each ride, or (None, None) if the file
+    was rewritten rather than appended to. Complete lines only.
+    """
+    expected_tail = bytes.fromhex(tail)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset - len(expected_tail), 0))
+        if f.read(len(expected_tail)) != expected_tail:
+            return None, None
+        data = f.read()
+    data = data[:data.rfind(b'\n') + 1]
+    row_ends = offset + np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n')) + 1
+    if not len(row_ends):
+        return pd.read_csv(io.BytesIO(header), nrows=0), row_ends
+    # Keep blank lines while parsing so rows line up with row_ends, then drop them
+    df = pd.read_csv(io.BytesIO(header + data), skip_blank_lines=False)
+    rides = ~df.isna().all(axis=1).to_numpy()
+    return df[rides].reset_index(drop=True), row_ends[rides]
+
+
+def tail_before(path, offset, size=64):
+    """The `size` bytes before `offset` as hex, for a later read_appended"""
+    with open(path, 'rb') as f:
+        f.seek(max(offset - size, 0))
+        return f.read(offset - max(offset - size, 0)).hex()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build columnar snapshots of ride CSVs")
+    parser.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        meta = build_snapshot(path)
+        size = sum(os.path.getsize(os.path.join(_snapshot_dir(path), c['file'])) for c in meta['columns'])
+        print(f"✅ {path}: {meta['rows']:,} rows, {os.path.getsize(path) / 1e6:.2f} MB CSV -> "
+              f"{size / 1e6:.2f} MB snapshot in {_snapshot_dir(path)}")
@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+RAW_NUMERIC_COLS = ['Number_of_Riders', 'Number_of_Drivers', 'Number_of_Past_Rides',
+                    'Average_Ratings', 'Expected_Ride_Duration']
+
+RAW_CATEGORICAL_COLS = ['Location_Category', 'Customer_Loyalty_Status', 'Time_of_Booking', 'Vehicle_Type']
+
+FEATURE_COLS = ['Number_of_Riders', 'Number_of_Drivers', 'Number_of_Past_Rides',
+                'Average_Ratings', 'Expected_Ride_Duration', 'Demand_Ratio',
+                'Supply_Constraint', 'Location_Encoded', 'Time_Encoded',
+                'Loyalty_Encoded', 'Vehicle_Encoded', 'Market_Saturation',
+                'Rider_Loyalty_Score', 'Duration_Per_Rider', 'Capacity_Utilization',
+                'Premium_Factor', 'Surge_Indicator']
+
+LOYALTY_MAPPING = {'Regular': 0, 'Silver': 1, 'Gold': 2}
+VEHICLE_MAPPING = {'Economy': 0, 'Premium': 1}
+
+# Constants the serving code hardcoded before they were stored in the artifact
+LEGACY_DEMAND_RATIO_MAX = 17.6
+LEGACY_SURGE_THRESHOLD = 3.8
+
+
+class UnseenLabelError(ValueError):
+    """A categorical value the model was not trained on"""
+
+
+class FeatureSpec:
+    """
+    Single definition of the pricing features, used by both training and serving.
+    The data-dependent constants are fitted once at training time and stored in
+    the model artifact, so serving never recomputes them.
+    """
+    def __init__(self, location_vocab, time_vocab, demand_ratio_max, surge_threshold,
+                 loyalty_mapping=None, vehicle_mapping=None, feature_cols=None):
+        self.location_vocab = [str(label) for label in location_vocab]
+        self.time_vocab = [str(label) for label in time_vocab]
+        self.demand_ratio_max = float(demand_ratio_max)
+        self.surge_threshold = float(surge_threshold)
+        self.loyalty_mapping = dict(loyalty_mapping or LOYALTY_MAPPING)
+        self.vehicle_mapping = dict(vehicle_mapping or VEHICLE_MAPPING)
+        self.feature_cols = list(feature_cols or FEATURE_COLS)
+
+        # LabelEncoder semantics: code is the position in the sorted vocabulary
+        self.location_codes = {label: code for code, label in enumerate(self.location_vocab)}
+        self.time_codes = {label: code for code, label in enumerate(self.time_vocab)}
+
+    @classmethod
+    def fit(cls, df):
+        """Fit the vocabularies and constants on the training dataframe"""
+        riders = np.asarray(df['Number_of_Riders'], dtype=np.float64)
+        drivers = np.asarray(df['Number_of_Drivers'], dtype=np.float64)
+        demand_ratio = riders / (drivers + 1e-5)
+        return cls(
+            location_vocab=np.unique(np.asarray(df['Location_Category'], dtype=str)),
+            time_vocab=np.unique(np.asarray(df['Time_of_Booking'], dtype=str)),
+            demand_ratio_max=demand_ratio.max(),
+            surge_threshold=np.quantile(demand_ratio, 0.75),
+        )
+
+    @classmethod
+    def from_artifacts(cls, artifacts):
+        """Build the spec stored in a model artifact, falling back to the legacy encoders"""
+        if 'feature_spec' in artifacts:
+            return cls.from_dict(artifacts['feature_spec'])
+        return cls(
+            location_vocab=artifacts['le_location'].classes_,
+            time_vocab=artifacts['le_time'].classes_,
+            demand_ratio_max=LEGACY_DEMAND_RATIO_MAX,
+            surge_threshold=LEGACY_SURGE_THRESHOLD,
+            loyalty_mapping=artifacts['loyalty_mapping'],
+            vehicle_mapping=artifacts['vehicle_mapping'],
+            feature_cols=artifacts['feature_cols'],
+        )
+
+    def to_dict(self):
+        return {
+            'location_vocab': self.location_vocab,
+            'time_vocab': self.time_vocab,
+            'demand_ratio_max': self.demand_ratio_max,
+            'surge_threshold': self.surge_threshold,
+            'loyalty_mapping': self.loyalty_mapping,
+            'vehicle_mapping': self.vehicle_mapping,
+            'feature_cols': self.feature_cols,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def categories(self, column):
+        """The values the model knows for a raw categorical column"""
+        return {
+            'Location_Category': self.location_vocab,
+            'Time_of_Booking': self.time_vocab,
+            'Customer_Loyalty_Status': list(self.loyalty_mapping),
+            'Vehicle_Type': list(self.vehicle_mapping),
+        }[column]
+
+    @staticmethod
+    def _encode_labels(values, codes, field):
+        try:
+            return np.fromiter((codes[value] for value in values), dtype=np.float64, count=len(values))
+        except KeyError as e:
+            raise UnseenLabelError(f"y contains previously unseen labels: {field}={e.args[0]!r}")
+
+    @staticmethod
+    def _map_values(values, mapping):
+        # Same as pandas .map: unknown values become NaN (treated as missing by the model)
+        return np.fromiter((mapping.get(value, np.nan) for value in values), dtype=np.float64, count=len(values))
+
+    def transform(self, input_data, dtype=np.float32, timings=None):
+        """
+        Encode request records (list of dicts) or a column mapping (DataFrame,
+        dict of arrays) into a feature matrix in feature_cols order.
+        Returns (X, rule_inputs), where rule_inputs holds the float64 columns
+        needed by the dynamic pricing rules. If a timings dict is given, the
+        seconds spent encoding categoricals are stored under 'encoders'.
+        """
+        if isinstance(input_data, dict) and np.ndim(input_data['Number_of_Riders']) == 0:
+            input_data = [input_data]
+
+        if isinstance(input_data, list):
+            n_rows = len(input_data)
+            raw = {col: np.fromiter((record[col] for record in input_data), dtype=np.float64, count=n_rows)
+                   for col in RAW_NUMERIC_COLS}
+            categorical = {col: [record[col] for record in input_data] for col in RAW_CATEGORICAL_COLS}
+        else:
+            raw = {col: np.asarray(input_data[col], dtype=np.float64) for col in RAW_NUMERIC_COLS}
+            n_rows = len(raw['Number_of_Riders'])
+            categorical = {col: list(input_data[col]) for col in RAW_CATEGORICAL_COLS}
+
+        riders = raw['Number_of_Riders']
+        drivers = raw['Number_of_Drivers']
+        ratings = raw['Average_Ratings']
+
+        encode_start = time.perf_counter()
+        vehicle_encoded = self._map_values(categorical['Vehicle_Type'], self.vehicle_mapping)
+        location_encoded = self._encode_labels(categorical['Location_Category'], self.location_codes,
+                                               'Location_Category')
+        time_encoded = self._encode_labels(categorical['Time_of_Booking'], self.time_codes, 'Time_of_Booking')
+        loyalty_encoded = self._map_values(categorical['Customer_Loyalty_Status'], self.loyalty_mapping)
+        if timings is not None:
+            timings['encoders'] = time.perf_counter() - encode_start
+
+        columns = dict(raw)
+        columns['Demand_Ratio'] = riders / (drivers + 1e-5)
+        columns['Supply_Constraint'] = riders > drivers
+        columns['Market_Saturation'] = drivers / (riders + 1e-5)
+        columns['Rider_Loyalty_Score'] = raw['Number_of_Past_Rides'] * 0.5 + ratings * 10
+        columns['Duration_Per_Rider'] = raw['Expected_Ride_Duration'] / (riders + 1e-5)
+        columns['Capacity_Utilization'] = columns['Demand_Ratio'] / (self.demand_ratio_max + 1e-5)
+        columns['Premium_Factor'] = vehicle_encoded * ratings
+        columns['Surge_Indicator'] = columns['Demand_Ratio'] > self.surge_threshold
+        columns['Location_Encoded'] = location_encoded
+        columns['Time_Encoded'] = time_encoded
+        columns['Loyalty_Encoded'] = loyalty_encoded
+        columns['Vehicle_Encoded'] = vehicle_encoded
+
+        X = np.empty((n_rows, len(self.feature_cols)), dtype=dtype)
+        for idx, col in enumerate(self.feature_cols):
+            X[:, idx] = columns[col]
+
+        rule_inputs = {
+            'Demand_Ratio': columns['Demand_Ratio'],
+            'Market_Saturation': columns['Market_Saturation'],
+            'Surge_Indicator': columns['Surge_Indicator'].astype(np.int8),
+            'Vehicle_Type': np.asarray(categorical['Vehicle_Type'], dtype=object),
+        }
+        return X, rule_inputs
+
+    def transform_frame(self, df):
+        """Feature matrix as a DataFrame with named columns, for model training"""
+        import pandas as pd
+
+        X, _ = self.transform(df)
+        return pd.DataFrame(X, columns=self.feature_cols, index=df.index)
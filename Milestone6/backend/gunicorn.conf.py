@@ -0,0 +1,29 @@
+# Gunicorn picks this file up automatically from the working directory.
+import gc
+import os
+
+# MODEL_LOAD_MODE=preload imports the app (and loads the model) once in the
+# master, so every worker shares the model pages copy-on-write after fork.
+preload_app = os.environ.get('MODEL_LOAD_MODE', 'eager') == 'preload'
+
+# ASGI mode: --worker-class uvicorn_worker.UvicornWorker asgi:app (the uvicorn-worker
+# package; uvicorn.workers is deprecated).
+
+# More than one thread per worker (gthread) lets concurrent predict calls be
+# coalesced into one batch (PREDICT_COALESCE_WAIT_MS, see request_coalescer.py).
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far out of the garbage collector's reach so
+        # collections in the workers don't write to (and un-share) those pages.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from models import pricing_model, MODEL_WATCH_INTERVAL
+        pricing_model.after_fork()
+        # Threads don't survive fork, so each worker runs its own model watcher
+        pricing_model.start_watcher(MODEL_WATCH_INTERVAL)
@@ -0,0 +1,284 @@
+import io
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+TAIL_CHECK_BYTES = 64
+READ_BLOCK_BYTES = 16 * 1024 * 1024
+
+# Read position and file aggregates, as shared between workers
+SHARED_FIELDS = ('_offset', '_header', '_tail', 'count', 'rating_sum', 'cost_sum', 'scored_count',
+                 'scored_cost_sum', 'price_sum')
+
+# How often a worker publishes its served-prediction totals to the shared cache
+SERVED_PUBLISH_SECONDS = 1.0
+
+
+class KpiStore:
+    """
+    Running dashboard aggregates over the rides CSV.
+
+    The first refresh() starts from the file's columnar snapshot
+    (data_snapshot); each later one reads only the bytes appended since, so
+    /api/kpi costs a stat() call while the file is unchanged. The file is
+    reread from the start if it was replaced or rewritten. When another model
+    is being served (the revenue lift depends on it), the rides are rescored
+    in a background thread and the previous figures are served meanwhile.
+    Model R² is the held-out score recorded in the artifact at training.
+
+    With a shared_cache (shared_cache.SharedCache), the aggregates of that
+    first pass are computed by one worker on the host and picked up by the
+    others, which then only read what was appended since, and the
+    served-prediction totals are summed over the workers. Without one they
+    are this worker's only.
+    """
+    def __init__(self, path, pricing_model, shared_cache=None):
+        self.path = path
+        self.pricing_model = pricing_model
+        self.shared_cache = shared_cache
+        self._lock = threading.Lock()
+        self._reset()
+        self._rebuild = None
+        # Served predictions (only those that came with a Historical_Cost_of_Ride)
+        self.served_count = 0
+        self.served_price_sum = 0.0
+        self.served_baseline_sum = 0.0
+        self._served_published = 0.0
+        self._worker = None
+
+    def _reset(self):
+        self._offset = 0
+        self._inode = None
+        self._header = None
+        self._tail = b''
+        self._model_key = None
+        self.count = 0
+        self.rating_sum = 0.0
+        self.cost_sum = 0.0
+        # Model aggregates: revenue lift of the final prices
+        self.scored_count = 0
+        self.scored_cost_sum = 0.0
+        self.price_sum = 0.0
+
+    def _current_model_key(self):
+        model = self.pricing_model
+        return (model.is_loaded, model.version, model.reload_count)
+
+    def refresh(self):
+        """Fold any rides appended to the file since the last call into the aggregates"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset or not self._tail_matches():
+                self._reset()
+                self._inode = st.st_ino
+                self._model_key = self._current_model_key()
+            elif self._current_model_key() != self._model_key:
+                self._start_rebuild()
+            if self._offset == 0 and st.st_size:
+                self._load_initial(st)
+            if st.st_size > self._offset:
+                self._read_from_offset()
+
+    def _start_rebuild(self):
+        """Rescore the rides with the model now being served, off the request path"""
+        if self._rebuild is not None and self._rebuild.is_alive():
+            return
+        self._rebuild = threading.Thread(target=self._rebuild_for_model, daemon=True, name='kpi-rebuild')
+        self._rebuild.start()
+
+    def _rebuild_for_model(self):
+        fresh = KpiStore(self.path, self.pricing_model, self.shared_cache)
+        try:
+            fresh.refresh()
+        except Exception as e:
+            print(f"❌ Error rescoring rides for KPIs: {e}")
+            return
+        with self._lock:
+            # Replaced while we rescored it: the next refresh starts over anyway
+            if fresh._inode != self._inode:
+                return
+            for name in SHARED_FIELDS + ('_model_key',):
+                setattr(self, name, getattr(fresh, name))
+
+    def _tail_matches(self):
+        """The last bytes we consumed are still there (the file was appended to, not rewritten)"""
+        if not self._tail:
+            return True
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset - len(self._tail))
+            return f.read(len(self._tail)) == self._tail
+
+    def _load_initial(self, st):
+        """The first pass over the file: shared by the workers when there is a shared cache"""
+        key = self._shared_key(st)
+        if key is None:
+            self._load_snapshot()
+            return
+        from shared_cache import get_or_set
+
+        computed = []
+
+        def compute():
+            self._load_snapshot()
+            computed.append(True)
+            return self._state() if self._offset else None
+        state = get_or_set(self.shared_cache, key, compute, timeout=86400)
+        if computed or state is None:
+            return
+        self.__dict__.update(state)
+        if self._offset > st.st_size or not self._tail_matches():
+            # Not this file's prefix after all: compute it here
+            inode, model_key = self._inode, self._model_key
+            self._reset()
+            self._inode, self._model_key = inode, model_key
+            self._load_snapshot()
+
+    def _shared_key(self, st):
+        """Cache key of the first-pass aggregates: this file and the model file being served"""
+        if self.shared_cache is None:
+            return None
+        loaded = self.pricing_model._loaded
+        if loaded is None:
+            return f"kpi:{os.path.abspath(self.path)}:{st.st_ino}:no-model"
+        try:
+            model_mtime = os.stat(loaded.model_path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+        return f"kpi:{os.path.abspath(self.path)}:{st.st_ino}:{loaded.model_path}:{loaded.version}:{model_mtime}"
+
+    def _state(self):
+        return {name: getattr(self, name) for name in SHARED_FIELDS}
+
+    def _load_snapshot(self):
+        """Start from the columnar snapshot of the file instead of parsing it"""
+        from data_snapshot import load_snapshot
+        from utils import decode_one_hot
+
+        df, meta = load_snapshot(self.path)
+        if df is None:
+            return
+        expected_tail = bytes.fromhex(meta['source_tail'])
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            f.seek(meta['source_bytes'] - len(expected_tail))
+            # Rewritten since the snapshot was taken: read the CSV instead
+            if f.read(len(expected_tail)) != expected_tail:
+                return
+        if len(df):
+            self._add_rides(decode_one_hot(df))
+        self._header, self._offset, self._tail = header, meta['source_bytes'], expected_tail
+
+    def _read_from_offset(self):
+        import pandas as pd
+        from utils import decode_one_hot
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            while True:
+                data = f.read(READ_BLOCK_BYTES)
+                # Only complete lines; a ride being written right now is picked up next time
+                end = data.rfind(b'\n') + 1
+                if end == 0:
+                    return
+                data = data[:end]
+                f.seek(self._offset + end)
+                if self._header is None:
+                    header_end = data.index(b'\n') + 1
+                    self._header = data[:header_end]
+                    body = data[header_end:]
+                else:
+                    body = data
+                if body.strip():
+                    self._add_rides(decode_one_hot(pd.read_csv(io.BytesIO(self._header + body))))
+                self._offset += end
+                self._tail = data[-TAIL_CHECK_BYTES:]
+
+    def _add_rides(self, df):
+        cost = df['Historical_Cost_of_Ride'].to_numpy(dtype=np.float64)
+        self.count += len(df)
+        self.rating_sum += float(df['Average_Ratings'].sum())
+        self.cost_sum += float(cost.sum())
+
+        loaded = self.pricing_model._loaded
+        if loaded is None:
+            return
+        try:
+            X, rule_inputs = loaded.feature_spec.transform(df)
+            base_prediction = loaded.backend.predict(X)
+            final_price = self.pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs)
+        except Exception as e:
+            print(f"Error scoring rides for KPIs: {e}")
+            return
+        self.scored_count += len(df)
+        self.scored_cost_sum += float(cost.sum())
+        self.price_sum += float(final_price.sum())
+
+    def record_predictions(self, prices, baselines):
+        """Add served predictions whose request carried the historical price"""
+        with self._lock:
+            self.served_count += len(prices)
+            self.served_price_sum += float(sum(prices))
+            self.served_baseline_sum += float(sum(baselines))
+            publish = (self.shared_cache is not None
+                       and time.monotonic() - self._served_published >= SERVED_PUBLISH_SECONDS)
+        if publish:
+            self._publish_served()
+
+    def _publish_served(self):
+        """Store this worker's served totals in the shared cache; returns every worker's"""
+        with self._lock:
+            # Per process: a preloading master forks this store into every worker
+            if self._worker is None or self._worker[0] != os.getpid():
+                self._worker = (os.getpid(), uuid.uuid4().hex[:8])
+            worker = f"{self._worker[0]}-{self._worker[1]}"
+            totals = (self.served_count, self.served_price_sum, self.served_baseline_sum)
+            self._served_published = time.monotonic()
+
+        def merge(workers):
+            return {**(workers or {}), worker: totals}
+        return self.shared_cache.update(f"kpi-served:{os.path.abspath(self.path)}", merge, timeout=0)
+
+    def served_totals(self):
+        """(count, price sum, baseline sum) of the served predictions, over all workers with a shared cache"""
+        if self.shared_cache is None:
+            with self._lock:
+                return self.served_count, self.served_price_sum, self.served_baseline_sum
+        workers = self._publish_served().values()
+        return tuple(sum(values) for values in zip(*workers))
+
+    def stats(self):
+        """
+        The dashboard KPIs. The revenue lift needs the model, so it is loaded
+        first (lazy mode). model_r2 is None for artifacts trained before the
+        held-out score was recorded.
+        """
+        self.pricing_model.ensure_loaded()
+        self.refresh()
+        served_count, served_price_sum, served_baseline_sum = self.served_totals()
+        evaluation = self.pricing_model.evaluation
+        model_r2 = round(evaluation['r2'], 4) if evaluation else None
+        with self._lock:
+            if not self.count:
+                return {}
+            return {
+                'total_rides': int(self.count),
+                'avg_rating': round(self.rating_sum / self.count, 2),
+                'avg_price': round(self.cost_sum / self.count, 2),
+                # Final (rules-adjusted) prices vs the historical prices of the same rides
+                'revenue_lift': round((self.price_sum - self.scored_cost_sum) / self.scored_cost_sum * 100, 1)
+                if self.scored_count else 0.0,
+                # R² on the training run's held-out split (not a percentage)
+                'model_r2': model_r2,
+                # The field's earlier name, kept for existing clients
+                'model_accuracy': model_r2,
+                'served_predictions': served_count,
+                'served_revenue_lift': round((served_price_sum - served_baseline_sum) / served_baseline_sum * 100, 1)
+                if served_baseline_sum else 0.0,
+            }
@@ -0,0 +1,136 @@
+"""
+Local load test: the Flask app on gunicorn sync workers vs the ASGI app on uvicorn workers.
+
+    python load_test.py --workers 2 --concurrency 16 --duration 10 --slow-clients 2
+
+Each server is started on a local port. `concurrency` client threads post
+single-ride /api/predict requests over keep-alive connections, while
+`slow-clients` connections trickle their request in over a few seconds,
+like clients on a bad mobile network.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    'gunicorn-sync': ['gunicorn', '--workers', '{workers}', '--bind', '127.0.0.1:{port}', 'app:create_app()'],
+    'uvicorn-asgi': ['gunicorn', '--workers', '{workers}', '--bind', '127.0.0.1:{port}',
+                     '--worker-class', 'uvicorn_worker.UvicornWorker', 'asgi:app'],
+}
+
+RIDE = {'Number_of_Riders': 90, 'Number_of_Drivers': 45, 'Location_Category': 'Urban',
+        'Customer_Loyalty_Status': 'Gold', 'Number_of_Past_Rides': 40, 'Average_Ratings': 4.5,
+        'Time_of_Booking': 'Evening', 'Vehicle_Type': 'Premium', 'Expected_Ride_Duration': 60}
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def slow_client(port, stop, trickle_seconds):
+    """Sends each request byte by byte over trickle_seconds, again and again"""
+    body = json.dumps(RIDE).encode()
+    request = (f"POST /api/predict HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    delay = trickle_seconds / len(request)
+    while not stop.is_set():
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            for i in range(len(request)):
+                if stop.is_set():
+                    return
+                sock.sendall(request[i:i + 1])
+                time.sleep(delay)
+            sock.recv(65536)
+
+
+def fast_client(port, stop, latencies, errors, rides):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    i = 0
+    while not stop.is_set():
+        body = json.dumps(rides[i % len(rides)])
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/api/predict', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run_load(port, concurrency, duration, slow_clients, trickle_seconds):
+    rides = [dict(RIDE, Number_of_Riders=20 + i % 80, Average_Ratings=3.5 + (i % 15) / 10) for i in range(1000)]
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=slow_client, args=(port, stop, trickle_seconds), daemon=True)
+               for _ in range(slow_clients)]
+    threads += [threading.Thread(target=fast_client, args=(port, stop, latencies, errors, rides), daemon=True)
+                for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    timings = np.array(latencies) * 1000
+    return {
+        'requests_per_sec': len(latencies) / duration,
+        'p50_ms': float(np.percentile(timings, 50)) if len(timings) else float('nan'),
+        'p99_ms': float(np.percentile(timings, 99)) if len(timings) else float('nan'),
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the gunicorn (Flask) and uvicorn (ASGI) setups")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--slow-clients', type=int, default=2)
+    parser.add_argument('--trickle-seconds', type=float, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    for name in args.servers:
+        command = [part.format(workers=args.workers, port=args.port) for part in SERVERS[name]]
+        env = dict(os.environ, PYTHONWARNINGS='ignore')
+        server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(args.port)
+            for slow_clients in sorted({0, args.slow_clients}):
+                result = run_load(args.port, args.concurrency, args.duration, slow_clients, args.trickle_seconds)
+                print(f"{name:<14} workers={args.workers} concurrency={args.concurrency} slow={slow_clients}: "
+                      f"{result['requests_per_sec']:8,.0f} req/s, p50 {result['p50_ms']:8.2f} ms, "
+                      f"p99 {result['p99_ms']:8.2f} ms, {result['errors']} errors")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
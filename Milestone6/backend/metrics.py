@@ -0,0 +1,223 @@
+"""
+In-process metrics, served in the Prometheus text format at /metrics.
+
+Counters and histograms keep one dict of numbers per thread, so recording
+takes no lock (a few hundred ns) and scrapes sum the shards. Each gunicorn worker keeps its
+own metrics and reports its pid, so scrape the workers or sum by pid.
+Set METRICS_ENABLED=0 to turn all recording off.
+"""
+import bisect
+import os
+import threading
+
+enabled = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Seconds, from 50 us (a cached lookup) to 2.5 s (a large bulk batch)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels):
+    if not labelnames:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Per-thread values: only the owning thread writes a shard, so updates need no lock"""
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        """Create this thread's shard (the fast path reads self._local.values directly)"""
+        values = self._local.values = {}
+        with self._lock:
+            self._shards.append(values)
+        return values
+
+    def _snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [list(shard.items()) for shard in shards]
+
+
+class Counter(_Sharded):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if not enabled:
+            return
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self):
+        totals = {}
+        for shard in self._snapshot():
+            for labels, value in shard:
+                totals[labels] = totals.get(labels, 0) + value
+        return [(self.name, labels, value) for labels, value in sorted(totals.items())]
+
+
+class Histogram(_Sharded):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _entry(self, labels):
+        """This thread's [per-bucket counts (+Inf last)..., sum] for labels"""
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shard()
+        entry = values.get(labels)
+        if entry is None:
+            entry = values[labels] = [0] * (len(self.buckets) + 2)
+        return entry
+
+    def observe(self, value, *labels):
+        if not enabled:
+            return
+        entry = self._entry(labels)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def labels(self, *labels):
+        """A child bound to these label values, for hot paths"""
+        return _HistogramChild(self, labels)
+
+    def samples(self):
+        totals = {}
+        for shard in self._snapshot():
+            for labels, entry in shard:
+                total = totals.setdefault(labels, [0] * len(entry))
+                for i, value in enumerate(entry):
+                    total[i] += value
+        samples = []
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), entry[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels + (bound,), cumulative))
+            samples.append((f"{self.name}_sum", labels, float(entry[-1])))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+    def render_labels(self, sample_name, labels):
+        if sample_name.endswith('_bucket'):
+            return _format_labels(self.labelnames + ('le',), labels)
+        return _format_labels(self.labelnames, labels)
+
+
+class _HistogramChild:
+    """Histogram.labels(...): keeps a reference to this thread's entry, so observe() skips the label lookup"""
+    def __init__(self, parent, labels):
+        self._parent = parent
+        self._labels = labels
+        self._buckets = parent.buckets
+        self._local = threading.local()
+
+    def observe(self, value):
+        if not enabled:
+            return
+        try:
+            entry = self._local.entry
+        except AttributeError:
+            entry = self._local.entry = self._parent._entry(self._labels)
+        entry[bisect.bisect_left(self._buckets, value)] += 1
+        entry[-1] += value
+
+
+class CallbackMetric:
+    """A gauge or counter read from fn() at scrape time: a number, or a dict of label tuples to numbers"""
+    def __init__(self, name, help, fn, type='gauge', labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def samples(self):
+        value = self.fn()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [(self.name, labels, v) for labels, v in sorted(value.items()) if v is not None]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    pid = os.getpid()
+    for metric in REGISTRY:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            print(f"Error collecting metric {metric.name}: {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in samples:
+            if hasattr(metric, 'render_labels'):
+                label_text = metric.render_labels(name, labels)
+            else:
+                label_text = _format_labels(metric.labelnames, labels)
+            label_text = (label_text[:-1] + f',pid="{pid}"}}') if label_text else f'{{pid="{pid}"}}'
+            lines.append(f"{name}{label_text} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics of the predict path
+STAGE_SECONDS = Histogram('pricing_predict_stage_seconds',
+                          'Time per predict stage (parse, features, encoders, inference, rules, response, serialize)',
+                          ('stage',))
+REQUEST_SECONDS = Histogram('pricing_request_seconds', 'End-to-end request time', ('endpoint',))
+REQUEST_ROWS = Histogram('pricing_request_rows', 'Rides per predict request', buckets=SIZE_BUCKETS)
+SCORED_ROWS = Histogram('pricing_scored_rows', 'Rides per model call (after caching and coalescing)',
+                        buckets=SIZE_BUCKETS)
+ERRORS = Counter('pricing_errors_total', 'Failed requests by endpoint and error type', ('endpoint', 'type'))
+
+PARSE_SECONDS = STAGE_SECONDS.labels('parse')
+FEATURES_SECONDS = STAGE_SECONDS.labels('features')
+ENCODERS_SECONDS = STAGE_SECONDS.labels('encoders')
+INFERENCE_SECONDS = STAGE_SECONDS.labels('inference')
+RULES_SECONDS = STAGE_SECONDS.labels('rules')
+RESPONSE_SECONDS = STAGE_SECONDS.labels('response')
+SERIALIZE_SECONDS = STAGE_SECONDS.labels('serialize')
+PREDICT_SECONDS = REQUEST_SECONDS.labels('predict')
+
+
+def error_type(e):
+    """Short error label: unseen_label, missing_field, bad_value or the exception class"""
+    from feature_spec import UnseenLabelError
+
+    if isinstance(e, UnseenLabelError):
+        return 'unseen_label'
+    if isinstance(e, KeyError):
+        return 'missing_field'
+    if isinstance(e, (ValueError, TypeError)):
+        return 'bad_value'
+    return type(e).__name__
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'model_registry'))
+
+ARTIFACT_FILE = 'pricing_model_artifacts.pkl'
+METADATA_FILE = 'metadata.json'
+CURRENT_FILE = 'CURRENT'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file, used to record which data a model was trained on"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on disk:
+
+        model_registry/
+            CURRENT              <- name of the version being served
+            v0001/
+                pricing_model_artifacts.pkl
+                pricing_model.onnx, pricing_model_meta.json (optional)
+                metadata.json    <- metrics, feature_cols, training data hash
+
+    Versions are written to a temporary directory and renamed into place, and
+    CURRENT is replaced atomically, so a reader never sees a half-written model.
+    """
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    @property
+    def current_path(self):
+        return os.path.join(self.root, CURRENT_FILE)
+
+    def exists(self):
+        return os.path.exists(self.current_path)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith('v') and os.path.exists(os.path.join(self.root, name, METADATA_FILE)))
+
+    def current_version(self):
+        try:
+            with open(self.current_path, 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def artifact_path(self, version):
+        return os.path.join(self.root, version, ARTIFACT_FILE)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE), 'r') as f:
+            return json.load(f)
+
+    def list(self):
+        current = self.current_version()
+        return [{**self.metadata(version), 'current': version == current} for version in self.versions()]
+
+    def publish(self, files, metrics=None, feature_cols=None, data_hash=None, promote=True):
+        """
+        Copy the given artifact files into a new version directory and, by
+        default, make it the current version. Returns the new version name.
+        """
+        if not any(os.path.basename(path) == ARTIFACT_FILE for path in files):
+            raise ValueError(f"A model version needs a {ARTIFACT_FILE}")
+        os.makedirs(self.root, exist_ok=True)
+
+        existing = self.versions()
+        version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=self.root)
+        try:
+            for path in files:
+                shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+            metadata = {
+                'version': version,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'metrics': metrics or {},
+                'feature_cols': feature_cols,
+                'data_hash': data_hash,
+                'files': sorted(os.path.basename(path) for path in files),
+            }
+            with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(staging, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version):
+        """Point CURRENT at an existing version (serving workers pick it up on their next check)"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version: {version}")
+        fd, tmp_path = tempfile.mkstemp(prefix='.CURRENT-', dir=self.root)
+        with os.fdopen(fd, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self.current_path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the versioned pricing model registry")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="List the registered versions")
+    promote_parser = subparsers.add_parser('promote', help="Serve an existing version")
+    promote_parser.add_argument('version')
+    publish_parser = subparsers.add_parser('publish', help="Register an existing artifact")
+    publish_parser.add_argument('artifact', nargs='?', default=os.path.join(BASE_DIR, ARTIFACT_FILE))
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == 'list':
+        for entry in registry.list():
+            marker = '*' if entry['current'] else ' '
+            print(f"{marker} {entry['version']}  {entry['created_at']}  {entry['metrics']}")
+    elif args.command == 'promote':
+        registry.promote(args.version)
+        print(f"Now serving {args.version}")
+    else:
+        model_dir = os.path.dirname(os.path.abspath(args.artifact))
+        files = [args.artifact] + [os.path.join(model_dir, name)
+                                   for name in ('pricing_model.onnx', 'pricing_model_meta.json',
+                                                'pricing_table.npy', 'pricing_table.json')
+                                   if os.path.exists(os.path.join(model_dir, name))]
+        print(f"Registered {registry.publish(files)}")
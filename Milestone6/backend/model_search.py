@@ -0,0 +1,224 @@
+"""
+Cross-validated hyperparameter search over LightGBM and XGBoost candidates.
+
+Candidates are pruned by successive halving: every candidate is scored
+with k-fold CV at a small tree budget, the best 1/eta go on to eta times
+the budget, and so on. Each fold fit uses early stopping on its validation
+fold. Each (candidate, fold) fit is one task on a process pool, single-threaded,
+so the search scales with the number of workers. The engineered feature
+matrix is written once as memory-mapped .npy files (cached by data and
+feature spec) that every worker maps instead of re-deriving features.
+"""
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_CACHE_DIR = os.environ.get('FEATURE_CACHE_DIR', os.path.join(BASE_DIR, 'feature_cache'))
+
+# The configuration train_and_save used before the search; always a candidate.
+# It never set subsample_freq, so its subsample had no effect: pinned to 0 here
+# to keep the baseline the exact old model.
+DEFAULT_LIGHTGBM_PARAMS = {
+    'max_depth': 8, 'learning_rate': 0.03, 'subsample': 0.9, 'subsample_freq': 0, 'colsample_bytree': 0.9,
+    'min_child_samples': 20, 'reg_alpha': 0.1, 'reg_lambda': 0.1,
+}
+
+SEARCH_SPACES = {
+    'lightgbm': {
+        'num_leaves': [15, 31, 63, 127],
+        'max_depth': [-1, 6, 8, 12],
+        'learning_rate': [0.01, 0.02, 0.03, 0.05, 0.1],
+        'min_child_samples': [5, 10, 20, 40],
+        'subsample': [0.7, 0.8, 0.9, 1.0],
+        'colsample_bytree': [0.6, 0.8, 0.9, 1.0],
+        'reg_alpha': [0.0, 0.1, 1.0],
+        'reg_lambda': [0.0, 0.1, 1.0],
+    },
+    'xgboost': {
+        'max_depth': [3, 4, 6, 8, 10],
+        'learning_rate': [0.01, 0.02, 0.03, 0.05, 0.1],
+        'min_child_weight': [1, 3, 5, 10],
+        'subsample': [0.7, 0.8, 0.9, 1.0],
+        'colsample_bytree': [0.6, 0.8, 0.9, 1.0],
+        'reg_alpha': [0.0, 0.1, 1.0],
+        'reg_lambda': [0.1, 1.0, 10.0],
+    },
+}
+
+EARLY_STOPPING_ROUNDS = 30
+
+
+def cache_features(X, y, key):
+    """Write X (float32) and y once under FEATURE_CACHE_DIR/key; returns the directory"""
+    directory = os.path.join(FEATURE_CACHE_DIR, key)
+    if os.path.exists(os.path.join(directory, 'y.npy')):
+        return directory
+    os.makedirs(directory, exist_ok=True)
+    # X first and y last: y's presence marks a complete cache entry
+    for name, values in (('X', np.asarray(X, dtype=np.float32)), ('y', np.asarray(y, dtype=np.float64))):
+        tmp_path = os.path.join(directory, f"{name}.{os.getpid()}.npy")
+        np.save(tmp_path, values)
+        os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+    return directory
+
+
+def feature_cache_key(data_hash, feature_spec):
+    spec = json.dumps(feature_spec.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(f"{data_hash}:{spec}".encode()).hexdigest()[:16]
+
+
+def sample_candidates(n_candidates, families=('lightgbm', 'xgboost'), seed=42):
+    """n_candidates configs split over the families, starting with the previous default"""
+    rng = np.random.default_rng(seed)
+    candidates = [{'family': 'lightgbm', 'params': dict(DEFAULT_LIGHTGBM_PARAMS)}] if 'lightgbm' in families else []
+    seen = {json.dumps(c, sort_keys=True) for c in candidates}
+    while len(candidates) < n_candidates:
+        family = families[len(candidates) % len(families)]
+        params = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACES[family].items()}
+        params = {name: value.item() if hasattr(value, 'item') else value for name, value in params.items()}
+        candidate = {'family': family, 'params': params}
+        if json.dumps(candidate, sort_keys=True) not in seen:
+            seen.add(json.dumps(candidate, sort_keys=True))
+            candidates.append(candidate)
+    return candidates
+
+
+def make_model(family, params, n_estimators, early_stopping=False, seed=42):
+    """A single-threaded regressor for this family"""
+    if family == 'lightgbm':
+        import lightgbm as lgb
+
+        # subsample only takes effect with bagging enabled; an explicit subsample_freq wins
+        bagging = params.get('subsample', 1.0) < 1.0 and 'subsample_freq' not in params
+        extra = {'subsample_freq': 1} if bagging else {}
+        return lgb.LGBMRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=1, verbose=-1,
+                                 **extra, **params)
+    if family == 'xgboost':
+        import xgboost as xgb
+
+        return xgb.XGBRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=1, tree_method='hist',
+                                early_stopping_rounds=EARLY_STOPPING_ROUNDS if early_stopping else None,
+                                **params)
+    raise ValueError(f"Unknown model family: {family}")
+
+
+# Per-worker state, set once by _init_worker
+_X = _y = _folds = None
+
+
+def _init_worker(cache_dir, folds):
+    global _X, _y, _folds
+    _X = np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode='r')
+    _y = np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r')
+    _folds = folds
+
+
+def _fit_fold(task):
+    """Fit one candidate on one CV fold; returns its validation scores"""
+    index, family, params, n_estimators, fold = task
+    start, cpu_start = time.perf_counter(), time.process_time()
+    train_rows = np.flatnonzero((_folds >= 0) & (_folds != fold))
+    val_rows = np.flatnonzero(_folds == fold)
+    X_train, y_train = _X[train_rows], _y[train_rows]
+    X_val, y_val = _X[val_rows], _y[val_rows]
+
+    model = make_model(family, params, n_estimators, early_stopping=True)
+    if family == 'lightgbm':
+        import lightgbm as lgb
+
+        # lightgbm >= 4.7 deprecates eval_set in favour of eval_X/eval_y
+        if 'eval_X' in inspect.signature(model.fit).parameters:
+            validation = {'eval_X': (X_val,), 'eval_y': (y_val,)}
+        else:
+            validation = {'eval_set': [(X_val, y_val)]}
+        model.fit(X_train, y_train, callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)],
+                  **validation)
+        best_iteration = model.best_iteration_ or n_estimators
+    else:
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        best_iteration = model.best_iteration + 1
+    predictions = model.predict(X_val)
+    residual = y_val - predictions
+    return {
+        'index': index,
+        'rmse': float(np.sqrt(np.mean(residual ** 2))),
+        'r2': float(1 - np.sum(residual ** 2) / np.sum((y_val - y_val.mean()) ** 2)),
+        'best_iteration': int(best_iteration),
+        'seconds': time.perf_counter() - start,
+        'cpu_seconds': time.process_time() - cpu_start,
+    }
+
+
+def search(cache_dir, train_rows, n_candidates=27, families=('lightgbm', 'xgboost'), folds=3,
+           budgets=(100, 300, 900), eta=3, workers=None, seed=42):
+    """
+    Successive-halving CV search over the rows train_rows of the cached
+    feature matrix. Returns (best candidate, leaderboard, summary); the
+    leaderboard has one entry per candidate, scored at the last rung it reached.
+    """
+    workers = workers or os.cpu_count() or 1
+    n_rows = len(np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r'))
+    # Fold number per row; -1 for rows outside the search (the holdout set)
+    fold_of_row = np.full(n_rows, -1, dtype=np.int8)
+    shuffled = np.random.default_rng(seed).permutation(np.asarray(train_rows))
+    for fold, rows in enumerate(np.array_split(shuffled, folds)):
+        fold_of_row[rows] = fold
+
+    candidates = sample_candidates(n_candidates, families, seed)
+    leaderboard = {}
+    alive = list(range(len(candidates)))
+    start = time.perf_counter()
+    cpu_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_dir, fold_of_row)) as executor:
+        for rung, budget in enumerate(budgets):
+            rung_start = time.perf_counter()
+            tasks = [(i, candidates[i]['family'], candidates[i]['params'], budget, fold)
+                     for i in alive for fold in range(folds)]
+            scores = {}
+            for result in executor.map(_fit_fold, tasks):
+                scores.setdefault(result['index'], []).append(result)
+                cpu_seconds += result['cpu_seconds']
+            for i, fold_results in scores.items():
+                rmse = [r['rmse'] for r in fold_results]
+                leaderboard[i] = {
+                    'family': candidates[i]['family'],
+                    'params': candidates[i]['params'],
+                    'rung': rung,
+                    'n_estimators_budget': budget,
+                    'cv_rmse': round(float(np.mean(rmse)), 4),
+                    'cv_rmse_std': round(float(np.std(rmse)), 4),
+                    'cv_r2': round(float(np.mean([r['r2'] for r in fold_results])), 4),
+                    'best_iteration': int(round(np.mean([r['best_iteration'] for r in fold_results]))),
+                    'fit_seconds': round(sum(r['seconds'] for r in fold_results), 3),
+                }
+            alive.sort(key=lambda i: leaderboard[i]['cv_rmse'])
+            print(f"Rung {rung}: {len(alive)} candidates x {folds} folds at {budget} trees in "
+                  f"{time.perf_counter() - rung_start:.1f} s, best CV RMSE {leaderboard[alive[0]]['cv_rmse']:.2f} "
+                  f"({leaderboard[alive[0]]['family']})")
+            if rung < len(budgets) - 1:
+                alive = alive[:max(1, len(alive) // eta)]
+
+    wall_seconds = time.perf_counter() - start
+    ranked = sorted(leaderboard.values(), key=lambda entry: (-entry['rung'], entry['cv_rmse']))
+    for rank, entry in enumerate(ranked, 1):
+        entry['rank'] = rank
+    summary = {
+        'candidates': len(candidates),
+        'families': list(families),
+        'folds': folds,
+        'budgets': list(budgets),
+        'eta': eta,
+        'workers': workers,
+        'wall_seconds': round(wall_seconds, 2),
+        'cpu_seconds': round(cpu_seconds, 2),
+        # Busy share of the worker pool; near 1 while every worker has a core and enough tasks per rung
+        'parallel_efficiency': round(cpu_seconds / (wall_seconds * workers), 3) if wall_seconds else None,
+    }
+    return ranked[0], ranked, summary
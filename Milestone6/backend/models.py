@@ -56,75 +56,503 @@
 # pricing_model = PricingModel()
 
 
-import joblib
-import pandas as pd
+import itertools
 import numpy as np
 import os
+import json
+import threading
+import time
+
+import metrics
+from feature_spec import FeatureSpec, RAW_NUMERIC_COLS
+from model_registry import ModelRegistry, file_hash
+from prediction_cache import PredictionCache
+
+# Threads for LightGBM's contribution (TreeSHAP) pass, about 1 ms per row per thread; 0: one per core
+EXPLAIN_THREADS = int(os.environ.get('EXPLAIN_THREADS', 0))
+
+# Objectives whose prediction is the raw score, i.e. the sum of the contributions, per model family
+IDENTITY_OBJECTIVES = {
+    'lightgbm': ('regression', 'regression_l2', 'l2', 'mse', 'mean_squared_error', 'rmse', 'regression_l1',
+                 'l1', 'mae', 'mean_absolute_error', 'huber', 'fair', 'quantile'),
+    'xgboost': ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror'),
+}
+
+
+class NativeBackend:
+    """
+    Scores features with the model from the joblib artifact: straight through
+    the LightGBM booster, or the estimator's own predict for other families
+    (XGBoost winners of the hyperparameter search)
+    """
+    name = 'native'
+
+    def __init__(self, model):
+        self.booster = getattr(model, 'booster_', None)
+        self.model = model
+
+    def predict(self, X):
+        if self.booster is not None:
+            return self.booster.predict(X)
+        return np.asarray(self.model.predict(X), dtype=np.float64)
+
+    def contributions(self, X):
+        """
+        Per-feature contributions to the raw score, one row per sample, with
+        the expected value in the last column (rows sum to the raw score)
+        """
+        if self.booster is not None:
+            return self.booster.predict(X, pred_contrib=True, num_threads=EXPLAIN_THREADS)
+        if hasattr(self.model, 'get_booster'):
+            import xgboost
+
+            return self.model.get_booster().predict(xgboost.DMatrix(X), pred_contribs=True).astype(np.float64)
+        raise ValueError(f"{type(self.model).__name__} models cannot explain their predictions")
+
+    def raw_is_prediction(self):
+        """Whether predict() returns the raw score, so a contribution row sums to the prediction"""
+        if self.booster is not None:
+            return self.booster.params.get('objective') in IDENTITY_OBJECTIVES['lightgbm']
+        if hasattr(self.model, 'get_booster'):
+            return self.model.get_params().get('objective') in IDENTITY_OBJECTIVES['xgboost']
+        return False
+
+
+class OnnxBackend:
+    """Scores features with ONNX Runtime; needs neither lightgbm nor scikit-learn"""
+    name = 'onnx'
+
+    def __init__(self, onnx_path, intra_op_threads=1, inter_op_threads=1):
+        import onnxruntime as ort
+
+        self.onnx_path = onnx_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        options = ort.SessionOptions()
+        # One gunicorn worker per core: keep each session single-threaded by default
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [self.session.get_outputs()[0].name]
+
+    def predict(self, X):
+        prediction = self.session.run(self.output_names, {self.input_name: X})[0]
+        return prediction.ravel().astype(np.float64)
+
+    def reopen(self):
+        """New session with the same settings (ONNX Runtime thread pools do not survive fork)"""
+        return OnnxBackend(self.onnx_path, self.intra_op_threads, self.inter_op_threads)
+
+
+# Table axes: the encoded categories first, then the raw numeric fields in RAW_NUMERIC_COLS order
+TABLE_CATEGORY_COLS = ['Location_Encoded', 'Loyalty_Encoded', 'Time_Encoded', 'Vehicle_Encoded']
+
+
+class TableBackend:
+    """
+    Looks base prices up in a grid precomputed by price_table.py, with
+    multilinear interpolation over the numeric fields; no model at runtime.
+    The table is memory-mapped, so gunicorn workers share one copy.
+    """
+    name = 'table'
+
+    def __init__(self, table, grid, feature_cols):
+        self.table = np.load(table, mmap_mode='r') if isinstance(table, str) else table
+        self.axes = [np.asarray(grid[col], dtype=np.float64) for col in RAW_NUMERIC_COLS]
+        self.numeric_idx = [feature_cols.index(col) for col in RAW_NUMERIC_COLS]
+        self.category_idx = [feature_cols.index(col) for col in TABLE_CATEGORY_COLS]
+
+    def predict(self, X):
+        codes = X[:, self.category_idx]
+        if np.isnan(codes).any():
+            raise ValueError("Price table has no prices for unknown categories")
+        codes = tuple(codes.astype(np.intp).T)
+
+        lower, weights = [], []
+        for axis, col in zip(self.axes, self.numeric_idx):
+            # Outside the grid the price of the nearest edge is used
+            x = np.clip(X[:, col].astype(np.float64), axis[0], axis[-1])
+            i0 = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+            lower.append(i0)
+            weights.append((x - axis[i0]) / (axis[i0 + 1] - axis[i0]))
+
+        prediction = np.zeros(X.shape[0], dtype=np.float64)
+        for corner in itertools.product((0, 1), repeat=len(self.axes)):
+            weight = np.ones(X.shape[0], dtype=np.float64)
+            for upper, w in zip(corner, weights):
+                weight *= w if upper else 1.0 - w
+            index = codes + tuple(i0 + upper for i0, upper in zip(lower, corner))
+            prediction += weight * self.table[index]
+        return prediction
+
+
+# A few requests covering every category, scored by a new model before it is swapped in
+CANARY_RECORDS = [
+    {'Number_of_Riders': 90, 'Number_of_Drivers': 45, 'Location_Category': 'Urban',
+     'Customer_Loyalty_Status': 'Gold', 'Number_of_Past_Rides': 40, 'Average_Ratings': 4.5,
+     'Time_of_Booking': 'Evening', 'Vehicle_Type': 'Premium', 'Expected_Ride_Duration': 60},
+    {'Number_of_Riders': 20, 'Number_of_Drivers': 60, 'Location_Category': 'Suburban',
+     'Customer_Loyalty_Status': 'Silver', 'Number_of_Past_Rides': 5, 'Average_Ratings': 3.9,
+     'Time_of_Booking': 'Morning', 'Vehicle_Type': 'Economy', 'Expected_Ride_Duration': 25},
+    {'Number_of_Riders': 55, 'Number_of_Drivers': 50, 'Location_Category': 'Rural',
+     'Customer_Loyalty_Status': 'Regular', 'Number_of_Past_Rides': 80, 'Average_Ratings': 4.1,
+     'Time_of_Booking': 'Night', 'Vehicle_Type': 'Economy', 'Expected_Ride_Duration': 140},
+    {'Number_of_Riders': 70, 'Number_of_Drivers': 20, 'Location_Category': 'Urban',
+     'Customer_Loyalty_Status': 'Regular', 'Number_of_Past_Rides': 0, 'Average_Ratings': 3.6,
+     'Time_of_Booking': 'Afternoon', 'Vehicle_Type': 'Premium', 'Expected_Ride_Duration': 10},
+]
+
+
+class LoadedModel:
+    """One loaded model version; PricingModel swaps whole instances on reload"""
+    def __init__(self, backend, feature_spec, model_path, version=None, artifacts=None, evaluation=None):
+        self.backend = backend
+        self.feature_spec = feature_spec
+        self.model_path = model_path
+        self.version = version
+        self.artifacts = artifacts
+        self.model = artifacts['model'] if artifacts else None
+        # Held-out metrics recorded at training ({'r2', 'rmse', 'rows'}), None for older artifacts
+        self.evaluation = evaluation if evaluation is not None else (artifacts or {}).get('evaluation')
+
 
 class PricingModel:
-    def __init__(self, model_path=None):
+    """
+    Loads the pricing model artifacts and scores requests.
+
+    With lazy=True nothing is loaded (and joblib/lightgbm/sklearn are not
+    imported) until the first predict call. reload() loads another version
+    next to the one being served and swaps it in once it passes the canary
+    check; requests already running finish on the model they started with.
+    """
+    def __init__(self, model_path=None, backend=None, lazy=False, registry=None, cache=None):
+        self.registry = registry or ModelRegistry()
+        self.cache = cache if cache is not None else PredictionCache.from_env()
+        self.version = None
         # Set absolute path to model file inside Docker
         if model_path is None:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(base_dir, "pricing_model_artifacts.pkl")
+            model_path, self.version = self._resolve_model_path()
 
         print("Looking for model at:", model_path)
-        self.artifacts = None
-        self.model = None
-        self.le_location = None
-        self.le_time = None
-        self.loyalty_mapping = None
-        self.vehicle_mapping = None
-        self.feature_cols = None
-        self.load(model_path)
+        self.model_path = model_path
+        self._loaded = None
+        self.backend_name = backend or os.environ.get('PRICING_BACKEND', 'native')
+        self.state = 'unloaded'
+        self.load_time_ms = None
+        self.load_error = None
+        self.reload_count = 0
+        self.reload_error = None
+        self.last_reload = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watch_key = None
+        self._watcher = None
+        if not lazy:
+            self.load(model_path)
+
+    def _resolve_model_path(self, version=None):
+        """Artifact path for a registry version (the current one by default), else the bundled artifact"""
+        version = version or self.registry.current_version()
+        if version:
+            return self.registry.artifact_path(version), version
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_dir, "pricing_model_artifacts.pkl"), None
+
+    # The serving model is read through self._loaded, which reload() replaces in one assignment
+    @property
+    def backend(self):
+        return self._loaded.backend if self._loaded else None
+
+    @property
+    def feature_spec(self):
+        return self._loaded.feature_spec if self._loaded else None
+
+    @property
+    def feature_cols(self):
+        return self._loaded.feature_spec.feature_cols if self._loaded else None
+
+    @property
+    def model(self):
+        return self._loaded.model if self._loaded else None
+
+    @property
+    def artifacts(self):
+        return self._loaded.artifacts if self._loaded else None
+
+    @property
+    def evaluation(self):
+        return self._loaded.evaluation if self._loaded else None
 
     def load(self, model_path):
-        if os.path.exists(model_path):
-            print(f"Loading model artifacts from {model_path}")
-            self.artifacts = joblib.load(model_path)
-            self.model = self.artifacts['model']
-            self.le_location = self.artifacts['le_location']
-            self.le_time = self.artifacts['le_time']
-            self.loyalty_mapping = self.artifacts['loyalty_mapping']
-            self.vehicle_mapping = self.artifacts['vehicle_mapping']
-            self.feature_cols = self.artifacts['feature_cols']
-        else:
-            print(f"❌ Model artifacts not found at {model_path}")
+        self.state = 'loading'
+        self._watch_key = self._current_watch_key()
+        start = time.perf_counter()
+        try:
+            self._loaded = self._load_version(model_path, self.version)
+            self.state = 'loaded'
+        except Exception as e:
+            print(f"❌ Failed to load model artifacts: {e}")
+            self.load_error = str(e)
+            self.state = 'failed'
+        self.load_time_ms = (time.perf_counter() - start) * 1000
+
+    def _load_version(self, model_path, version):
+        """Load the artifacts at model_path into a new LoadedModel without touching the serving one"""
+        if self.backend_name == 'onnx':
+            loaded = self._load_onnx(model_path, version)
+            if loaded is not None:
+                return loaded
+        if self.backend_name == 'table':
+            loaded = self._load_table(model_path, version)
+            if loaded is not None:
+                return loaded
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model artifacts not found at {model_path}")
+
+        import joblib
+
+        print(f"Loading model artifacts from {model_path}")
+        artifacts = joblib.load(model_path)
+        return LoadedModel(NativeBackend(artifacts['model']), FeatureSpec.from_artifacts(artifacts),
+                           model_path, version, artifacts)
+
+    def ensure_loaded(self):
+        """Load the model on first use (lazy mode); safe to call from many threads"""
+        if self.state in ('loaded', 'failed'):
+            return
+        with self._load_lock:
+            if self.state == 'unloaded':
+                self.load(self.model_path)
+
+    def after_fork(self):
+        """Called in each gunicorn worker after fork when the model was preloaded in the master"""
+        if isinstance(self.backend, OnnxBackend):
+            self._loaded.backend = self._loaded.backend.reopen()
+
+    def status(self):
+        return {
+            'model_loaded': self.is_loaded,
+            'model_state': self.state,
+            'model_version': self.version,
+            'load_time_ms': round(self.load_time_ms, 2) if self.load_time_ms is not None else None,
+            'backend': self.backend.name if self.backend else self.backend_name,
+            'load_error': self.load_error,
+            'reload_count': self.reload_count,
+            'last_reload': self.last_reload,
+            'reload_error': self.reload_error,
+            'prediction_cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+    def _load_onnx(self, model_path, version=None):
+        """Load the ONNX graph exported next to the joblib artifact"""
+        model_dir = os.path.dirname(model_path)
+        onnx_path = os.path.join(model_dir, 'pricing_model.onnx')
+        meta_path = os.path.join(model_dir, 'pricing_model_meta.json')
+        if not (os.path.exists(onnx_path) and os.path.exists(meta_path)):
+            print(f"❌ ONNX model not found at {onnx_path}, falling back to the native backend")
+            return None
+
+        print(f"Loading ONNX model from {onnx_path}")
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        backend = OnnxBackend(
+            onnx_path,
+            intra_op_threads=int(os.environ.get('ORT_INTRA_OP_THREADS', 1)),
+            inter_op_threads=int(os.environ.get('ORT_INTER_OP_THREADS', 1)),
+        )
+        return LoadedModel(backend, FeatureSpec.from_dict(meta['feature_spec']), model_path, version,
+                           evaluation=meta.get('evaluation'))
+
+    def _load_table(self, model_path, version=None):
+        """Load the price table built next to the joblib artifact by price_table.py"""
+        model_dir = os.path.dirname(model_path)
+        table_path = os.path.join(model_dir, 'pricing_table.npy')
+        meta_path = os.path.join(model_dir, 'pricing_table.json')
+        if not (os.path.exists(table_path) and os.path.exists(meta_path)):
+            print(f"❌ Price table not found at {table_path}, falling back to the native backend")
+            return None
+
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        # A table built from another model (before a retrain or promote) would serve stale prices
+        model_hash = file_hash(model_path) if os.path.exists(model_path) else None
+        if model_hash is None or meta.get('model_hash') != model_hash:
+            print(f"❌ Price table at {table_path} was not built from {model_path} "
+                  f"(rebuild with `python price_table.py build`), falling back to the native backend")
+            return None
+
+        print(f"Loading price table from {table_path}")
+        feature_spec = FeatureSpec.from_dict(meta['feature_spec'])
+        backend = TableBackend(table_path, meta['grid'], feature_spec.feature_cols)
+        return LoadedModel(backend, feature_spec, model_path, version, evaluation=meta.get('evaluation'))
+
+    @property
+    def is_loaded(self):
+        return self._loaded is not None
+
+    def validate(self, loaded, records=CANARY_RECORDS):
+        """Score the canary batch with a freshly loaded model; raises if the prices look wrong"""
+        prices = self._predict_with(loaded, records)
+        if prices.shape != (len(records),) or not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+            raise ValueError(f"Canary check failed, got prices {prices.tolist()}")
+        return prices
+
+    def reload(self, model_path=None, version=None, promote=False):
+        """
+        Load a model version (the registry's current one by default), validate it
+        on the canary batch and swap it in. The serving model keeps answering
+        while this runs. With promote=True the version also becomes the
+        registry's current one, so the other workers follow. Returns True if
+        the new model is now being served.
+        """
+        with self._reload_lock:
+            if model_path is None and (version or self.registry.exists()):
+                model_path, version = self._resolve_model_path(version)
+            model_path = model_path or self.model_path
+            watch_key = self._current_watch_key(model_path)
+            start = time.perf_counter()
+            try:
+                loaded = self._load_version(model_path, version)
+                self.validate(loaded)
+            except Exception as e:
+                self.reload_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Reload of {model_path} failed, still serving {self.model_path}: {self.reload_error}")
+                self._watch_key = watch_key
+                return False
+
+            self._loaded = loaded
+            if self.cache is not None:
+                self.cache.clear()
+            self.model_path = model_path
+            self.version = version
+            self.state = 'loaded'
+            self.load_error = None
+            self.reload_error = None
+            self.load_time_ms = (time.perf_counter() - start) * 1000
+            self.reload_count += 1
+            self.last_reload = time.strftime('%Y-%m-%dT%H:%M:%S')
+            if promote and version:
+                self.registry.promote(version)
+                watch_key = self._current_watch_key(model_path)
+            self._watch_key = watch_key
+            print(f"✅ Now serving {version or model_path}")
+            return True
+
+    def reload_async(self, model_path=None, version=None, promote=False):
+        """reload() on a background thread"""
+        thread = threading.Thread(target=self.reload, args=(model_path, version, promote), daemon=True)
+        thread.start()
+        return thread
+
+    def _current_watch_key(self, model_path=None):
+        """What the watcher compares: the registry's current version, or the artifact's mtime"""
+        if self.registry.exists():
+            return ('version', self.registry.current_version())
+        try:
+            return ('mtime', os.path.getmtime(model_path or self.model_path))
+        except OSError:
+            return ('mtime', None)
+
+    def start_watcher(self, interval):
+        """Poll for a new model every `interval` seconds and hot-reload it"""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name='model-watcher')
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            if self.state not in ('loaded', 'failed') or self._current_watch_key() == self._watch_key:
+                continue
+            self.reload()
+
+    def _predict_with(self, loaded, input_data):
+        if not metrics.enabled:
+            X, rule_inputs = loaded.feature_spec.transform(input_data)
+            base_prediction = loaded.backend.predict(X)
+            return self.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs)
+
+        timings = {}
+        start = time.perf_counter()
+        X, rule_inputs = loaded.feature_spec.transform(input_data, timings=timings)
+        features_done = time.perf_counter()
+        base_prediction = loaded.backend.predict(X)
+        inference_done = time.perf_counter()
+
+        # Apply Logic Rules to the whole batch at once
+        prices = self.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs)
+        rules_done = time.perf_counter()
+
+        metrics.FEATURES_SECONDS.observe(features_done - start - timings['encoders'])
+        metrics.ENCODERS_SECONDS.observe(timings['encoders'])
+        metrics.INFERENCE_SECONDS.observe(inference_done - features_done)
+        metrics.RULES_SECONDS.observe(rules_done - inference_done)
+        metrics.SCORED_ROWS.observe(len(prices))
+        return prices
 
     def predict(self, input_data):
-        if not self.model:
+        self.ensure_loaded()
+        # Read before the model: results scored by a model swapped out meanwhile are not cached
+        generation = self.cache.generation if self.cache is not None else None
+        # Take one reference so a concurrent reload can't mix two models within a request
+        loaded = self._loaded
+        if loaded is None:
             raise Exception("Model not loaded")
 
-        df = pd.DataFrame(input_data)
+        if self.cache is None or not isinstance(input_data, (list, dict)):
+            return self._predict_with(loaded, input_data).tolist()
+        if isinstance(input_data, dict):
+            if np.ndim(input_data['Number_of_Riders']) != 0:
+                # Dict of columns rather than a single request
+                return self._predict_with(loaded, input_data).tolist()
+            input_data = [input_data]
+        return self.cache.predict(input_data, lambda records: self._predict_with(loaded, records), generation)
 
-        df['Demand_Ratio'] = df['Number_of_Riders'] / (df['Number_of_Drivers'] + 1e-5)
-        df['Supply_Constraint'] = (df['Number_of_Riders'] > df['Number_of_Drivers']).astype(int)
-        df['Market_Saturation'] = df['Number_of_Drivers'] / (df['Number_of_Riders'] + 1e-5)
-        df['Rider_Loyalty_Score'] = df['Number_of_Past_Rides'] * 0.5 + df['Average_Ratings'] * 10
-        df['Duration_Per_Rider'] = df['Expected_Ride_Duration'] / (df['Number_of_Riders'] + 1e-5)
-        df['Capacity_Utilization'] = df['Demand_Ratio'] / (17.6 + 1e-5) # Fixed max from training data
-        
-        premium_vehicle = df['Vehicle_Type'].map(self.vehicle_mapping)
-        df['Premium_Factor'] = premium_vehicle * df['Average_Ratings']
-        
-        # Fixed threshold from training data (3.8)
-        df['Surge_Indicator'] = (df['Demand_Ratio'] > 3.8).astype(int)
+    def explain(self, input_data):
+        """
+        Prices for a list of requests with, per request, the model's
+        per-feature contributions and the pricing rules that fired, from one
+        batched contribution call (native backend only; no prediction cache).
+        Returns (prices, explanations).
+        """
+        self.ensure_loaded()
+        loaded = self._loaded
+        if loaded is None:
+            raise Exception("Model not loaded")
+        if not hasattr(loaded.backend, 'contributions'):
+            raise ValueError(f"Explanations need the native backend, not {loaded.backend.name}")
+        if not input_data:
+            # Like predict: an empty batch scores nothing
+            return np.empty(0), []
 
-        df['Location_Encoded'] = self.le_location.transform(df['Location_Category'])
-        df['Time_Encoded'] = self.le_time.transform(df['Time_of_Booking'])
-        df['Loyalty_Encoded'] = df['Customer_Loyalty_Status'].map(self.loyalty_mapping)
-        df['Vehicle_Encoded'] = df['Vehicle_Type'].map(self.vehicle_mapping)
+        X, rule_inputs = loaded.feature_spec.transform(input_data)
+        contributions = loaded.backend.contributions(X)
+        if loaded.backend.raw_is_prediction():
+            # The raw score is the prediction: no second pass over the trees. XGBoost
+            # contributions are float32, so this matches predict() to float32 precision only
+            base_prediction = contributions.sum(axis=1)
+        else:
+            base_prediction = loaded.backend.predict(X)
+        trace = {}
+        prices = self.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs, trace=trace)
 
-        X = df[self.feature_cols]
-        base_prediction = self.model.predict(X)
-        
-        # Apply Logic Rules
-        final_prediction = []
-        for i, price in enumerate(base_prediction):
-            adjusted_price = self.apply_dynamic_pricing_rules(price, df.iloc[i])
-            final_prediction.append(adjusted_price)
-            
-        return final_prediction
+        feature_cols = loaded.feature_spec.feature_cols
+        explanations = []
+        for i, row in enumerate(contributions.round(4).tolist()):
+            rules = [{'rule': name, 'multiplier': round(float(multiplier[i]), 4)}
+                     for name, (fired, multiplier) in trace.items() if fired[i]]
+            explanations.append({
+                'model_price': round(float(base_prediction[i]), 2),
+                'expected_value': row[-1],
+                'contributions': dict(zip(feature_cols, row)),
+                'rules': rules,
+            })
+        return prices, explanations
 
     def apply_dynamic_pricing_rules(self, base_price, row):
         """
@@ -163,5 +591,74 @@ class PricingModel:
         # 5. Global Normalizer (Model predictions are naturally high)
         return final_price * 0.55
 
+    def apply_dynamic_pricing_rules_batch(self, base_prices, df, trace=None):
+        """
+        Vectorized version of apply_dynamic_pricing_rules.
+        Applies the same rules, in the same order, to a whole batch
+        and returns a NumPy array of adjusted prices. If a trace dict is
+        given, it gets (fired mask, multiplier) per rule, in rule order.
+        """
+        adjusted_price = np.asarray(base_prices, dtype=np.float64)
+        demand_ratio = np.asarray(df['Demand_Ratio'], dtype=np.float64)
+        market_saturation = np.asarray(df['Market_Saturation'], dtype=np.float64)
+        surge_indicator = np.asarray(df['Surge_Indicator'])
+        is_premium = np.asarray(df['Vehicle_Type']) == 'Premium'
+
+        # 1. Discount Rules (Low Demand / High Supply)
+        adjusted_price = np.where(demand_ratio < 0.3, adjusted_price * 0.80, adjusted_price)
+        adjusted_price = np.where(market_saturation > 2.0, adjusted_price * 0.85, adjusted_price)
+
+        # 2. Surge Rules (High Demand)
+        multiplier = np.where(demand_ratio > 2.0, 1.5, 1.2)
+        multiplier = np.where(surge_indicator == 1, multiplier + 0.1, multiplier)
+        adjusted_price = np.where(demand_ratio > 1.2, adjusted_price * multiplier, adjusted_price)
+
+        # 3. Premium Vehicle Logic (Enforce Higher Price)
+        adjusted_price = np.where(is_premium, adjusted_price * 1.25, adjusted_price)
+
+        # 4. Hard Floor
+        final_price = np.where(adjusted_price > 50.0, adjusted_price, 50.0)
+
+        if trace is not None:
+            trace['low_demand'] = (demand_ratio < 0.3, np.full(len(final_price), 0.80))
+            trace['oversupply'] = (market_saturation > 2.0, np.full(len(final_price), 0.85))
+            trace['surge'] = (demand_ratio > 1.2, multiplier)
+            trace['premium_vehicle'] = (is_premium, np.full(len(final_price), 1.25))
+            # The floor's multiplier is whatever lifts the price to 50 (a non-positive price has none)
+            floor_multiplier = np.divide(50.0, adjusted_price, out=np.zeros(len(final_price)), where=adjusted_price > 0)
+            trace['price_floor'] = (adjusted_price <= 50.0, floor_multiplier)
+            trace['normalizer'] = (np.ones(len(final_price), dtype=bool), np.full(len(final_price), 0.55))
+
+        # 5. Global Normalizer (Model predictions are naturally high)
+        return final_price * 0.55
+
+# eager: load on import (default); preload: same, but gunicorn imports the app in
+# the master before forking (see gunicorn.conf.py); lazy: load on first predict.
+MODEL_LOAD_MODE = os.environ.get('MODEL_LOAD_MODE', 'eager')
+
+# Seconds between checks for a new model (registry CURRENT or artifact mtime); 0 disables
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+
+pricing_model = PricingModel(lazy=MODEL_LOAD_MODE == 'lazy')
+
+
+def _cache_events():
+    cache = pricing_model.cache
+    if cache is None:
+        return None
+    return {('hit',): cache.hits, ('miss',): cache.misses, ('eviction',): cache.evictions,
+            ('expiration',): cache.expirations}
+
+
+metrics.CallbackMetric('pricing_model_loaded', 'Whether this worker is serving a model',
+                       lambda: int(pricing_model.is_loaded))
+metrics.CallbackMetric('pricing_model_reloads_total', 'Successful model reloads',
+                       lambda: pricing_model.reload_count, type='counter')
+metrics.CallbackMetric('pricing_prediction_cache_events_total', 'Prediction cache lookups and removals',
+                       _cache_events, type='counter', labelnames=('event',))
+metrics.CallbackMetric('pricing_prediction_cache_entries', 'Prices in the prediction cache',
+                       lambda: pricing_model.cache.stats()['size'] if pricing_model.cache is not None else None)
 
-pricing_model = PricingModel()
+if MODEL_LOAD_MODE != 'preload':
+    # Under preload the watcher thread is started per worker after fork (see gunicorn.conf.py)
+    pricing_model.start_watcher(MODEL_WATCH_INTERVAL)
@@ -0,0 +1,60 @@
+"""
+The original pandas implementations that the optimized code paths replace,
+kept as the reference the parity tests (tests/) check them against and the
+benchmarks (benchmark.py) time them against.
+"""
+import numpy as np
+import pandas as pd
+
+
+def reference_features(records, spec):
+    """The original pandas feature engineering"""
+    df = pd.DataFrame(records)
+    df['Demand_Ratio'] = df['Number_of_Riders'] / (df['Number_of_Drivers'] + 1e-5)
+    df['Supply_Constraint'] = (df['Number_of_Riders'] > df['Number_of_Drivers']).astype(int)
+    df['Market_Saturation'] = df['Number_of_Drivers'] / (df['Number_of_Riders'] + 1e-5)
+    df['Rider_Loyalty_Score'] = df['Number_of_Past_Rides'] * 0.5 + df['Average_Ratings'] * 10
+    df['Duration_Per_Rider'] = df['Expected_Ride_Duration'] / (df['Number_of_Riders'] + 1e-5)
+    df['Capacity_Utilization'] = df['Demand_Ratio'] / (spec.demand_ratio_max + 1e-5)
+    premium_vehicle = df['Vehicle_Type'].map(spec.vehicle_mapping)
+    df['Premium_Factor'] = premium_vehicle * df['Average_Ratings']
+    df['Surge_Indicator'] = (df['Demand_Ratio'] > spec.surge_threshold).astype(int)
+    df['Location_Encoded'] = df['Location_Category'].map(spec.location_codes)
+    df['Time_Encoded'] = df['Time_of_Booking'].map(spec.time_codes)
+    df['Loyalty_Encoded'] = df['Customer_Loyalty_Status'].map(spec.loyalty_mapping)
+    df['Vehicle_Encoded'] = df['Vehicle_Type'].map(spec.vehicle_mapping)
+    return df
+
+
+def reference_ingestion(file_path, output_path):
+    """
+    The Milestone 2 notebook's data_ingestion_pipeline, with the imputation
+    assigned: on pandas 3 the notebook's chained fillna(inplace=True) is a no-op
+    """
+    df = pd.read_csv(file_path)
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    for col in numerical_cols:
+        df[col] = df[col].fillna(df[col].median())
+    for col in categorical_cols:
+        df[col] = df[col].fillna(df[col].mode()[0])
+    df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
+    df = df.drop_duplicates()
+    df.to_csv(output_path, index=False)
+
+
+def dirty_rides(df, scale, seed=0, repeat_fraction=0.01):
+    """
+    The raw rides tiled `scale` times and jittered, with repeat_fraction of
+    the rows repeated and 5% missing values per column
+    """
+    rng = np.random.default_rng(seed)
+    dirty = pd.concat([df] * scale, ignore_index=True)
+    if scale > 1:
+        numeric = dirty.select_dtypes(include=[np.number]).columns
+        dirty[numeric] = (dirty[numeric] * rng.uniform(0.9, 1.1, (len(dirty), len(numeric)))).round(2)
+        repeats = rng.choice(len(dirty), int(len(dirty) * repeat_fraction), replace=False)
+        dirty.iloc[repeats[1:]] = dirty.iloc[repeats[:-1]].to_numpy()
+    for col in dirty.columns:
+        dirty.loc[rng.random(len(dirty)) < 0.05, col] = np.nan
+    return dirty
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from feature_spec import RAW_NUMERIC_COLS, RAW_CATEGORICAL_COLS
+
+KEY_FIELDS = RAW_NUMERIC_COLS + RAW_CATEGORICAL_COLS
+
+
+def parse_quantization(spec):
+    """'Average_Ratings=0.1,Expected_Ride_Duration=5' -> {'Average_Ratings': 0.1, ...}"""
+    steps = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        field, step = item.split('=')
+        if field.strip() not in RAW_NUMERIC_COLS:
+            raise ValueError(f"Can only quantize numeric fields, got {field!r}")
+        steps[field.strip()] = float(step)
+    return steps
+
+
+class PredictionCache:
+    """
+    LRU cache of final prices keyed on the model inputs of a request.
+
+    Numeric fields listed in `quantize` are snapped to multiples of their step
+    before the lookup, and misses are scored on the snapped values, so every
+    request in a bucket gets the same price. Without quantization the cached
+    price is exactly what the model would return.
+    """
+    def __init__(self, max_size=10000, ttl=300, quantize=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.quantize = dict(quantize or {})
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Cache configured by PREDICTION_CACHE_SIZE (0 disables), _TTL and _QUANTIZE, or None"""
+        max_size = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+        if max_size <= 0:
+            return None
+        return cls(max_size=max_size,
+                   ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 300)),
+                   quantize=parse_quantization(os.environ.get('PREDICTION_CACHE_QUANTIZE')))
+
+    def key(self, record):
+        """Canonical key: the model inputs in a fixed order, numeric fields as (snapped) floats"""
+        values = []
+        for field in RAW_NUMERIC_COLS:
+            value = float(record[field])
+            step = self.quantize.get(field)
+            if step:
+                value = round(round(value / step) * step, 10)
+            values.append(value)
+        values.extend(record[field] for field in RAW_CATEGORICAL_COLS)
+        return tuple(values)
+
+    @property
+    def generation(self):
+        """Bumped by clear(); read it before picking the model that will score the misses"""
+        return self._generation
+
+    def predict(self, records, score, generation=None):
+        """
+        Prices for `records`, calling score(list_of_records) only for the
+        distinct keys that are not cached yet.
+        """
+        keys = [self.key(record) for record in records]
+        now = time.monotonic()
+        prices = [None] * len(keys)
+        missing = {}
+        with self._lock:
+            if generation is None:
+                generation = self._generation
+            for idx, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    prices[idx] = entry[0]
+                    self.hits += 1
+                    continue
+                if entry is not None:
+                    del self._entries[key]
+                    self.expirations += 1
+                missing.setdefault(key, []).append(idx)
+                self.misses += 1
+
+        if missing:
+            miss_keys = list(missing)
+            scored = score([dict(zip(KEY_FIELDS, key)) for key in miss_keys])
+            for key, price in zip(miss_keys, scored):
+                for idx in missing[key]:
+                    prices[idx] = float(price)
+            self._store(miss_keys, scored, generation, now + self.ttl)
+        return prices
+
+    def _store(self, keys, prices, generation, expires_at):
+        with self._lock:
+            # Prices scored by a model that was swapped out meanwhile are not kept
+            if generation != self._generation:
+                return
+            for key, price in zip(keys, prices):
+                self._entries[key] = (float(price), expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after a model reload"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'quantize': self.quantize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,156 @@
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from feature_spec import RAW_NUMERIC_COLS
+from model_registry import file_hash
+from models import LoadedModel, TableBackend
+from utils import load_ride_records
+
+# Value ranges of the numeric inputs (same as create_dummy_data.py)
+GRID_RANGES = {
+    'Number_of_Riders': (20, 100),
+    'Number_of_Drivers': (5, 89),
+    'Number_of_Past_Rides': (0, 100),
+    'Average_Ratings': (3.5, 5.0),
+    'Expected_Ride_Duration': (10, 180),
+}
+
+# Grid points per numeric field, picked with `python price_table.py report`: the
+# 'fine' preset is 2.2x the size but barely reduces the error
+DEFAULT_POINTS = {
+    'Number_of_Riders': 17,
+    'Number_of_Drivers': 22,
+    'Number_of_Past_Rides': 6,
+    'Average_Ratings': 4,
+    'Expected_Ride_Duration': 10,
+}
+
+REPORT_PRESETS = {
+    'coarse': {'Number_of_Riders': 9, 'Number_of_Drivers': 12, 'Number_of_Past_Rides': 3,
+               'Average_Ratings': 2, 'Expected_Ride_Duration': 5},
+    'default': DEFAULT_POINTS,
+    'fine': {'Number_of_Riders': 17, 'Number_of_Drivers': 22, 'Number_of_Past_Rides': 9,
+             'Average_Ratings': 6, 'Expected_Ride_Duration': 10},
+}
+
+
+def _category_axes(spec):
+    """Labels along each category axis, in the order of their encoded values"""
+    def by_code(mapping):
+        labels = sorted(mapping, key=mapping.get)
+        if [mapping[label] for label in labels] != list(range(len(labels))):
+            raise ValueError(f"Mapping codes must be 0..n-1 to index the table: {mapping}")
+        return labels
+
+    return [
+        ('Location_Category', spec.location_vocab),
+        ('Customer_Loyalty_Status', by_code(spec.loyalty_mapping)),
+        ('Time_of_Booking', spec.time_vocab),
+        ('Vehicle_Type', by_code(spec.vehicle_mapping)),
+    ]
+
+
+def build_table(model, points=DEFAULT_POINTS):
+    """
+    Score the model on every grid point and every category combination.
+    Returns (table, grid); the table holds base prices, the pricing rules are
+    still applied at lookup time.
+    """
+    spec = model.feature_spec
+    grid = {col: np.linspace(*GRID_RANGES[col], points[col]) for col in RAW_NUMERIC_COLS}
+    mesh = np.meshgrid(*(grid[col] for col in RAW_NUMERIC_COLS), indexing='ij')
+    numeric = {col: values.ravel() for col, values in zip(RAW_NUMERIC_COLS, mesh)}
+    numeric_shape = mesh[0].shape
+    n_points = mesh[0].size
+
+    category_axes = _category_axes(spec)
+    table = np.empty(tuple(len(labels) for _, labels in category_axes) + numeric_shape, dtype=np.float32)
+    for combo in itertools.product(*(range(len(labels)) for _, labels in category_axes)):
+        columns = dict(numeric)
+        for (col, labels), code in zip(category_axes, combo):
+            columns[col] = [labels[code]] * n_points
+        X, _ = spec.transform(columns)
+        table[combo] = model.backend.predict(X).reshape(numeric_shape)
+    return table, {col: values.tolist() for col, values in grid.items()}
+
+
+def save_table(table, grid, spec, output_dir, model_hash, model_version=None, evaluation=None):
+    """
+    Write pricing_table.npy and pricing_table.json next to the model artifact.
+    model_hash (file_hash of the artifact) ties the table to the model it was
+    built from; the table backend refuses to serve it for any other.
+    """
+    table_path = os.path.join(output_dir, 'pricing_table.npy')
+    meta_path = os.path.join(output_dir, 'pricing_table.json')
+    # Write then rename, so a serving worker never maps a half-written table
+    np.save(table_path + '.tmp.npy', table)
+    os.replace(table_path + '.tmp.npy', table_path)
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump({'feature_spec': spec.to_dict(), 'grid': grid, 'shape': list(table.shape),
+                   'model_hash': model_hash, 'model_version': model_version, 'evaluation': evaluation},
+                  f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+    print(f"Price table {table.shape} ({table.nbytes / 1e6:.1f} MB) written to {table_path}")
+
+
+def evaluation_records(model, n_random=5000, seed=42):
+    """Bundled rides plus uniform random requests over the grid ranges"""
+    rng = np.random.default_rng(seed)
+    columns = {col: rng.uniform(low, high, n_random) for col, (low, high) in GRID_RANGES.items()}
+    for col in ('Number_of_Riders', 'Number_of_Drivers', 'Number_of_Past_Rides', 'Expected_Ride_Duration'):
+        columns[col] = np.round(columns[col])
+    for col, labels in _category_axes(model.feature_spec):
+        columns[col] = rng.choice(labels, n_random)
+    random_records = [{col: values[i].item() for col, values in columns.items()} for i in range(n_random)]
+    return load_ride_records() + random_records
+
+
+def report(model, presets=REPORT_PRESETS):
+    """Table size and price error against the live model for each grid resolution"""
+    records = evaluation_records(model)
+    live = model._predict_with(model._loaded, records)
+    for name, points in presets.items():
+        start = time.perf_counter()
+        table, grid = build_table(model, points)
+        build_time = time.perf_counter() - start
+
+        loaded = LoadedModel(TableBackend(table, grid, model.feature_cols), model.feature_spec, model.model_path)
+        start = time.perf_counter()
+        prices = model._predict_with(loaded, records)
+        lookup_time = time.perf_counter() - start
+
+        error = np.abs(prices - live) / live
+        print(f"{name:>8}: {table.size:>10,} cells {table.nbytes / 1e6:7.1f} MB, build {build_time:6.1f} s | "
+              f"relative error mean {error.mean():.2%} p95 {np.percentile(error, 95):.2%} "
+              f"max {error.max():.2%}, {np.mean(error <= 0.05):.1%} within 5% | "
+              f"{lookup_time / len(records) * 1e6:.2f} us/row")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from models import pricing_model
+
+    parser = argparse.ArgumentParser(description="Build the precomputed price table (PRICING_BACKEND=table)")
+    parser.add_argument('command', choices=['build', 'report'])
+    parser.add_argument('--points', default='',
+                        help="Grid points per field, e.g. Number_of_Riders=17,Average_Ratings=4")
+    args = parser.parse_args()
+
+    if pricing_model.backend is None or pricing_model.backend.name == 'table':
+        raise SystemExit("The price table is built from the model: run with PRICING_BACKEND=native or onnx")
+
+    if args.command == 'report':
+        report(pricing_model)
+    else:
+        points = dict(DEFAULT_POINTS)
+        for item in filter(None, args.points.split(',')):
+            field, value = item.split('=')
+            points[field.strip()] = int(value)
+        table, grid = build_table(pricing_model, points)
+        save_table(table, grid, pricing_model.feature_spec, os.path.dirname(pricing_model.model_path),
+                   file_hash(pricing_model.model_path), pricing_model.version, pricing_model.evaluation)
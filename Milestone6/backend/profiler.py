@@ -0,0 +1,81 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """
+    Opt-in sampling profiler for debugging a live worker. While running, a
+    background thread records the stack of every other thread each
+    interval_ms. It stops by itself after max_seconds. Stacks come back in
+    the collapsed format used by flamegraph.pl and speedscope.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.interval_ms = None
+        self.started = None
+        self.stopped = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=10, max_seconds=60):
+        """Start sampling (clearing earlier samples); returns False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = collections.Counter()
+            self.samples = 0
+            self.interval_ms = interval_ms
+            self.started = time.time()
+            self.stopped = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval_ms / 1000, max_seconds),
+                                            daemon=True, name='sampling-profiler')
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, interval, max_seconds):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + max_seconds
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped = time.time()
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval_ms': self.interval_ms,
+            'samples': self.samples,
+            'started': self.started,
+            'stopped': self.stopped,
+        }
+
+    def collapsed(self):
+        """One 'frame;frame;frame count' line per distinct stack, most frequent first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+profiler = SamplingProfiler()
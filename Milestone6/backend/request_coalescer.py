@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _Pending:
+    """One caller's records waiting in the coalescer queue"""
+    __slots__ = ('records', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, records):
+        self.records = records
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCoalescer:
+    """
+    Gathers concurrent predict calls (from gunicorn threads) into one batch.
+
+    The first waiting call opens a batch; calls arriving within max_wait_ms
+    join it until it holds max_batch_size rows. The batch is scored with one
+    predict call and each caller gets back its own slice. If the batch fails,
+    every call is retried on its own, so one bad request only fails itself.
+    A caller whose batch isn't scored within timeout_ms (a stuck or dead
+    dispatcher thread) stops waiting and scores its records directly.
+    """
+    def __init__(self, predict, max_wait_ms=2.0, max_batch_size=256, timeout_ms=1000.0):
+        self.predict_fn = predict
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.batch_sizes = {}
+        self.queue_waits = deque(maxlen=10000)
+
+    @classmethod
+    def from_env(cls, predict):
+        """Coalescer configured by PREDICT_COALESCE_WAIT_MS (0 disables), _MAX_BATCH and _TIMEOUT_MS, or None"""
+        max_wait_ms = float(os.environ.get('PREDICT_COALESCE_WAIT_MS', 0))
+        if max_wait_ms <= 0:
+            return None
+        return cls(predict, max_wait_ms=max_wait_ms,
+                   max_batch_size=int(os.environ.get('PREDICT_COALESCE_MAX_BATCH', 256)),
+                   timeout_ms=float(os.environ.get('PREDICT_COALESCE_TIMEOUT_MS', 1000)))
+
+    def predict(self, records):
+        # Big batches gain nothing from coalescing
+        if len(records) >= self.max_batch_size:
+            return self.predict_fn(records)
+
+        self._ensure_started()
+        pending = _Pending(records)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            with self._stats_lock:
+                self.timeouts += 1
+            return self.predict_fn(records)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_started(self):
+        # Started on first use, i.e. in the gunicorn worker rather than a preloading master
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='predict-coalescer')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0].records)
+            deadline = batch[0].enqueued + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    pending = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                rows += len(pending.records)
+            self._dispatch(batch, rows)
+
+    def _dispatch(self, batch, rows):
+        started = time.monotonic()
+        fallback = False
+        try:
+            prices = self.predict_fn([record for pending in batch for record in pending.records])
+            offset = 0
+            for pending in batch:
+                pending.result = prices[offset:offset + len(pending.records)]
+                offset += len(pending.records)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                # Find the bad request(s): score each call on its own
+                fallback = True
+                for pending in batch:
+                    try:
+                        pending.result = self.predict_fn(pending.records)
+                    except Exception as e:
+                        pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += rows
+            self.fallbacks += fallback
+            bucket = 1 << (rows - 1).bit_length() if rows else 0
+            self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+            self.queue_waits.extend(started - pending.enqueued for pending in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            waits = np.array(self.queue_waits) * 1000
+            return {
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch_size': self.max_batch_size,
+                'batches': self.batches,
+                'requests': self.requests,
+                'rows': self.rows,
+                'fallbacks': self.fallbacks,
+                'timeouts': self.timeouts,
+                # Rows per batch, bucketed by the next power of two ("8" = 5-8 rows)
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'p50': round(float(np.percentile(waits, 50)), 3),
+                    'p99': round(float(np.percentile(waits, 99)), 3),
+                    'max': round(float(waits.max()), 3),
+                } if len(waits) else None,
+            }
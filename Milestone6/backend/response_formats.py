@@ -0,0 +1,92 @@
+"""
+Response formats of /api/predict, chosen by the Accept header or ?format=:
+
+    json      application/json (default)            [{"predicted_price": ..., ...}, ...]
+    columnar  application/vnd.pricing.columnar+json {"predicted_price": [...], "baseline_price": [...],
+                                                     "lift": [...]}
+    arrow     application/vnd.apache.arrow.stream   Arrow IPC stream, one float64 column per field
+    float32   application/octet-stream              the three columns back to back as little-endian
+                                                    float32 (X-Columns and X-Rows headers say the layout)
+
+The row format is what the dashboard reads; the others are for batch clients.
+"""
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pip install orjson for faster columnar JSON
+    orjson = None
+
+COLUMNS = ('predicted_price', 'baseline_price', 'lift')
+
+MIMETYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.pricing.columnar+json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'float32': 'application/octet-stream',
+}
+FORMATS_BY_MIMETYPE = {mimetype: fmt for fmt, mimetype in MIMETYPES.items()}
+
+
+class UnsupportedFormat(ValueError):
+    """A response format that is unknown or whose encoder is not installed"""
+
+
+def _arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def negotiate(accept=None, fmt=None, explain=False):
+    """
+    The response format for ?format= (wins) or the Accept header; 'json' if
+    neither names one. Explanations only come as row JSON.
+    """
+    if not fmt:
+        fmt = 'json'
+        best_quality = 0.0
+        for item in (accept or '').split(','):
+            mimetype, *params = [part.strip() for part in item.split(';')]
+            quality = 1.0
+            for param in params:
+                if param.startswith('q='):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            if mimetype in FORMATS_BY_MIMETYPE and quality > best_quality:
+                fmt, best_quality = FORMATS_BY_MIMETYPE[mimetype], quality
+    if fmt not in MIMETYPES:
+        raise UnsupportedFormat(f"Unknown format {fmt!r}; choose from {list(MIMETYPES)}")
+    if explain and fmt != 'json':
+        raise UnsupportedFormat(f"Explanations are only available in the json format, not {fmt!r}")
+    if fmt == 'arrow' and not _arrow_available():
+        raise UnsupportedFormat("The arrow format needs pyarrow (pip install pyarrow)")
+    return fmt
+
+
+def encode(columns, fmt):
+    """(body bytes, mimetype, extra headers) of the columnar response in `fmt`"""
+    if fmt == 'columnar':
+        if orjson is not None:
+            body = orjson.dumps({name: columns[name] for name in COLUMNS}, option=orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            body = json.dumps({name: columns[name].tolist() for name in COLUMNS}, separators=(',', ':')).encode()
+        return body, MIMETYPES[fmt], {}
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.table({name: columns[name] for name in COLUMNS})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), MIMETYPES[fmt], {}
+    if fmt == 'float32':
+        body = np.stack([columns[name] for name in COLUMNS]).astype('<f4').tobytes()
+        return body, MIMETYPES[fmt], {'X-Columns': ','.join(COLUMNS), 'X-Rows': str(len(columns['lift']))}
+    raise UnsupportedFormat(f"{fmt!r} is not a columnar format")
@@ -17,79 +17,43 @@
 # CACHE_DURATION = 300  # 5 minutes
 
 from flask import Blueprint, jsonify, request, current_app
-from models import pricing_model
-import pandas as pd
+from models import pricing_model, MODEL_LOAD_MODE
+from request_coalescer import PredictionCoalescer
+from kpi_store import KpiStore
+from profiler import profiler
+import shared_cache
+import response_formats
+import hmac
 import json
 import os
+import time
+import metrics
 
 api_bp = Blueprint("api", __name__)
 
+# Micro-batches concurrent predict calls when PREDICT_COALESCE_WAIT_MS is set
+coalescer = PredictionCoalescer.from_env(pricing_model.predict)
+if coalescer:
+    metrics.CallbackMetric('pricing_coalescer_batches_total', 'Batches scored by the coalescer',
+                           lambda: coalescer.batches, type='counter')
+    metrics.CallbackMetric('pricing_coalescer_fallbacks_total', 'Coalesced batches retried request by request',
+                           lambda: coalescer.fallbacks, type='counter')
+
 # Absolute path for CSV inside Docker
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "dynamic_pricing.csv")
 
-_dataframe_cache = None
-_cache_timestamp = None
-CACHE_DURATION = 300
-
-
-def get_cached_dataframe():
-    """Load and cache dataframe to avoid repeated file reads"""
-    global _dataframe_cache, _cache_timestamp
-    import time
-    
-    current_time = time.time()
-    
-    # Return cached data if still valid
-    if _dataframe_cache is not None and _cache_timestamp is not None:
-        if current_time - _cache_timestamp < CACHE_DURATION:
-            return _dataframe_cache
-    
-    # Load fresh data
-    try:
-        if os.path.exists(DATA_PATH):
-            _dataframe_cache = pd.read_csv(DATA_PATH)
-            _cache_timestamp = current_time
-            return _dataframe_cache
-        else:
-            return None
-    except Exception as e:
-        print(f"Error loading dataframe: {e}")
-        return None
+# Running KPI aggregates; only newly appended rides are read on each /kpi call
+kpi_store = KpiStore(DATA_PATH, pricing_model, shared_cache.shared)
+
+
+def _app_cache():
+    return current_app.cache if hasattr(current_app, 'cache') else None
 
 def get_dashboard_stats():
-    """Get dashboard statistics with caching"""
+    """Dashboard statistics, kept up to date incrementally as rides are appended to the CSV"""
     try:
-        # Try to get from Flask cache first
-        cache = current_app.cache if hasattr(current_app, 'cache') else None
-        if cache:
-            cached_stats = cache.get('dashboard_stats')
-            if cached_stats:
-                return cached_stats
-        
-        df = get_cached_dataframe()
-        if df is None:
-            return {}
-            
-        total_rides = len(df)
-        avg_rating = df['Average_Ratings'].mean()
-        avg_cost = df['Historical_Cost_of_Ride'].mean()
-        revenue_lift = 15.4 
-        model_accuracy = 0.84 
-        
-        stats = {
-            'total_rides': int(total_rides),
-            'avg_rating': round(float(avg_rating), 2),
-            'avg_price': round(float(avg_cost), 2),
-            'revenue_lift': revenue_lift,
-            'model_accuracy': model_accuracy
-        }
-        
-        # Cache the stats
-        if cache:
-            cache.set('dashboard_stats', stats, timeout=300)
-        
-        return stats
+        return kpi_store.stats()
     except Exception as e:
         print(f"Error loading stats: {e}")
         return {}
@@ -103,62 +67,359 @@ def get_kpis():
 @api_bp.route('/health', methods=['GET'])
 def health():
     """Health check endpoint for monitoring and keep-alive"""
-    return jsonify({
-        'status': 'healthy',
+    status = health_status()
+    return jsonify(status), health_code(status)
+
+def health_code(status):
+    return 503 if status['status'] == 'unhealthy' else 200
+
+def health_status():
+    """
+    unhealthy: no model can be served (load failed); degraded: the last
+    reload failed and the previous model is still being served.
+    """
+    model_status = pricing_model.status()
+    if model_status['model_state'] == 'failed' and not model_status['model_loaded']:
+        state = 'unhealthy'
+    elif model_status['reload_error']:
+        state = 'degraded'
+    else:
+        state = 'healthy'
+    return {
+        'status': state,
         'service': 'Dynamic Pricing API',
         'message': 'Server is running',
-        'model_loaded': pricing_model.model is not None
-    }), 200
+        'load_mode': MODEL_LOAD_MODE,
+        **model_status,
+        'coalescer': coalescer.stats() if coalescer else None
+    }
+
+def _record_served(data, predictions):
+    # Only requests that carried the historical price say anything about revenue lift
+    served = [(pred, record['Historical_Cost_of_Ride']) for pred, record in zip(predictions, data)
+              if 'Historical_Cost_of_Ride' in record]
+    if served:
+        kpi_store.record_predictions(*zip(*served))
+
+def score_requests(data):
+    """Score one request or a list of requests; returns (requests as a list, prices)"""
+    if isinstance(data, dict):
+        data = [data]
+    metrics.REQUEST_ROWS.observe(len(data))
+    predictions = coalescer.predict(data) if coalescer else pricing_model.predict(data)
+    _record_served(data, predictions)
+    return data, predictions
+
+def explain_requests(data):
+    """score_requests plus each price's explanation, in one batched model call (see PricingModel.explain)"""
+    if isinstance(data, dict):
+        data = [data]
+    metrics.REQUEST_ROWS.observe(len(data))
+    predictions, explanations = pricing_model.explain(data)
+    predictions = predictions.tolist()
+    _record_served(data, predictions)
+    return data, predictions, explanations
+
+def explain_requested(args):
+    """Whether ?explain= asks for per-prediction explanations"""
+    return args.get('explain', '').lower() in ('1', 'true', 'yes')
+
+def predict_prices(data, explain=False):
+    """
+    Score one request or a list of requests and build the /predict response
+    body; with explain, every row also gets an 'explanation'
+    """
+    if explain:
+        data, predictions, explanations = explain_requests(data)
+    else:
+        data, predictions = score_requests(data)
+    start = time.perf_counter()
+    results = []
+    for i, pred in enumerate(predictions):
+        base_price = data[i].get('Historical_Cost_of_Ride', pred * 0.9)
+        results.append({
+            'predicted_price': round(pred, 2),
+            'baseline_price': round(base_price, 2),
+            'lift': round(pred - base_price, 2)
+        })
+    if explain:
+        for result, explanation in zip(results, explanations):
+            result['explanation'] = explanation
+    metrics.RESPONSE_SECONDS.observe(time.perf_counter() - start)
+    return results
+
+def predict_columns(data):
+    """The /predict response as float64 columns (see response_formats), built with NumPy"""
+    import numpy as np
+
+    data, predictions = score_requests(data)
+    start = time.perf_counter()
+    predicted = np.asarray(predictions, dtype=np.float64)
+    baseline = np.fromiter((record.get('Historical_Cost_of_Ride', np.nan) for record in data),
+                           dtype=np.float64, count=len(data))
+    baseline = np.where(np.isnan(baseline), predicted * 0.9, baseline)
+    columns = {
+        'predicted_price': np.round(predicted, 2),
+        'baseline_price': np.round(baseline, 2),
+        'lift': np.round(predicted - baseline, 2),
+    }
+    metrics.RESPONSE_SECONDS.observe(time.perf_counter() - start)
+    return columns
 
 @api_bp.route('/predict', methods=['POST'])
 def predict():
+    """
+    Row dicts by default; columnar JSON, Arrow or float32 on request (see
+    response_formats). ?explain=true adds each price's explanation (row JSON only).
+    """
+    start = time.perf_counter()
+    explain = explain_requested(request.args)
+    try:
+        fmt = response_formats.negotiate(request.headers.get('Accept'), request.args.get('format'), explain)
+    except response_formats.UnsupportedFormat as e:
+        metrics.ERRORS.inc('predict', 'unsupported_format')
+        return jsonify({'error': str(e)}), 406
     try:
         data = request.json
-        if isinstance(data, dict):
-            data = [data]
-        predictions = pricing_model.predict(data)
-        results = []
-        for i, pred in enumerate(predictions):
-            base_price = data[i].get('Historical_Cost_of_Ride', pred * 0.9)
-            results.append({
-                'predicted_price': round(pred, 2),
-                'baseline_price': round(base_price, 2),
-                'lift': round(pred - base_price, 2)
-            })
-        return jsonify(results)
+        parsed = time.perf_counter()
+        if fmt == 'json':
+            results = predict_prices(data, explain)
+            serialize_start = time.perf_counter()
+            response = jsonify(results)
+        else:
+            columns = predict_columns(data)
+            serialize_start = time.perf_counter()
+            body, mimetype, headers = response_formats.encode(columns, fmt)
+            response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+        response.vary.add('Accept')
+        done = time.perf_counter()
+        metrics.PARSE_SECONDS.observe(parsed - start)
+        metrics.SERIALIZE_SECONDS.observe(done - serialize_start)
+        metrics.PREDICT_SECONDS.observe(done - start)
+        return response
+    except Exception as e:
+        metrics.ERRORS.inc('predict', metrics.error_type(e))
+        return jsonify({'error': str(e)}), 400
+
+def optimize_prices(data):
+    """The /optimize response: a what-if sweep around one ride (see whatif.sweep)"""
+    from whatif import sweep
+
+    return sweep(pricing_model, data.get('base'), data.get('vary'), data.get('objective', 'revenue'),
+                 data.get('surface', True))
+
+@api_bp.route('/optimize', methods=['POST'])
+def optimize():
+    """Revenue-optimal setting and response surface over a grid of scenarios, in one model call"""
+    start = time.perf_counter()
+    try:
+        response = jsonify(optimize_prices(request.json))
     except Exception as e:
+        metrics.ERRORS.inc('optimize', metrics.error_type(e))
         return jsonify({'error': str(e)}), 400
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, 'optimize')
+    return response
+
+def admin_denied(token):
+    """
+    None if a request with this X-Admin-Token may use the admin endpoints,
+    else (error body, status). They need the token to match ADMIN_TOKEN, and
+    are off when it is unset.
+    """
+    expected = os.environ.get('ADMIN_TOKEN')
+    if not expected:
+        return {'error': 'Admin endpoints are disabled: set ADMIN_TOKEN'}, 403
+    if not hmac.compare_digest((token or '').encode(), expected.encode()):
+        return {'error': 'Unauthorized'}, 401
+    return None
+
+def _admin_denied():
+    denied = admin_denied(request.headers.get('X-Admin-Token'))
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    return None
+
+def model_versions():
+    """Registered model versions and the one this worker is serving"""
+    return {
+        'serving': pricing_model.status(),
+        'versions': pricing_model.registry.list(),
+    }
+
+@api_bp.route('/admin/models', methods=['GET'])
+def list_models():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify(model_versions())
+
+def reload_model_version(data):
+    """
+    Hot-swap the model: {"version": "v0003"} serves that registry version,
+    an empty body reloads the current one. With {"wait": false} the new model
+    is loaded in the background and the call returns immediately.
+    Returns (body, status).
+    """
+    version = data.get('version')
+    if version and version not in pricing_model.registry.versions():
+        return {'error': f"Unknown model version: {version}"}, 404
+
+    if not data.get('wait', True):
+        pricing_model.reload_async(version=version, promote=True)
+        return {'status': 'reloading', **pricing_model.status()}, 202
+
+    # Promoting the version in the registry lets the other workers follow through their watchers
+    if not pricing_model.reload(version=version, promote=True):
+        return {'error': pricing_model.reload_error, **pricing_model.status()}, 409
+    return {'status': 'reloaded', **pricing_model.status()}, 200
+
+@api_bp.route('/admin/reload', methods=['POST'])
+def reload_model():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    body, status = reload_model_version(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+def control_profiler(data):
+    """
+    {"action": "start", "interval_ms": 10, "max_seconds": 60} or
+    {"action": "stop"} toggles the sampling profiler in this worker.
+    Returns (body, status).
+    """
+    if data.get('action') == 'stop':
+        profiler.stop()
+    elif data.get('action') == 'start':
+        try:
+            interval_ms = float(data.get('interval_ms', 10))
+            max_seconds = float(data.get('max_seconds', 60))
+        except (TypeError, ValueError):
+            interval_ms = max_seconds = float('nan')
+        if not (1 <= interval_ms <= 1000 and 0 < max_seconds <= 600):
+            return {'error': 'interval_ms must be 1-1000 and max_seconds 0-600'}, 400
+        if not profiler.start(interval_ms, max_seconds):
+            return {'error': 'Profiler already running', **profiler.status()}, 409
+    else:
+        return {'error': 'action must be "start" or "stop"'}, 400
+    return profiler.status(), 200
+
+@api_bp.route('/admin/profiler', methods=['GET', 'POST'])
+def sampling_profiler():
+    """
+    POST toggles the sampling profiler (see control_profiler); GET returns
+    its status, or the collapsed stacks with ?format=collapsed.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'GET':
+        if request.args.get('format') == 'collapsed':
+            return profiler.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        return jsonify(profiler.status())
+    body, status = control_profiler(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+# Rows per scored chunk of a /bulk-predict upload
+MAX_BULK_CHUNK_SIZE = 100000
+
+def bulk_options(mimetype, args):
+    """
+    (format, chunk_size, response mimetype) of a /bulk-predict upload: JSON
+    Lines for a JSON content type, else CSV. ValueError on a bad ?chunk_size=.
+    """
+    fmt = 'jsonl' if 'json' in (mimetype or '') else 'csv'
+    chunk_size = args.get('chunk_size', '10000')
+    chunk_size = int(chunk_size) if chunk_size.isdigit() else 0
+    if not 1 <= chunk_size <= MAX_BULK_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be an integer from 1 to {MAX_BULK_CHUNK_SIZE}")
+    return fmt, chunk_size, 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+
+def bulk_lines(stream, fmt, chunk_size):
+    """The repriced upload read from a binary stream, as response text chunk by chunk"""
+    import io
+    from bulk_pricing import ChunkWriter, read_chunks, score_chunks
+
+    buffer = io.StringIO()
+    writer = ChunkWriter(buffer, fmt)
+    try:
+        for scored in score_chunks(read_chunks(stream, fmt, chunk_size)):
+            writer.write(scored)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except Exception as e:
+        # The 200 status is already sent: end the stream with an error record instead of truncating it
+        metrics.ERRORS.inc('bulk_predict', metrics.error_type(e))
+        message = f"{type(e).__name__}: {e}"
+        yield json.dumps({'error': message}) + '\n' if fmt == 'jsonl' else f"# error: {message}\n"
+
+@api_bp.route('/bulk-predict', methods=['POST'])
+def bulk_predict():
+    """
+    Reprice a CSV (text/csv) or JSON Lines (application/x-ndjson) upload.
+    The body is read and the response streamed back chunk by chunk
+    (?chunk_size=, default 10000 rows), so memory stays bounded.
+    """
+    from flask import Response, stream_with_context
+
+    try:
+        fmt, chunk_size, mimetype = bulk_options(request.mimetype, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(stream_with_context(bulk_lines(request.stream, fmt, chunk_size)), mimetype=mimetype)
+
+FEATURE_IMPORTANCE_PATH = 'feature_importance.json'
+# (mtime, parsed file): parsed once, and again only when training rewrites it
+_feature_importance = (None, [])
+
+def load_feature_importance():
+    """Global feature importance written by train_and_save_model.py, kept in memory"""
+    global _feature_importance
+    try:
+        mtime = os.path.getmtime(FEATURE_IMPORTANCE_PATH)
+        if mtime != _feature_importance[0]:
+            with open(FEATURE_IMPORTANCE_PATH, 'r') as f:
+                _feature_importance = (mtime, json.load(f))
+    except (OSError, ValueError):
+        return []
+    return _feature_importance[1]
 
 @api_bp.route('/feature-importance', methods=['GET'])
 def get_feature_importance():
+    return jsonify(load_feature_importance())
+
+def query_visualization(args, cache=None):
+    """
+    Downsampled plot data for ?x=&y=&points=&method= (see visualization.query),
+    cached per dataset version. None if there is no dataset.
+    """
+    from data_snapshot import load_snapshot
+    from visualization import cached_query
+
+    return cached_query(lambda: load_snapshot(DATA_PATH),
+                        args.get('x', 'Expected_Ride_Duration'), args.get('y', 'Historical_Cost_of_Ride'),
+                        int(args.get('points', 500)), args.get('method', 'stratified'), cache)
+
+@api_bp.route('/visualizations/query', methods=['GET'])
+def get_visualization_query():
+    try:
+        result = query_visualization(request.args, _app_cache())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result is None:
+        return jsonify({'error': 'Dataset not available'}), 404
+    return jsonify(result)
+
+def get_scatter_points(cache=None):
+    """Scatter plot data: a stratified sample of 100 rides over the whole dataset"""
     try:
-        with open('feature_importance.json', 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
-    except:
-        return jsonify([])
+        result = query_visualization({'points': 100}, cache)
+        return result['points'] if result else []
+    except Exception as e:
+        print(f"Error loading scatter data: {e}")
+        return []
 
 @api_bp.route('/visualizations/scatter', methods=['GET'])
 def get_scatter_data():
     """Get scatter plot data (cached)"""
-    try:
-        cache = current_app.cache if hasattr(current_app, 'cache') else None
-        if cache:
-            cached_data = cache.get('scatter_data')
-            if cached_data:
-                return jsonify(cached_data)
-        
-        df = get_cached_dataframe()
-        if df is None:
-            return jsonify([])
-            
-        data = df[['Expected_Ride_Duration', 'Historical_Cost_of_Ride']].head(100).to_dict(orient='records')
-        
-        # Cache the data
-        if cache:
-            cache.set('scatter_data', data, timeout=300)
-        
-        return jsonify(data)
-    except Exception as e:
-        print(f"Error loading scatter data: {e}")
-        return jsonify([])
+    return jsonify(get_scatter_points(_app_cache()))
@@ -0,0 +1,284 @@
+"""
+Cache shared by every worker process on a host.
+
+One pickle file per key in a private directory on tmpfs ($XDG_RUNTIME_DIR,
+else /dev/shm when available; SHARED_CACHE_DIR to override), written
+atomically, so workers see each other's entries without a cache server.
+Since every read unpickles those files, the directory is only used if it is
+a real directory owned by this user with no group/other access; otherwise
+the cache stays empty and every lookup recomputes. get_or_set() recomputes a
+missing or expired entry in one worker only (single flight, an fcntl lock
+on one of LOCK_STRIPES fixed lock files, picked by key hash); the other workers keep serving the stale value for up to
+stale_timeout seconds instead of waiting or recomputing it themselves.
+
+Set APP_CACHE=simple to go back to a per-process SimpleCache.
+"""
+import hashlib
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import time
+
+from flask_caching.backends.base import BaseCache
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: no single flight, every worker recomputes
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENABLED = os.environ.get('APP_CACHE', 'shared') != 'simple'
+
+# Lock files shared by all keys: keys come from request parameters, so a lock
+# file per key would grow without bound
+LOCK_STRIPES = 64
+
+# Each file: expires_at (float64, 0 for never) then the pickled value
+_EXPIRES = struct.Struct('<d')
+
+EVENTS = metrics.Counter('pricing_shared_cache_events_total',
+                         'Shared cache lookups by outcome (hit, miss, stale, recompute, wait)', ('event',))
+
+
+def default_directory():
+    """SHARED_CACHE_DIR, else a directory per deployment in $XDG_RUNTIME_DIR, /dev/shm or the temp dir"""
+    if os.environ.get('SHARED_CACHE_DIR'):
+        return os.environ['SHARED_CACHE_DIR']
+    # XDG_RUNTIME_DIR is already private to the user; the others are world-writable
+    root = os.environ.get('XDG_RUNTIME_DIR') or \
+        ('/dev/shm' if os.access('/dev/shm', os.W_OK) else tempfile.gettempdir())
+    return os.path.join(root, f"pricing-cache-{os.getuid() if hasattr(os, 'getuid') else 0}-"
+                              f"{hashlib.sha1(BASE_DIR.encode()).hexdigest()[:8]}")
+
+
+def private_directory(directory):
+    """
+    Create directory (0700) if needed; raises PermissionError unless it is
+    a real directory (not a symlink), owned by this user, with no group or
+    other permissions. Someone else could otherwise plant pickles in it.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{directory} is not a directory (or is a symlink)")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by uid {info.st_uid}, not {os.getuid()}")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"{directory} is accessible to other users (mode {stat.filemode(info.st_mode)})")
+    return directory
+
+
+class SharedCache(BaseCache):
+    """Flask-Caching / cachelib backend over a directory shared by the workers (see module docstring)"""
+    def __init__(self, directory=None, default_timeout=300, threshold=500, stale_timeout=300, **kwargs):
+        super().__init__(default_timeout=default_timeout, **kwargs)
+        self.directory = directory or default_directory()
+        self.threshold = threshold
+        self.stale_timeout = stale_timeout
+        # Checked on first use, not at import: None until then, False if refused
+        self._usable = None
+
+    def _checked(self):
+        """Whether the directory is safe to load pickles from (see private_directory)"""
+        if self._usable is None:
+            try:
+                private_directory(self.directory)
+                self._usable = True
+            except OSError as e:
+                print(f"❌ Shared cache disabled: {e}")
+                self._usable = False
+        return self._usable
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        """Flask-Caching entry point (CACHE_TYPE='shared_cache.SharedCache')"""
+        return cls(*args, directory=config.get('CACHE_DIR'), threshold=config['CACHE_THRESHOLD'], **kwargs)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _lock_path(self, key):
+        stripe = int.from_bytes(hashlib.sha1(key.encode()).digest()[:4], 'big') % LOCK_STRIPES
+        return os.path.join(self.directory, f"stripe-{stripe:02d}.lock")
+
+    def _read(self, key):
+        """(expires_at, value) as stored (expires_at 0: never), or None"""
+        if not self._checked():
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, = _EXPIRES.unpack(f.read(_EXPIRES.size))
+                return expires_at, pickle.load(f)
+        except (OSError, EOFError, struct.error, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def _fresh(entry, now):
+        return entry is not None and (entry[0] == 0 or entry[0] > now)
+
+    def get(self, key):
+        entry = self._read(key)
+        if self._fresh(entry, time.time()):
+            EVENTS.inc('hit')
+            return entry[1]
+        EVENTS.inc('miss')
+        return None
+
+    def set(self, key, value, timeout=None):
+        if not self._checked():
+            return False
+        timeout = self._normalize_timeout(timeout)
+        expires_at = time.time() + timeout if timeout else 0
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_EXPIRES.pack(expires_at))
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._prune()
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def has(self, key):
+        return self._fresh(self._read(key), time.time())
+
+    def delete(self, key):
+        if not self._checked():
+            return False
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        if not self._checked():
+            return False
+        for name in os.listdir(self.directory):
+            if not name.endswith('.lock'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        The cached value, or compute()'s (cached unless None). While one
+        worker recomputes an expired entry the others get the stale value;
+        with nothing to serve they wait for the recompute and read its result.
+        compute() must not call get_or_set itself: its key may share the lock stripe.
+        """
+        entry = self._read(key)
+        if self._fresh(entry, time.time()):
+            EVENTS.inc('hit')
+            return entry[1]
+        if fcntl is None or not self._usable:
+            return self._recompute(key, compute, timeout)
+
+        with open(self._lock_path(key), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if entry is not None and (entry[0] == 0 or time.time() < entry[0] + self.stale_timeout):
+                    EVENTS.inc('stale')
+                    return entry[1]
+                EVENTS.inc('wait')
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Recomputed by another worker while we waited for the lock
+                entry = self._read(key)
+                if self._fresh(entry, time.time()):
+                    EVENTS.inc('hit')
+                    return entry[1]
+                return self._recompute(key, compute, timeout)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def update(self, key, fn, timeout=None):
+        """
+        Store fn(current value or None) under key, holding the key's lock so
+        concurrent updates from other workers are not lost. Returns the new value.
+        """
+        if fcntl is None or not self._checked():
+            value = fn(self.get(key))
+            self.set(key, value, timeout)
+            return value
+        with open(self._lock_path(key), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entry = self._read(key)
+                value = fn(entry[1] if self._fresh(entry, time.time()) else None)
+                self.set(key, value, timeout)
+                return value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _recompute(self, key, compute, timeout):
+        EVENTS.inc('recompute')
+        value = compute()
+        if value is not None:
+            self.set(key, value, timeout)
+        return value
+
+    def _prune(self):
+        """Beyond threshold entries, drop those past their stale window, then the oldest"""
+        names = [name for name in os.listdir(self.directory) if '.' not in name]
+        if len(names) <= self.threshold:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    expires_at, = _EXPIRES.unpack(f.read(_EXPIRES.size))
+                entries.append((os.path.getmtime(path), expires_at, path))
+            except (OSError, struct.error):
+                continue
+        keep = []
+        for mtime, expires_at, path in entries:
+            if expires_at and expires_at + self.stale_timeout < now:
+                _remove(path)
+            else:
+                keep.append((mtime, path))
+        for _, path in sorted(keep)[:max(0, len(keep) - self.threshold)]:
+            _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_or_set(cache, key, compute, timeout=None):
+    """Single-flight cache.get_or_set() when the backend has it, else get and set"""
+    # Flask-Caching's Cache wraps the backend
+    backend = getattr(cache, 'cache', cache)
+    if hasattr(backend, 'get_or_set'):
+        return backend.get_or_set(key, compute, timeout)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout=timeout)
+    return value
+
+
+# The host-wide cache, for module-level state such as the KPI aggregates; None with APP_CACHE=simple
+shared = SharedCache() if ENABLED else None
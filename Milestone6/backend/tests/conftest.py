@@ -0,0 +1,31 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_RIDES_PATH = os.path.join(BACKEND_DIR, '..', '..', 'Data', 'raw', 'dynamic_pricing.csv')
+
+# The service modules live in the backend directory and read their settings at import time:
+# score every request straight through the model
+sys.path.insert(0, BACKEND_DIR)
+for _name, _value in {'PREDICTION_CACHE_SIZE': '0', 'PREDICT_COALESCE_WAIT_MS': '0',
+                      'MODEL_WATCH_INTERVAL': '0'}.items():
+    os.environ.setdefault(_name, _value)
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def pricing_model():
+    from models import pricing_model
+
+    if not pricing_model.is_loaded:
+        pytest.skip(f"No model artifacts: {pricing_model.load_error}")
+    return pricing_model
+
+
+@pytest.fixture(scope='session')
+def rides():
+    """The bundled rides as request records"""
+    from utils import load_ride_records
+
+    return load_ride_records()
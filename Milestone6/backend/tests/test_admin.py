@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture
+def client():
+    from app import create_app
+
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('method,path', [('get', '/api/admin/models'), ('post', '/api/admin/reload')])
+def test_admin_endpoints_are_off_without_a_token(client, monkeypatch, method, path):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    response = getattr(client, method)(path, json={})
+    assert response.status_code == 403
+
+
+def test_admin_endpoints_need_the_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.get('/api/admin/models').status_code == 401
+    assert client.get('/api/admin/models', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+    assert client.get('/api/admin/models', headers={'X-Admin-Token': 'secret'}).status_code == 200
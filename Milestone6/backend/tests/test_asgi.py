@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope='module')
+def flask_client():
+    from app import create_app
+
+    return create_app().test_client()
+
+
+def asgi_call(method, path, body=b'', headers=None, chunk_bytes=4096):
+    """(status, headers, body) of one request to the ASGI app, with the body sent in chunks"""
+    from asgi import app
+
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+             'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1),
+             'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]}
+    parts = [body[i:i + chunk_bytes] for i in range(0, len(body), chunk_bytes)] or [b'']
+    messages = [{'type': 'http.request', 'body': part, 'more_body': i < len(parts) - 1}
+                for i, part in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = next(message for message in sent if message['type'] == 'http.response.start')
+    response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(message.get('body', b'') for message in sent
+                                                        if message['type'] == 'http.response.body')
+
+
+def test_route_tables_match(flask_client):
+    """Every Flask route has an ASGI handler, so switching the worker class drops nothing"""
+    from asgi import app
+
+    flask_routes = {(rule.rule, method) for rule in flask_client.application.url_map.iter_rules()
+                    if rule.endpoint != 'static' for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    asgi_routes = {(route.path, method) for route in app.routes for method in route.methods - {'HEAD'}}
+    assert flask_routes == asgi_routes
+
+
+def test_bulk_predict_matches_flask(pricing_model, rides, flask_client):
+    body = pd.DataFrame(rides[:500]).to_csv(index=False).encode()
+    expected = flask_client.post('/api/bulk-predict?chunk_size=100', data=body, content_type='text/csv')
+    status, headers, content = asgi_call('POST', '/api/bulk-predict?chunk_size=100', body,
+                                         {'Content-Type': 'text/csv'})
+    assert status == expected.status_code == 200
+    assert headers['content-type'].startswith('text/csv')
+    assert content == expected.data
+
+    status, _, content = asgi_call('POST', '/api/bulk-predict?chunk_size=0', body, {'Content-Type': 'text/csv'})
+    assert status == 400
+
+
+def test_admin_routes_need_the_token(monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert asgi_call('GET', '/api/admin/models')[0] == 403
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert asgi_call('POST', '/api/admin/profiler', b'{"action": "start"}')[0] == 401
+
+    status, _, content = asgi_call('POST', '/api/admin/profiler', b'{"action": "nap"}',
+                                   {'X-Admin-Token': 'secret'})
+    assert status == 400
+    assert 'error' in json.loads(content)
@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def chunk(rides):
+    return pd.DataFrame(rides[:200])
+
+
+def test_bad_rows_do_not_fall_back_to_row_by_row_scoring(pricing_model, chunk, monkeypatch):
+    import bulk_pricing
+
+    expected = np.round(pricing_model.predict(chunk), 2)
+    chunk.loc[3, 'Location_Category'] = 'Lunar'
+    chunk['Number_of_Riders'] = chunk['Number_of_Riders'].astype(object)
+    chunk.loc[7, 'Number_of_Riders'] = 'many'
+    calls = []
+    predict = pricing_model.predict
+    monkeypatch.setattr(pricing_model, 'predict', lambda data: calls.append(len(data)) or predict(data))
+
+    prices = bulk_pricing.score_chunk(chunk)['predicted_price'].to_numpy()
+    assert calls == [len(chunk) - 2]
+    assert np.isnan(prices[[3, 7]]).all()
+    good = np.setdiff1d(np.arange(len(chunk)), [3, 7])
+    assert np.array_equal(prices[good], expected[good])
+
+
+def test_unexpected_failures_are_bisected(pricing_model, chunk, monkeypatch):
+    import bulk_pricing
+
+    predict = pricing_model.predict
+
+    def failing(data):
+        if 5 in data.index:
+            raise ValueError("boom")
+        return predict(data)
+
+    monkeypatch.setattr(pricing_model, 'predict', failing)
+    prices = bulk_pricing.score_chunk(chunk)['predicted_price'].to_numpy()
+    assert np.isnan(prices).sum() == 1 and np.isnan(prices[5])
+
+
+@pytest.fixture
+def client():
+    from app import create_app
+
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('chunk_size', ['0', '-5', 'ten', '100000000'])
+def test_bulk_predict_rejects_bad_chunk_sizes(client, chunk_size):
+    response = client.post(f'/api/bulk-predict?chunk_size={chunk_size}', data='a,b\n1,2\n', content_type='text/csv')
+    assert response.status_code == 400
+
+
+def test_bulk_predict_ends_a_failed_stream_with_an_error_record(client, chunk, monkeypatch):
+    import bulk_pricing
+
+    def score_chunks(chunks):
+        yield bulk_pricing.score_chunk(next(chunks))
+        raise RuntimeError("scoring worker died")
+
+    monkeypatch.setattr(bulk_pricing, 'score_chunks', score_chunks)
+    body = io.StringIO()
+    chunk.to_csv(body, index=False)
+    response = client.post('/api/bulk-predict?chunk_size=50', data=body.getvalue(), content_type='text/csv')
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1 + 50 + 1
+    assert lines[-1] == "# error: RuntimeError: scoring worker died"
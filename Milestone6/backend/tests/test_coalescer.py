@@ -0,0 +1,27 @@
+import threading
+
+from request_coalescer import PredictionCoalescer
+
+
+def test_coalesced_calls_get_their_own_slice():
+    coalescer = PredictionCoalescer(lambda records: [record['x'] * 2 for record in records], max_wait_ms=5)
+    results = {}
+
+    def call(i):
+        results[i] = coalescer.predict([{'x': i}, {'x': i + 100}])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: [i * 2, (i + 100) * 2] for i in range(8)}
+
+
+def test_stuck_dispatcher_falls_back_to_a_direct_predict():
+    coalescer = PredictionCoalescer(lambda records: [1.0] * len(records), max_wait_ms=1, timeout_ms=50)
+    # A dispatcher that never runs: the queued call must not hang its request thread
+    coalescer._thread = threading.Thread(target=lambda: None)
+
+    assert coalescer.predict([{}, {}]) == [1.0, 1.0]
+    assert coalescer.stats()['timeouts'] == 1
@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import data_snapshot
+
+
+@pytest.fixture
+def rides_csv(tmp_path, monkeypatch):
+    from utils import BUNDLED_RIDES_PATH
+
+    monkeypatch.setattr(data_snapshot, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(data_snapshot, '_loaded', {})
+    return shutil.copy(BUNDLED_RIDES_PATH, tmp_path / 'rides.csv')
+
+
+def _append_ride(path):
+    with open(path, 'rb') as f:
+        last = f.read().splitlines()[-1]
+    with open(path, 'ab') as f:
+        f.write(last + b'\n')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+
+
+def test_snapshot_matches_csv(rides_csv):
+    import pandas as pd
+
+    df, meta = data_snapshot.load_snapshot(rides_csv)
+    expected = pd.read_csv(rides_csv)
+    assert meta['rows'] == len(expected)
+    assert np.allclose(df['Historical_Cost_of_Ride'], expected['Historical_Cost_of_Ride'])
+
+
+def test_rebuild_keeps_the_previous_build_for_late_readers(rides_csv, monkeypatch):
+    old_meta = data_snapshot.ensure_snapshot(rides_csv)
+    _append_ride(rides_csv)
+    new_meta = data_snapshot.ensure_snapshot(rides_csv)
+    assert new_meta['build_id'] != old_meta['build_id']
+    # A worker that read meta.json just before the rebuild can still map it
+    assert len(data_snapshot._map_snapshot(rides_csv, old_meta)) == old_meta['rows']
+
+    # Past the grace period, the next rebuild deletes it
+    monkeypatch.setattr(data_snapshot, 'BUILD_GRACE_SECONDS', -1)
+    _append_ride(rides_csv)
+    data_snapshot.ensure_snapshot(rides_csv)
+    with pytest.raises(FileNotFoundError):
+        data_snapshot._map_snapshot(rides_csv, old_meta)
+
+
+def test_reader_with_a_deleted_build_maps_the_current_one(rides_csv, monkeypatch):
+    stale_meta = data_snapshot.ensure_snapshot(rides_csv)
+    _append_ride(rides_csv)
+    current = data_snapshot.ensure_snapshot(rides_csv)
+    shutil.rmtree(os.path.join(data_snapshot._snapshot_dir(rides_csv), f"build-{stale_meta['build_id']}"))
+
+    # ensure_snapshot returns the stale meta first, as if read before the rebuild
+    metas = iter([stale_meta, current])
+    monkeypatch.setattr(data_snapshot, 'ensure_snapshot', lambda path: next(metas))
+    df, meta = data_snapshot.load_snapshot(rides_csv)
+    assert meta['build_id'] == current['build_id']
+    assert len(df) == current['rows']
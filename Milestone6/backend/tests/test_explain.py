@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def test_explained_prices_match_predict(pricing_model, rides):
+    prices, explanations = pricing_model.explain(rides)
+    # Float32 precision: XGBoost's contributions (and scores) are float32
+    assert np.allclose(prices, pricing_model.predict(rides), rtol=1e-5, atol=1e-4)
+    assert len(explanations) == len(rides)
+
+
+def test_contributions_add_up_to_model_price(pricing_model, rides):
+    _, explanations = pricing_model.explain(rides)
+    X, _ = pricing_model.feature_spec.transform(rides)
+    totals = np.array([e['expected_value'] + sum(e['contributions'].values()) for e in explanations])
+    # Contributions are rounded to 4 decimals in the response
+    assert np.max(np.abs(totals - pricing_model.backend.predict(X))) <= 1e-3 * len(pricing_model.feature_cols)
+
+
+def test_rule_trace_lists_fired_rules(pricing_model, rides):
+    _, explanations = pricing_model.explain(rides)
+    for explanation in explanations:
+        rules = [rule['rule'] for rule in explanation['rules']]
+        assert rules[-1] == 'normalizer'
+
+
+def test_empty_batch_explains_to_an_empty_list():
+    from app import create_app
+
+    client = create_app().test_client()
+    for explain in ('false', 'true'):
+        response = client.post(f'/api/predict?explain={explain}', json=[])
+        assert response.status_code == 200
+        assert response.get_json() == []
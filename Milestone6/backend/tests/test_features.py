@@ -0,0 +1,19 @@
+import numpy as np
+
+from parity_reference import reference_features
+
+
+def test_feature_spec_matches_pandas_features(pricing_model, rides):
+    spec = pricing_model.feature_spec
+    df = reference_features(rides, spec)
+    X, rule_inputs = spec.transform(rides)
+
+    assert np.array_equal(X, df[spec.feature_cols].to_numpy(dtype=np.float32), equal_nan=True)
+    for col, values in rule_inputs.items():
+        assert np.array_equal(np.asarray(values), df[col].to_numpy()), col
+
+
+def test_column_input_matches_records(pricing_model, rides):
+    spec = pricing_model.feature_spec
+    columns = {col: [record[col] for record in rides] for col in rides[0]}
+    assert np.array_equal(spec.transform(rides)[0], spec.transform(columns)[0], equal_nan=True)
@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+def test_hot_reload_under_load(pricing_model, rides, tmp_path, seconds=2.0, threads=4):
+    """Swap registry versions back and forth while threads keep predicting: no request may fail"""
+    from models import PricingModel
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(str(tmp_path))
+    versions = [registry.publish([pricing_model.model_path]) for _ in range(2)]
+    model = PricingModel(registry=registry)
+    records = rides[:100]
+
+    stop = threading.Event()
+    errors = []
+
+    def client():
+        while not stop.is_set():
+            try:
+                model.predict(records)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    swaps = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        swaps += model.reload(version=versions[swaps % 2], promote=True)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    assert swaps > 1
+    assert not errors
+
+
+def test_broken_version_is_not_swapped_in(pricing_model, tmp_path):
+    from models import PricingModel
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(str(tmp_path))
+    registry.publish([pricing_model.model_path])
+    model = PricingModel(registry=registry)
+    serving = model.version
+
+    broken = registry.publish([pricing_model.model_path], promote=False)
+    open(registry.artifact_path(broken), 'wb').close()
+    assert not model.reload(version=broken)
+    assert model.version == serving
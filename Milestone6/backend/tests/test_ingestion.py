@@ -0,0 +1,33 @@
+import contextlib
+import io
+import os
+import warnings
+
+import pandas as pd
+import pytest
+
+from conftest import RAW_RIDES_PATH
+from parity_reference import dirty_rides, reference_ingestion
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    if not os.path.exists(RAW_RIDES_PATH):
+        pytest.skip("No raw rides")
+    dirty = tmp_path_factory.mktemp('ingestion') / 'dirty.csv'
+    dirty_rides(pd.read_csv(RAW_RIDES_PATH), 5, repeat_fraction=0.05).to_csv(dirty, index=False)
+    return {'raw': RAW_RIDES_PATH, 'dirty': str(dirty)}
+
+
+@pytest.mark.parametrize('source', ['raw', 'dirty'])
+@pytest.mark.parametrize('block_bytes,workers', [(2 ** 30, 1), (16 * 1024, 1), (16 * 1024, 2)])
+def test_chunked_ingestion_matches_notebook(sources, source, block_bytes, workers, tmp_path):
+    from data_ingestion import data_ingestion_pipeline
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        reference_ingestion(sources[source], tmp_path / 'expected.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_ingestion_pipeline(sources[source], str(tmp_path / 'chunked.csv'), block_bytes=block_bytes,
+                                workers=workers)
+    assert (tmp_path / 'chunked.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
@@ -0,0 +1,68 @@
+import shutil
+import threading
+
+import pytest
+
+from kpi_store import KpiStore
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def rides_csv(tmp_path):
+    from utils import BUNDLED_RIDES_PATH
+
+    return shutil.copy(BUNDLED_RIDES_PATH, tmp_path / 'rides.csv')
+
+
+@pytest.fixture
+def lazy_model(pricing_model):
+    from models import PricingModel
+
+    return PricingModel(model_path=pricing_model.model_path, lazy=True)
+
+
+def test_kpis_are_numbers_in_lazy_mode(rides_csv, lazy_model):
+    """Before the first predict of a lazily loaded worker, the revenue lift must still be computed"""
+    stats = KpiStore(str(rides_csv), lazy_model).stats()
+    assert lazy_model.is_loaded
+    for field in ('revenue_lift', 'served_revenue_lift'):
+        assert isinstance(stats[field], float), field
+
+
+def test_r2_is_the_artifacts_held_out_score(rides_csv, lazy_model):
+    store = KpiStore(str(rides_csv), lazy_model)
+    lazy_model.ensure_loaded()
+    lazy_model._loaded.evaluation = None
+    assert store.stats()['model_r2'] is None
+
+    lazy_model._loaded.evaluation = {'r2': 0.912345, 'rmse': 60.0, 'rows': 200}
+    stats = store.stats()
+    assert stats['model_r2'] == stats['model_accuracy'] == 0.9123
+
+
+def test_model_change_rescores_off_the_request_path(rides_csv, lazy_model, monkeypatch):
+    store = KpiStore(str(rides_csv), lazy_model)
+    before = store.stats()
+
+    scored_in = []
+    add_rides = KpiStore._add_rides
+    monkeypatch.setattr(KpiStore, '_add_rides',
+                        lambda self, df: scored_in.append(threading.current_thread().name) or add_rides(self, df))
+    lazy_model.reload_count += 1
+    assert store.stats()['revenue_lift'] == before['revenue_lift']
+    store._rebuild.join()
+    assert scored_in and set(scored_in) == {'kpi-rebuild'}
+    assert store._model_key == store._current_model_key()
+    assert store.stats() == before
+
+
+def test_served_totals_add_up_over_workers(rides_csv, lazy_model, tmp_path):
+    cache = SharedCache(directory=str(tmp_path / 'cache'))
+    workers = [KpiStore(str(rides_csv), lazy_model, cache) for _ in range(2)]
+    workers[0].record_predictions([110.0], [100.0])
+    workers[1].record_predictions([90.0, 130.0], [100.0, 100.0])
+
+    for worker in workers:
+        stats = worker.stats()
+        assert stats['served_predictions'] == 3
+        assert stats['served_revenue_lift'] == 10.0
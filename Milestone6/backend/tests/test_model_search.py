@@ -0,0 +1,44 @@
+import model_search
+import train_and_save_model
+
+
+def test_default_candidate_is_the_previous_model():
+    """The baseline candidate must train exactly the pre-search train_and_save configuration"""
+    baseline = model_search.sample_candidates(1, families=('lightgbm',))[0]
+    searched = model_search.make_model(baseline['family'], baseline['params'], n_estimators=300).get_params()
+    previous = train_and_save_model.default_model().get_params()
+    searched.pop('n_jobs'), previous.pop('n_jobs')
+    assert searched == previous
+
+
+def test_sampled_subsample_enables_bagging():
+    params = model_search.make_model('lightgbm', {'subsample': 0.8}, n_estimators=10).get_params()
+    assert params['subsample_freq'] == 1
+    params = model_search.make_model('lightgbm', {'subsample': 1.0}, n_estimators=10).get_params()
+    assert params['subsample_freq'] == 0
+
+
+def test_weaker_search_winner_is_not_published(tmp_path, monkeypatch):
+    """A winner that loses to the default model on the holdout split keeps the default in place"""
+    import joblib
+    import data_snapshot
+    from conftest import RAW_RIDES_PATH
+    from model_registry import ModelRegistry
+
+    # Grossly overfit: deep trees at learning rate 1
+    winner = {'family': 'xgboost', 'params': {'max_depth': 12, 'learning_rate': 1.0, 'min_child_weight': 1},
+              'best_iteration': 300, 'cv_rmse': 0.0}
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(train_and_save_model, 'find_data_path', lambda: RAW_RIDES_PATH)
+    monkeypatch.setattr(train_and_save_model, 'ModelRegistry', lambda: ModelRegistry(str(tmp_path / 'registry')))
+    monkeypatch.setattr(data_snapshot, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(model_search, 'FEATURE_CACHE_DIR', str(tmp_path / 'features'))
+    monkeypatch.setattr(model_search, 'search',
+                        lambda *args, **kwargs: (winner, [winner], {'wall_seconds': 0.0, 'workers': 1}))
+
+    train_and_save_model.train_and_save(search=True)
+    artifacts = joblib.load(tmp_path / train_and_save_model.ARTIFACTS_PATH)
+    assert not artifacts['search']['winner_published']
+    assert artifacts['search']['winner_holdout']['rmse'] > artifacts['search']['default_holdout']['rmse']
+    assert artifacts['model'].get_params() == train_and_save_model.default_model().get_params()
+    assert artifacts['evaluation']['rmse'] == artifacts['search']['default_holdout']['rmse']
@@ -0,0 +1,29 @@
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def onnx_model(pricing_model, tmp_path_factory):
+    """The serving model exported to ONNX in a scratch directory, loaded with the ONNX Runtime backend"""
+    pytest.importorskip('onnxruntime')
+    pytest.importorskip('onnxmltools')
+    from models import OnnxBackend, PricingModel
+    from train_and_save_model import export_onnx
+
+    model_dir = tmp_path_factory.mktemp('onnx')
+    model_path = str(model_dir / 'pricing_model_artifacts.pkl')
+    shutil.copy(pricing_model.model_path, model_path)
+    assert export_onnx(joblib.load(model_path), str(model_dir))
+
+    model = PricingModel(model_path=model_path, backend='onnx')
+    assert isinstance(model.backend, OnnxBackend)
+    return model
+
+
+def test_onnx_prices_match_native(pricing_model, onnx_model, rides, abs_tol=0.01, min_fraction=0.99):
+    """ONNX trees compare in float32, so a few rows on a split threshold may differ"""
+    diff = np.abs(np.array(pricing_model.predict(rides)) - np.array(onnx_model.predict(rides)))
+    assert np.mean(diff <= abs_tol) >= min_fraction
@@ -0,0 +1,44 @@
+import pytest
+
+from profiler import profiler
+
+
+@pytest.fixture
+def client():
+    from app import create_app
+
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('method,path,body', [
+    ('get', '/api/admin/profiler', None),
+    ('get', '/api/admin/profiler?format=collapsed', None),
+    ('post', '/api/admin/profiler', {'action': 'start'}),
+])
+def test_profiler_is_off_without_a_token(client, monkeypatch, method, path, body):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert getattr(client, method)(path, json=body).status_code == 403
+    assert not profiler.running
+
+
+def test_profiler_needs_the_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.post('/api/admin/profiler', json={'action': 'start'}).status_code == 401
+    assert not profiler.running
+
+    headers = {'X-Admin-Token': 'secret'}
+    try:
+        response = client.post('/api/admin/profiler', json={'action': 'start', 'max_seconds': 5}, headers=headers)
+        assert response.status_code == 200
+        assert profiler.running
+    finally:
+        client.post('/api/admin/profiler', json={'action': 'stop'}, headers=headers)
+    assert not profiler.running
+
+
+def test_profiler_rejects_bad_settings(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    response = client.post('/api/admin/profiler', json={'action': 'start', 'interval_ms': 'fast'},
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+    assert not profiler.running
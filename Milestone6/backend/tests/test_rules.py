@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+
+def test_batched_rules_match_per_row_rules(pricing_model, rides):
+    X, rule_inputs = pricing_model.feature_spec.transform(rides)
+    base_prediction = pricing_model.backend.predict(X)
+    df = pd.DataFrame(rule_inputs)
+
+    per_row = np.array([pricing_model.apply_dynamic_pricing_rules(price, df.iloc[i])
+                        for i, price in enumerate(base_prediction)])
+    batched = pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, df)
+    assert np.array_equal(per_row, batched)
+
+
+def test_rule_trace_does_not_change_prices(pricing_model, rides):
+    X, rule_inputs = pricing_model.feature_spec.transform(rides)
+    base_prediction = pricing_model.backend.predict(X)
+    trace = {}
+    traced = pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs, trace=trace)
+    assert np.array_equal(traced, pricing_model.apply_dynamic_pricing_rules_batch(base_prediction, rule_inputs))
+    assert trace['normalizer'][0].all()
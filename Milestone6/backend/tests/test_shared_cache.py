@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from shared_cache import SharedCache
+
+
+def test_cache_round_trip_in_a_private_directory(tmp_path):
+    cache = SharedCache(directory=str(tmp_path / 'cache'))
+    assert not os.path.exists(cache.directory)  # nothing created until first use
+    assert cache.set('key', {'a': 1})
+    assert cache.get('key') == {'a': 1}
+    assert os.stat(cache.directory).st_mode & 0o777 == 0o700
+
+
+@pytest.mark.parametrize('make_unsafe', [
+    lambda path: os.makedirs(path, mode=0o777) or os.chmod(path, 0o777),
+    lambda path: os.makedirs(path + '-target', mode=0o700) or os.symlink(path + '-target', path),
+])
+def test_unsafe_directory_is_never_read(tmp_path, make_unsafe):
+    directory = str(tmp_path / 'cache')
+    make_unsafe(directory)
+    cache = SharedCache(directory=directory)
+    assert not cache.set('key', 1)
+    assert cache.get('key') is None
+    assert cache.get_or_set('key', lambda: 2) == 2
+    assert os.listdir(directory) == []
+
+
+def test_lock_files_are_bounded(tmp_path):
+    """Keys come from request parameters: the lock files must not grow with them"""
+    import shared_cache
+
+    cache = SharedCache(directory=str(tmp_path / 'cache'), threshold=10)
+    for i in range(500):
+        assert cache.get_or_set(f'key{i}', lambda: i) == i
+    names = os.listdir(cache.directory)
+    assert len([name for name in names if name.endswith('.lock')]) <= shared_cache.LOCK_STRIPES
+    assert len([name for name in names if '.' not in name]) == 10
@@ -0,0 +1,30 @@
+import pytest
+
+from whatif import sweep
+
+
+@pytest.fixture(scope='module')
+def base(rides):
+    return rides[0]
+
+
+def test_sweep_finds_the_best_setting(pricing_model, base):
+    result = sweep(pricing_model, base, {'Number_of_Drivers': {'min': 5, 'max': 90, 'steps': 10}})
+    assert result['scenarios'] == 10
+    assert result['best']['expected_revenue'] == max(result['surface']['expected_revenue'])
+
+
+def test_grid_size_past_int64_is_rejected(pricing_model, base):
+    """2**16 steps on 4 fields is 2**64 scenarios, which np.prod wraps around to 0"""
+    range_ = {'min': 1, 'max': 2, 'steps': 2 ** 16}
+    vary = {field: range_ for field in ('Number_of_Riders', 'Number_of_Drivers', 'Number_of_Past_Rides',
+                                         'Expected_Ride_Duration')}
+    with pytest.raises(ValueError, match='exceed'):
+        sweep(pricing_model, base, vary, max_scenarios=2 ** 17)
+
+
+def test_steps_are_bounded_by_the_max_scenarios_argument(pricing_model, base):
+    with pytest.raises(ValueError, match='steps <= 50'):
+        sweep(pricing_model, base, {'Number_of_Drivers': {'min': 5, 'max': 90, 'steps': 100}}, max_scenarios=50)
+    with pytest.raises(ValueError, match='exceed'):
+        sweep(pricing_model, base, {'Number_of_Drivers': list(range(100))}, max_scenarios=50)
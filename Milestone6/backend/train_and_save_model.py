@@ -10,108 +10,302 @@ import joblib
 import os
 import json
 
-def train_and_save():
+import model_search
+import data_snapshot
+from feature_spec import FeatureSpec, UnseenLabelError
+from model_registry import ModelRegistry, file_hash
+
+ARTIFACTS_PATH = 'pricing_model_artifacts.pkl'
+
+
+def find_data_path():
+    for path in ("../../Data/raw/dynamic_pricing.csv", "e:/AI-PriceOptima/Data/raw/dynamic_pricing.csv"):
+        if os.path.exists(path):
+            return path
+    print("Error: Data file not found at ../../Data/raw/dynamic_pricing.csv")
+    return None
+
+
+def default_model():
+    """The fixed LightGBM configuration; a search winner has to beat it to be published"""
+    return lgb.LGBMRegressor(
+        n_estimators=300,
+        max_depth=8,
+        learning_rate=0.03,
+        subsample=0.9,
+        colsample_bytree=0.9,
+        min_child_samples=20,
+        reg_alpha=0.1,
+        reg_lambda=0.1,
+        random_state=42,
+        n_jobs=-1,
+        verbose=-1
+    )
+
+
+def fit_and_evaluate(model, family, X_train, y_train, X_test, y_test):
+    """Fit the model on the training split; returns its (RMSE, R2) on the holdout split"""
+    # XGBoost keeps column names and its ONNX converter only accepts f0, f1, ...; serving passes arrays anyway
+    if family != 'lightgbm':
+        X_train, X_test = X_train.to_numpy(), X_test.to_numpy()
+    model.fit(X_train, y_train)
+    preds = model.predict(X_test)
+    return float(np.sqrt(mean_squared_error(y_test, preds))), float(r2_score(y_test, preds))
+
+
+def train_and_save(search=False, workers=None, candidates=27, folds=3):
+    """
+    Train and publish the pricing model. With search=True the model is the
+    winner of a cross-validated LightGBM/XGBoost search (see model_search)
+    instead of the fixed LightGBM configuration, provided it beats that
+    configuration on the holdout split; otherwise the fixed one is kept.
+    """
     # Load data
     print("Loading data...")
-    data_path = "../../Data/raw/dynamic_pricing.csv"
-    if not os.path.exists(data_path):
-        data_path = "e:/AI-PriceOptima/Data/raw/dynamic_pricing.csv"
-    
-    if not os.path.exists(data_path):
-        print(f"Error: Data file not found at {data_path}")
+    data_path = find_data_path()
+    if data_path is None:
         return
 
-    df = pd.read_csv(data_path)
+    # The snapshot metadata says how much of the CSV this model saw, for train_incremental
+    df, snapshot_meta = data_snapshot.load_snapshot(data_path)
     
     # Preprocessing
     print("Preprocessing...")
     df_processed = df.copy()
     
-    # Feature Engineering
-    df_processed['Demand_Ratio'] = df_processed['Number_of_Riders'] / (df_processed['Number_of_Drivers'] + 1e-5)
-    df_processed['Supply_Constraint'] = (df_processed['Number_of_Riders'] > df_processed['Number_of_Drivers']).astype(int)
-    df_processed['Market_Saturation'] = df_processed['Number_of_Drivers'] / (df_processed['Number_of_Riders'] + 1e-5)
-    df_processed['Rider_Loyalty_Score'] = df_processed['Number_of_Past_Rides'] * 0.5 + df_processed['Average_Ratings'] * 10
-    df_processed['Duration_Per_Rider'] = df_processed['Expected_Ride_Duration'] / (df_processed['Number_of_Riders'] + 1e-5)
-    df_processed['Capacity_Utilization'] = df_processed['Demand_Ratio'] / (df_processed['Demand_Ratio'].max() + 1e-5)
-    
-    vehicle_mapping = {'Economy': 0, 'Premium': 1}
-    premium_vehicle = df_processed['Vehicle_Type'].map(vehicle_mapping)
-    df_processed['Premium_Factor'] = premium_vehicle * df_processed['Average_Ratings']
-    
-    df_processed['Surge_Indicator'] = (df_processed['Demand_Ratio'] > df_processed['Demand_Ratio'].quantile(0.75)).astype(int)
-    
-    # Encoders
-    le_location = LabelEncoder()
-    df_processed['Location_Encoded'] = le_location.fit_transform(df_processed['Location_Category'])
+    # Feature Engineering (shared with serving through FeatureSpec)
+    feature_spec = FeatureSpec.fit(df_processed)
+    feature_cols = feature_spec.feature_cols
+    print(f"Fitted feature constants: Demand_Ratio max {feature_spec.demand_ratio_max:.4f}, "
+          f"surge threshold {feature_spec.surge_threshold:.4f}")
     
-    le_time = LabelEncoder()
-    df_processed['Time_Encoded'] = le_time.fit_transform(df_processed['Time_of_Booking'])
+    # Encoders (kept in the artifact for older loaders; serving uses the feature spec)
+    le_location = LabelEncoder().fit(df_processed['Location_Category'])
+    le_time = LabelEncoder().fit(df_processed['Time_of_Booking'])
+    loyalty_mapping = feature_spec.loyalty_mapping
+    vehicle_mapping = feature_spec.vehicle_mapping
     
-    loyalty_mapping = {'Regular': 0, 'Silver': 1, 'Gold': 2}
-    df_processed['Loyalty_Encoded'] = df_processed['Customer_Loyalty_Status'].map(loyalty_mapping)
-    
-    df_processed['Vehicle_Encoded'] = df_processed['Vehicle_Type'].map(vehicle_mapping)
-    
-    # Feature selection
-    feature_cols = ['Number_of_Riders', 'Number_of_Drivers', 'Number_of_Past_Rides', 
-                    'Average_Ratings', 'Expected_Ride_Duration', 'Demand_Ratio', 
-                    'Supply_Constraint', 'Location_Encoded', 'Time_Encoded', 
-                    'Loyalty_Encoded', 'Vehicle_Encoded', 'Market_Saturation',
-                    'Rider_Loyalty_Score', 'Duration_Per_Rider', 'Capacity_Utilization',
-                    'Premium_Factor', 'Surge_Indicator']
-    
-    X = df_processed[feature_cols]
+    X = feature_spec.transform_frame(df_processed)
     y = df_processed['Historical_Cost_of_Ride']
+    data_hash = file_hash(data_path)
     
     # Split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Train LightGBM
-    print("Training LightGBM model...")
-    lgb_model = lgb.LGBMRegressor(
-        n_estimators=300,
-        max_depth=8,
-        learning_rate=0.03,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        min_child_samples=20,
-        reg_alpha=0.1,
-        reg_lambda=0.1,
-        random_state=42,
-        n_jobs=-1,
-        verbose=-1
-    )
-    
-    lgb_model.fit(X_train, y_train)
-    
-    # Evaluate
-    preds = lgb_model.predict(X_test)
-    rmse = np.sqrt(mean_squared_error(y_test, preds))
-    r2 = r2_score(y_test, preds)
+    print("Training the default lightgbm model...")
+    model, model_family = default_model(), 'lightgbm'
+    rmse, r2 = fit_and_evaluate(model, model_family, X_train, y_train, X_test, y_test)
+
+    leaderboard = search_summary = None
+    if search:
+        print("Searching hyperparameters...")
+        cache_dir = model_search.cache_features(
+            X, y, model_search.feature_cache_key(data_hash, feature_spec))
+        best, leaderboard, search_summary = model_search.search(
+            cache_dir, X.index.get_indexer(X_train.index), n_candidates=candidates, folds=folds,
+            workers=workers)
+        print(f"Search done in {search_summary['wall_seconds']:.1f} s on {search_summary['workers']} workers: "
+              f"best {best['family']} with CV RMSE {best['cv_rmse']:.2f}")
+        # Refit on the whole training split with the tree count early stopping settled on
+        candidate = model_search.make_model(best['family'], best['params'], best['best_iteration'])
+        candidate.set_params(n_jobs=-1)
+        print(f"Training the {best['family']} search winner...")
+        candidate_rmse, candidate_r2 = fit_and_evaluate(candidate, best['family'], X_train, y_train, X_test, y_test)
+        search_summary['winner_holdout'] = {'rmse': candidate_rmse, 'r2': candidate_r2}
+        search_summary['default_holdout'] = {'rmse': rmse, 'r2': r2}
+        # Only publish a search winner that beats the configuration it replaces
+        search_summary['winner_published'] = bool(candidate_rmse < rmse)
+        if search_summary['winner_published']:
+            model, model_family, rmse, r2 = candidate, best['family'], candidate_rmse, candidate_r2
+        else:
+            print(f"❌ The search winner's holdout RMSE {candidate_rmse:.2f} (R2 {candidate_r2:.4f}) is no better "
+                  f"than the default model's {rmse:.2f} (R2 {r2:.4f}); keeping the default lightgbm model")
+
     print(f"Model trained. RMSE: {rmse:.2f}, R2: {r2:.4f}")
     
     # Save artifacts
     print("Saving artifacts...")
     artifacts = {
-        'model': lgb_model,
+        'model': model,
         'le_location': le_location,
         'le_time': le_time,
         'loyalty_mapping': loyalty_mapping,
         'vehicle_mapping': vehicle_mapping,
-        'feature_cols': feature_cols
+        'feature_cols': feature_cols,
+        'feature_spec': feature_spec.to_dict()
+    }
+    if leaderboard is not None:
+        artifacts['leaderboard'] = leaderboard
+        artifacts['search'] = search_summary
+    artifacts['training_data'] = {
+        'rows': len(df),
+        'source_bytes': snapshot_meta['source_bytes'],
+        'source_tail': snapshot_meta['source_tail'],
+        # Holdout RMSE of this full training: the drift reference for incremental updates
+        'reference_rmse': float(rmse),
+        'updates': 0,
     }
+    # Held-out test split scores, reported by /api/kpi
+    artifacts['evaluation'] = {'r2': float(r2), 'rmse': float(rmse), 'rows': len(y_test)}
     
-    joblib.dump(artifacts, 'pricing_model_artifacts.pkl')
+    save_and_publish(artifacts, {'rmse': float(rmse), 'r2': float(r2), 'model_family': model_family}, data_hash)
+    print("Done.")
+    return artifacts
+
+
+def save_and_publish(artifacts, metrics, data_hash):
+    """Write the artifacts (joblib, ONNX, feature importance) and register them as a new model version"""
+    joblib.dump(artifacts, ARTIFACTS_PATH)
+    onnx_files = export_onnx(artifacts, '.')
+
+    # Register the new version; serving workers watching the registry hot-reload it
+    version = ModelRegistry().publish(
+        [ARTIFACTS_PATH] + onnx_files,
+        metrics=metrics,
+        feature_cols=artifacts['feature_cols'],
+        data_hash=data_hash,
+    )
+    print(f"Registered model version {version}")
     
     # Save Feature Importance
     importance = pd.DataFrame({
-        'feature': feature_cols,
-        'importance': lgb_model.feature_importances_
+        'feature': artifacts['feature_cols'],
+        'importance': artifacts['model'].feature_importances_
     }).sort_values('importance', ascending=False)
     importance.to_json('feature_importance.json', orient='records')
+    return version
+
+
+def train_incremental(new_trees=50, validation_fraction=0.2, drift_threshold=0.1, min_new_rows=50,
+                      max_trees=1000, **full_retrain_options):
+    """
+    Continue boosting the LightGBM model in pricing_model_artifacts.pkl on
+    only the rides appended to the CSV since it last trained. The newest
+    validation_fraction of those rides validates the update and stays
+    unconsumed, so it is trained on by the next update (a sliding window).
+    Falls back to train_and_save(**full_retrain_options) when the update's
+    validation RMSE exceeds the last full training's by more than
+    drift_threshold, or when an update is not possible (file rewritten,
+    unseen categories, not a LightGBM model, more than max_trees trees).
+    """
+    def full_retrain(reason):
+        print(f"{reason}; running a full retrain")
+        return train_and_save(**full_retrain_options)
+
+    data_path = find_data_path()
+    if data_path is None:
+        return
+    if not os.path.exists(ARTIFACTS_PATH):
+        return full_retrain(f"No {ARTIFACTS_PATH}")
+    artifacts = joblib.load(ARTIFACTS_PATH)
+    model = artifacts['model']
+    state = artifacts.get('training_data')
+    if state is None:
+        return full_retrain("The artifact does not record its training data")
+    if not isinstance(model, lgb.LGBMModel):
+        return full_retrain(f"Incremental updates need a LightGBM model, not {type(model).__name__}")
+
+    print("Reading new rides...")
+    new_rides, row_ends = data_snapshot.read_appended(data_path, state['source_bytes'], state['source_tail'])
+    if new_rides is None:
+        return full_retrain("The data file was rewritten since the model was trained")
+    if len(new_rides) < min_new_rows:
+        print(f"Only {len(new_rides)} new rides (need {min_new_rows}), model is up to date")
+        return artifacts
+    if model.booster_.num_trees() + new_trees > max_trees:
+        return full_retrain(f"The model would grow past {max_trees} trees")
+
+    feature_spec = FeatureSpec.from_artifacts(artifacts)
+    try:
+        X = feature_spec.transform_frame(new_rides)
+    except UnseenLabelError as e:
+        return full_retrain(f"New rides have unseen categories ({e})")
+    y = new_rides['Historical_Cost_of_Ride']
+
+    # Rides are in arrival order: the newest ones validate the update
+    split = int(len(X) * (1 - validation_fraction))
+    X_train, X_val = X.iloc[:split], X.iloc[split:]
+    y_train, y_val = y.iloc[:split], y.iloc[split:]
+    previous_rmse = np.sqrt(mean_squared_error(y_val, model.predict(X_val)))
 
+    print(f"Boosting {new_trees} more trees on {len(X_train)} new rides...")
+    updated = lgb.LGBMRegressor(**{**model.get_params(), 'n_estimators': new_trees})
+    updated.fit(X_train, y_train, init_model=model.booster_)
+    preds = updated.predict(X_val)
+    rmse = np.sqrt(mean_squared_error(y_val, preds))
+    r2 = r2_score(y_val, preds)
+    print(f"Validation RMSE on the {len(X_val)} newest rides: {previous_rmse:.2f} before, {rmse:.2f} after, "
+          f"{state['reference_rmse']:.2f} at the last full training")
+    if rmse > state['reference_rmse'] * (1 + drift_threshold):
+        return full_retrain(f"Validation RMSE drifted more than {drift_threshold:.0%} past the last full training")
+
+    consumed = int(row_ends[split - 1])
+    artifacts['model'] = updated
+    artifacts['training_data'] = {
+        **state,
+        'rows': state['rows'] + split,
+        'source_bytes': consumed,
+        'source_tail': data_snapshot.tail_before(data_path, consumed),
+        'updates': state['updates'] + 1,
+    }
+    artifacts['evaluation'] = {'r2': float(r2), 'rmse': float(rmse), 'rows': len(y_val)}
+    save_and_publish(artifacts, {'rmse': float(rmse), 'r2': float(r2), 'model_family': 'lightgbm',
+                                 'mode': 'incremental', 'new_rows': int(split)}, file_hash(data_path))
     print("Done.")
+    return artifacts
+
+def export_onnx(artifacts, output_dir):
+    """
+    Write the model as an ONNX graph plus a JSON copy of the feature spec, so the
+    ONNX Runtime backend can serve it without lightgbm or scikit-learn installed.
+    Returns the paths written.
+    """
+    try:
+        from onnxmltools import convert_lightgbm, convert_xgboost
+        from onnxmltools.convert.common.data_types import FloatTensorType
+    except ImportError:
+        print("onnxmltools not installed, skipping ONNX export")
+        return []
+
+    feature_spec = FeatureSpec.from_artifacts(artifacts)
+    initial_types = [('input', FloatTensorType([None, len(feature_spec.feature_cols)]))]
+    if isinstance(artifacts['model'], xgb.XGBModel):
+        onnx_model = convert_xgboost(artifacts['model'], initial_types=initial_types)
+    else:
+        onnx_model = convert_lightgbm(artifacts['model'], initial_types=initial_types, zipmap=False)
+
+    onnx_path = os.path.join(output_dir, 'pricing_model.onnx')
+    with open(onnx_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    meta_path = os.path.join(output_dir, 'pricing_model_meta.json')
+    with open(meta_path, 'w') as f:
+        json.dump({'feature_spec': feature_spec.to_dict(), 'evaluation': artifacts.get('evaluation')}, f, indent=2)
+    print(f"ONNX model exported to {onnx_path}")
+    return [onnx_path, meta_path]
 
 if __name__ == "__main__":
-    train_and_save()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the pricing model and save its artifacts")
+    parser.add_argument('--export-onnx', action='store_true',
+                        help="Only export the existing pricing_model_artifacts.pkl to ONNX")
+    parser.add_argument('--search', action='store_true',
+                        help="Pick the model by a cross-validated LightGBM/XGBoost hyperparameter search")
+    parser.add_argument('--workers', type=int, help="Search processes (default: one per CPU)")
+    parser.add_argument('--candidates', type=int, default=27, help="Configurations to try in the search")
+    parser.add_argument('--folds', type=int, default=3, help="Cross-validation folds in the search")
+
+    parser.add_argument('--incremental', action='store_true',
+                        help="Continue boosting the saved model on rides appended since it was trained")
+    parser.add_argument('--new-trees', type=int, default=50, help="Trees added by an incremental update")
+    parser.add_argument('--drift-threshold', type=float, default=0.1,
+                        help="Relative validation RMSE increase that triggers a full retrain (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    search_options = dict(search=args.search, workers=args.workers, candidates=args.candidates, folds=args.folds)
+    if args.export_onnx:
+        export_onnx(joblib.load(ARTIFACTS_PATH), '.')
+    elif args.incremental:
+        train_incremental(new_trees=args.new_trees, drift_threshold=args.drift_threshold, **search_options)
+    else:
+        train_and_save(**search_options)
@@ -2,7 +2,13 @@ import pandas as pd
 import json
 import os
 
+BUNDLED_RIDES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dynamic_pricing.csv")
+
 def load_data(path):
+    # CSVs are read through their columnar snapshot, which is only rebuilt when the file changes
+    if path.endswith('.csv'):
+        from data_snapshot import load_rides
+        return load_rides(path)
     if os.path.exists(path):
         return pd.read_csv(path)
     return None
@@ -16,3 +22,39 @@ def load_json(path):
         with open(path, 'r') as f:
             return json.load(f)
     return None
+
+# One-hot groups written by the Milestone 2 ingestion pipeline (drop_first=True),
+# with the category that was dropped as the baseline.
+ONE_HOT_GROUPS = {
+    'Location_Category': (['Suburban', 'Urban'], 'Rural'),
+    'Customer_Loyalty_Status': (['Regular', 'Silver'], 'Gold'),
+    'Time_of_Booking': (['Evening', 'Morning', 'Night'], 'Afternoon'),
+    'Vehicle_Type': (['Premium'], 'Economy'),
+}
+
+def decode_one_hot(df):
+    """Rebuild the raw categorical columns from a one-hot encoded dataframe"""
+    df = df.copy()
+    for column, (categories, baseline) in ONE_HOT_GROUPS.items():
+        dummy_cols = [f"{column}_{category}" for category in categories]
+        if not all(col in df.columns for col in dummy_cols):
+            continue
+        decoded = pd.Series(baseline, index=df.index, dtype=object)
+        for category, col in zip(categories, dummy_cols):
+            decoded[df[col].astype(bool)] = category
+        df[column] = decoded
+        df = df.drop(columns=dummy_cols)
+    return df
+
+def load_ride_records(rows=None, path=BUNDLED_RIDES_PATH):
+    """The rides as raw request records (list of dicts), tiled up to `rows` if given"""
+    import numpy as np
+
+    df = load_data(path)
+    if df is None:
+        raise FileNotFoundError(f"Data file not found at {path}")
+    df = decode_one_hot(df)
+    if rows is not None:
+        repeats = int(np.ceil(rows / len(df)))
+        df = df.loc[np.tile(df.index, repeats)[:rows]].reset_index(drop=True)
+    return df.to_dict(orient='records')
@@ -0,0 +1,124 @@
+import numpy as np
+
+from feature_spec import RAW_NUMERIC_COLS
+from shared_cache import get_or_set
+
+PLOT_COLUMNS = RAW_NUMERIC_COLS + ['Historical_Cost_of_Ride']
+METHODS = ('random', 'stratified', 'grid', 'lttb')
+MAX_POINTS = 5000
+STRATA = 20
+
+
+def _xy(df, x, y):
+    for column in (x, y):
+        if column not in PLOT_COLUMNS:
+            raise ValueError(f"Can't plot {column!r}; choose from {', '.join(PLOT_COLUMNS)}")
+    xs = np.asarray(df[x], dtype=np.float64)
+    ys = np.asarray(df[y], dtype=np.float64)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    return xs[keep], ys[keep]
+
+
+def random_sample(xs, ys, points, rng):
+    """Indices of a uniform sample without replacement, in data order"""
+    if len(xs) <= points:
+        return np.arange(len(xs))
+    return np.sort(rng.choice(len(xs), size=points, replace=False))
+
+
+def stratified_sample(xs, ys, points, rng):
+    """
+    Indices of an equal-sized sample from each of STRATA equal-width x ranges,
+    so sparse tails show up instead of being drowned out by the dense middle
+    """
+    if len(xs) <= points:
+        return np.arange(len(xs))
+    edges = np.linspace(xs.min(), xs.max(), STRATA + 1)
+    strata = np.clip(np.searchsorted(edges, xs, side='right') - 1, 0, STRATA - 1)
+    members = np.split(np.argsort(strata, kind='stable'), np.cumsum(np.bincount(strata, minlength=STRATA))[:-1])
+    members = [m for m in members if len(m)]
+    per_stratum = max(1, points // len(members))
+    chosen = [m if len(m) <= per_stratum else rng.choice(m, size=per_stratum, replace=False) for m in members]
+    return np.sort(np.concatenate(chosen))[:points]
+
+
+def grid_bins(xs, ys, points):
+    """Counts on a square grid of at most `points` cells; only non-empty cells are returned"""
+    side = max(1, int(np.sqrt(points)))
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=side)
+    ix, iy = np.nonzero(counts)
+    return ((x_edges[ix] + x_edges[ix + 1]) / 2, (y_edges[iy] + y_edges[iy + 1]) / 2,
+            counts[ix, iy].astype(np.int64))
+
+
+def lttb(xs, ys, points):
+    """
+    Largest-Triangle-Three-Buckets downsampling of the points sorted by x:
+    keeps the first and last point and, per bucket, the point spanning the
+    largest triangle with its neighbours, so peaks and dips survive.
+    """
+    order = np.argsort(xs, kind='stable')
+    if len(xs) <= points:
+        return order
+    if points < 3:
+        return order[np.linspace(0, len(xs) - 1, points).astype(np.int64)]
+    sx, sy = xs[order], ys[order]
+    edges = np.linspace(1, len(sx) - 1, points - 1).astype(np.int64)
+    chosen = [0]
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's mean (the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else len(sx)
+        next_x, next_y = sx[end:next_end].mean(), sy[end:next_end].mean()
+        prev_x, prev_y = sx[chosen[-1]], sy[chosen[-1]]
+        area = np.abs((prev_x - next_x) * (sy[start:end] - prev_y) - (prev_x - sx[start:end]) * (next_y - prev_y))
+        chosen.append(start + int(np.argmax(area)))
+    chosen.append(len(sx) - 1)
+    return order[chosen]
+
+
+def query(df, x, y, points=500, method='stratified', seed=0):
+    """
+    Downsampled plot data for columns x and y: at most `points` records of
+    {x, y} (plus 'count' for the grid method). Samples are seeded, so the
+    same query on the same data always returns the same points.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; choose from {', '.join(METHODS)}")
+    if not 1 <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between 1 and {MAX_POINTS}")
+    xs, ys = _xy(df, x, y)
+
+    if method == 'grid':
+        bin_x, bin_y, counts = grid_bins(xs, ys, points) if len(xs) else ([], [], [])
+        records = [{x: float(bx), y: float(by), 'count': int(c)} for bx, by, c in zip(bin_x, bin_y, counts)]
+    else:
+        if method == 'lttb':
+            idx = lttb(xs, ys, points)
+        else:
+            sample = random_sample if method == 'random' else stratified_sample
+            idx = sample(xs, ys, points, np.random.default_rng(seed))
+        records = [{x: float(px), y: float(py)} for px, py in zip(xs[idx], ys[idx])]
+
+    return {'x': x, 'y': y, 'method': method, 'rows': int(len(xs)), 'points': records}
+
+
+def cached_query(load_snapshot, x, y, points=500, method='stratified', cache=None):
+    """
+    query() on the current dataset, cached under the snapshot's build id so a
+    new or changed dataset never serves an old plot.
+    load_snapshot: returns (df, meta) as data_snapshot.load_snapshot does.
+    """
+    df, meta = load_snapshot()
+    if df is None:
+        return None
+    key = f"viz:{meta['build_id']}:{x}:{y}:{method}:{points}"
+
+    def compute():
+        result = query(df, x, y, points, method)
+        result['dataset_version'] = meta['build_id']
+        return result
+    if not cache:
+        return compute()
+    # With the shared cache only one worker computes a missing plot
+    return get_or_set(cache, key, compute, timeout=3600)
@@ -0,0 +1,114 @@
+"""
+What-if sweeps: one base ride expanded into a grid of scenarios, scored in
+a single batched PricingModel call.
+
+    {"base": {...ride...},
+     "vary": {"Number_of_Drivers": {"min": 5, "max": 90, "steps": 18},
+              "Time_of_Booking": "*",
+              "Vehicle_Type": ["Economy", "Premium"]},
+     "objective": "revenue"}
+
+Numeric fields take a list of values or a {min, max, steps} range;
+categorical fields take a list or "*" for every category the model knows.
+The model has no demand curve, so expected revenue is the final price times
+the rides the market can serve, min(Number_of_Riders, Number_of_Drivers):
+more drivers mean lower surge prices but more completed rides.
+"""
+import math
+import os
+
+import numpy as np
+
+from feature_spec import RAW_CATEGORICAL_COLS, RAW_NUMERIC_COLS
+
+# Scenarios per request; a larger grid is rejected rather than truncated
+MAX_SCENARIOS = int(os.environ.get('WHATIF_MAX_SCENARIOS', 5000))
+
+OBJECTIVES = ('revenue', 'price')
+
+
+def _axis(field, spec, feature_spec, max_scenarios):
+    """The values to sweep for one field"""
+    if isinstance(spec, list) and len(spec) > max_scenarios:
+        raise ValueError(f"{field}: {len(spec)} values exceed the limit of {max_scenarios} scenarios")
+    if field in RAW_CATEGORICAL_COLS:
+        if spec == '*':
+            return list(feature_spec.categories(field))
+        if not isinstance(spec, list) or not spec:
+            raise ValueError(f"{field}: expected a list of values or \"*\"")
+        return spec
+    if field not in RAW_NUMERIC_COLS:
+        raise ValueError(f"Cannot vary {field!r}; choose from {RAW_NUMERIC_COLS + RAW_CATEGORICAL_COLS}")
+    if isinstance(spec, dict):
+        try:
+            low, high, steps = float(spec['min']), float(spec['max']), int(spec['steps'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{field}: a range needs numeric min, max and steps")
+        if steps < 1 or steps > max_scenarios or high < low:
+            raise ValueError(f"{field}: expected min <= max and 1 <= steps <= {max_scenarios}")
+        return np.linspace(low, high, steps).tolist()
+    if not isinstance(spec, list) or not spec:
+        raise ValueError(f"{field}: expected a list of values or a {{min, max, steps}} range")
+    return [float(value) for value in spec]
+
+
+def sweep(pricing_model, base, vary, objective='revenue', surface=True, max_scenarios=None):
+    """
+    Score every combination of the `vary` values applied to the `base` ride
+    and return the objective-maximizing setting, the base ride's own score
+    and (if surface) every scenario's price and revenue, flattened in grid
+    order (the last field varies fastest).
+    """
+    max_scenarios = max_scenarios or MAX_SCENARIOS
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; choose from {OBJECTIVES}")
+    if not isinstance(base, dict) or not isinstance(vary, dict) or not vary:
+        raise ValueError("Expected a 'base' ride and a non-empty 'vary' mapping")
+    missing = [col for col in RAW_NUMERIC_COLS + RAW_CATEGORICAL_COLS if col not in base]
+    if missing:
+        raise ValueError(f"Base ride is missing {missing}")
+
+    pricing_model.ensure_loaded()
+    fields = list(vary)
+    axes = [_axis(field, vary[field], pricing_model.feature_spec, max_scenarios) for field in fields]
+    shape = tuple(len(axis) for axis in axes)
+    # Python ints: np.prod wraps around in int64 for a large enough grid
+    n_scenarios = math.prod(shape)
+    if n_scenarios > max_scenarios:
+        raise ValueError(f"{n_scenarios} scenarios exceed the limit of {max_scenarios}")
+
+    # The base ride first, then the grid; each column built by indexing, not per row
+    columns = {col: np.repeat(np.asarray([base[col]], dtype=object if col in RAW_CATEGORICAL_COLS else np.float64),
+                              n_scenarios + 1)
+               for col in RAW_NUMERIC_COLS + RAW_CATEGORICAL_COLS}
+    grid = np.indices(shape).reshape(len(shape), -1)
+    for field, axis, index in zip(fields, axes, grid):
+        values = np.asarray(axis, dtype=object if field in RAW_CATEGORICAL_COLS else np.float64)
+        columns[field][1:] = values[index]
+
+    prices = np.asarray(pricing_model.predict(columns), dtype=np.float64)
+    rides = np.minimum(columns['Number_of_Riders'].astype(np.float64),
+                       columns['Number_of_Drivers'].astype(np.float64))
+    revenue = prices * rides
+    scores = revenue[1:] if objective == 'revenue' else prices[1:]
+    best = int(np.argmax(scores))
+
+    def scenario(i, setting):
+        return {'setting': setting, 'predicted_price': round(float(prices[i]), 2),
+                'expected_rides': round(float(rides[i]), 2), 'expected_revenue': round(float(revenue[i]), 2)}
+
+    result = {
+        'objective': objective,
+        'scenarios': n_scenarios,
+        'base': scenario(0, {field: base[field] for field in fields}),
+        'best': scenario(best + 1, {field: axis[index[best]] for field, axis, index in zip(fields, axes, grid)}),
+    }
+    if surface:
+        result['surface'] = {
+            'fields': fields,
+            'values': dict(zip(fields, axes)),
+            'shape': list(shape),
+            'predicted_price': np.round(prices[1:], 2).tolist(),
+            'expected_revenue': np.round(revenue[1:], 2).tolist(),
+        }
+    return result
@@ -9,7 +9,7 @@ const Dashboard = () => {
     avg_rating: 0,
     avg_price: 0,
     revenue_lift: 0,
-    model_accuracy: 0
+    model_r2: null
   });
   const [loading, setLoading] = useState(true);
 
@@ -78,7 +78,7 @@ const Dashboard = () => {
           </div>
           <p className="text-sm text-slate-400 font-medium uppercase tracking-wider">Revenue Lift</p>
           <div className="mt-2 flex items-baseline gap-2">
-             <p className="text-3xl font-bold text-emerald-400">+{stats.revenue_lift}%</p>
+             <p className="text-3xl font-bold text-emerald-400">{(stats.revenue_lift ?? 0) >= 0 ? '+' : ''}{stats.revenue_lift ?? 0}%</p>
           </div>
           <p className="text-xs text-slate-500 mt-2">vs Static Pricing Strategy</p>
         </div>
@@ -88,9 +88,9 @@ const Dashboard = () => {
           <div className="absolute top-0 right-0 p-3">
             <span className="text-6xl">🎯</span>
           </div>
-          <p className="text-sm text-slate-400 font-medium uppercase tracking-wider">Model Accuracy (R²)</p>
+          <p className="text-sm text-slate-400 font-medium uppercase tracking-wider">Model Fit (Held-out R²)</p>
           <div className="mt-2">
-             <p className="text-3xl font-bold text-violet-400">{(stats.model_accuracy * 100).toFixed(1)}%</p>
+             <p className="text-3xl font-bold text-violet-400">{stats.model_r2 == null ? 'n/a' : stats.model_r2.toFixed(2)}</p>
           </div>
           <p className="text-xs text-slate-500 mt-2">Best Model: LightGBM</p>
         </div>